@@ -4,12 +4,16 @@ import sys
 from importlib.machinery import SourceFileLoader
 from os import PathLike
 from pathlib import Path
+from typing import Iterable
 from typing import Optional
+from typing import Sequence
 from typing import Text
 from typing import Union
 
 from env_credentials.credentials import Credentials
 from env_credentials.credentials import CredentialsException
+from env_credentials.lazy import LazyValues
+from env_credentials.lazy import load as lazy_load
 
 
 def get_default_dir() -> PathLike:
@@ -34,6 +38,44 @@ def get_default_dir() -> PathLike:
     return Path(path).parent
 
 
-def load(credentials_dir: Optional[Union[Text, PathLike]] = None):
+def load(
+    credentials_dir: Optional[Union[Text, PathLike]] = None,
+    lazy: bool = False,
+    names: Optional[Iterable[Text]] = None,
+    agent: Optional[Union[Text, PathLike]] = None,
+    include: Optional[Union[Text, Iterable[Text]]] = None,
+    exclude: Optional[Union[Text, Iterable[Text]]] = None,
+    prefix: Optional[Union[Text, Iterable[Text]]] = None,
+    strip_prefix: bool = False,
+    override: bool = False,
+    environment: Optional[Union[Text, Sequence[Text]]] = None,
+) -> Optional[LazyValues]:
     credentials_dir = credentials_dir or get_default_dir()
-    Credentials(credentials_dir=credentials_dir).load()
+
+    environment = environment or os.environ.get("ENV_CREDENTIALS_ENVIRONMENT")
+    agent = agent or os.environ.get("ENV_CREDENTIALS_AGENT")
+    if environment and agent:
+        # The agent serves a single directory without layers, so the values would depend on whether it is up.
+        raise CredentialsException("An environment cannot be loaded through the agent, which serves no layers")
+
+    if environment:
+        from env_credentials.layers import LayeredCredentials
+
+        # The base credentials merged with the layers of the environment, e.g. `production.eu`.
+        creds: Union[Credentials, LayeredCredentials] = LayeredCredentials(credentials_dir, environment)
+    else:
+        creds = Credentials(credentials_dir=credentials_dir)
+
+    if agent:
+        from env_credentials.agent import AgentClient
+
+        # Read through the agent, only decrypting the files here when it cannot be reached.
+        creds = AgentClient(agent, fallback=creds)  # type: ignore[assignment]
+
+    options = dict(include=include, exclude=exclude, prefix=prefix, strip_prefix=strip_prefix, override=override)
+
+    if lazy:
+        return lazy_load(creds, names=names, **options)
+
+    creds.load(**options)
+    return None
@@ -1,10 +1,33 @@
+import json
+from argparse import Namespace
 from typing import Optional
 from typing import Text
 
 from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
 from django.core.management.base import CommandParser
 
 from env_credentials import credentials
+from env_credentials.cache import default_cache
+from env_credentials.cli import BUFFER_HELP
+from env_credentials.cli import FORMATS
+from env_credentials.cli import LAYER_HELP
+from env_credentials.cli import OWN_KEY_HELP
+from env_credentials.cli import PASSPHRASE_ACTIONS
+from env_credentials.cli import PASSPHRASE_HELP
+from env_credentials.cli import add_cipher_argument
+from env_credentials.cli import add_compression_argument
+from env_credentials.cli import add_rotate_arguments
+from env_credentials.cli import add_verify_arguments
+from env_credentials.cli import change_passphrase
+from env_credentials.cli import detect_format
+from env_credentials.cli import parse_assignments
+from env_credentials.cli import parse_changes
+from env_credentials.cli import read_source
+from env_credentials.cli import rotate_directories
+from env_credentials.cli import verify_directories
+from env_credentials.edit import BUFFERS
+from env_credentials.instrumentation import stats
 
 from ...credentials import get_default_dir
 
@@ -21,35 +44,162 @@ class Command(BaseCommand):
             default=None,
             help="The directory in which the configuration and key files are stored.",
         )
+        parser.add_argument("--layer", "-l", default=None, help=LAYER_HELP)
         subparsers = parser.add_subparsers(dest="command")
 
-        subparsers.add_parser("edit", help="Open the credentials file in your editor for altering.")
-        subparsers.add_parser("init", help="Initialize the credentials and master key files.")
+        edit = subparsers.add_parser("edit", help="Open the credentials file in your editor for altering.")
+        edit.add_argument("--buffer", choices=("auto",) + BUFFERS, help=BUFFER_HELP)
+        init = subparsers.add_parser("init", help="Initialize the credentials and master key files.")
+        init.add_argument("--own-key", action="store_true", help=OWN_KEY_HELP)
+        add_compression_argument(init)
+        add_cipher_argument(init)
+        init.add_argument("--passphrase", action="store_true", help="Protect the new key with a passphrase.")
         subparsers.add_parser("show", help="Decrypt and print the credentials file to the terminal.")
+        migrate = subparsers.add_parser("migrate", help="Convert a legacy hex encoded credentials file to the binary format.")
+        migrate.add_argument(
+            "--indexed",
+            action="store_true",
+            default=None,
+            help="Store each credential as a separately encrypted record so single values can be read on their own.",
+        )
+        add_compression_argument(migrate)
+        set_ = subparsers.add_parser("set", help="Set one or more credentials in a single write.")
+        set_.add_argument(
+            "assignments",
+            nargs="*",
+            help="NAME=VALUE pairs. Dotenv formatted lines are read from stdin if omitted.",
+        )
+        unset = subparsers.add_parser("unset", help="Remove one or more credentials in a single write.")
+        unset.add_argument("names", nargs="+")
+        import_ = subparsers.add_parser("import", help="Set the credentials from a dotenv or JSON file in a single write.")
+        import_.add_argument("file", nargs="?", help="The file to import. Read from stdin if omitted or `-`.")
+        import_.add_argument("--format", choices=FORMATS, help="The format of the file. Defaults to JSON for .json files.")
+        rotate = subparsers.add_parser("rotate", help="Re-encrypt the credentials of one or many directories with new keys.")
+        add_rotate_arguments(rotate)
+        verify = subparsers.add_parser("verify", help="Check that credentials decrypt, parse and define required names.")
+        add_verify_arguments(verify)
+        passphrase = subparsers.add_parser("passphrase", help="Manage the passphrase protecting the key.")
+        passphrase.add_argument("action", choices=PASSPHRASE_ACTIONS, help=PASSPHRASE_HELP)
+        stats = subparsers.add_parser("stats", help="Read the credentials and print timings for each phase.")
+        stats.add_argument(
+            "--no-cache",
+            action="store_true",
+            help="Bypass the process cache so the files are read and decrypted again.",
+        )
+        stats.add_argument("--json", action="store_true", help="Print the statistics as JSON.")
 
     def handle_init(self, *args, **kwargs):
         credentials_dir: Optional[Text] = kwargs.get("dir") or get_default_dir()
 
-        creds = credentials.Credentials(credentials_dir)
-        creds.initialize()
+        creds = credentials.Credentials(
+            credentials_dir,
+            layer=kwargs.get("layer"),
+            compression=kwargs.get("compression"),
+            cipher=kwargs.get("cipher"),
+        )
+        creds.initialize(own_key=kwargs.get("own_key", False))
+        if kwargs.get("passphrase"):
+            change_passphrase(creds, "set")
 
     def handle_edit(self, *args, **kwargs):
         credentials_dir: Optional[Text] = kwargs.get("dir") or get_default_dir()
 
-        creds = credentials.Credentials(credentials_dir)
-        creds.edit()
+        creds = credentials.Credentials(credentials_dir, layer=kwargs.get("layer"))
+        creds.edit(kwargs.get("buffer"))
 
     def handle_show(self, *args, **kwargs):
         credentials_dir: Optional[Text] = kwargs.get("dir") or get_default_dir()
 
-        creds = credentials.Credentials(credentials_dir)
+        creds = credentials.Credentials(credentials_dir, layer=kwargs.get("layer"))
         self.stdout.write(creds.read_file())
 
+    def handle_migrate(self, *args, **kwargs):
+        credentials_dir: Optional[Text] = kwargs.get("dir") or get_default_dir()
+
+        creds = credentials.Credentials(
+            credentials_dir,
+            indexed=kwargs.get("indexed"),
+            layer=kwargs.get("layer"),
+            compression=kwargs.get("compression"),
+        )
+        if creds.migrate():
+            self.stdout.write("Converted the credentials file to the binary format.")
+        else:
+            self.stdout.write("The credentials file is already in the binary format.")
+
+    def handle_set(self, *args, **kwargs):
+        credentials_dir: Optional[Text] = kwargs.get("dir") or get_default_dir()
+
+        creds = credentials.Credentials(credentials_dir, layer=kwargs.get("layer"))
+        creds.update(parse_assignments(kwargs.get("assignments") or []), raw=True)
+
+    def handle_unset(self, *args, **kwargs):
+        credentials_dir: Optional[Text] = kwargs.get("dir") or get_default_dir()
+
+        creds = credentials.Credentials(credentials_dir, layer=kwargs.get("layer"))
+        creds.unset(kwargs["names"])
+
+    def handle_import(self, *args, **kwargs):
+        credentials_dir: Optional[Text] = kwargs.get("dir") or get_default_dir()
+        path = kwargs.get("file")
+
+        creds = credentials.Credentials(credentials_dir, layer=kwargs.get("layer"))
+        creds.update(parse_changes(read_source(path), detect_format(path, kwargs.get("format"))), raw=True)
+
+    def handle_rotate(self, *args, **kwargs):
+        kwargs["dir"] = kwargs.get("dir") or (None if kwargs.get("paths") else get_default_dir())
+
+        if rotate_directories(Namespace(**kwargs), self.stdout.write):
+            raise CommandError("Some credentials could not be rotated")
+
+    def handle_verify(self, *args, **kwargs):
+        kwargs["dir"] = kwargs.get("dir") or (None if kwargs.get("paths") else get_default_dir())
+
+        if verify_directories(Namespace(**kwargs), self.stdout.write):
+            raise CommandError("Some credentials are invalid")
+
+    def handle_passphrase(self, *args, **kwargs):
+        credentials_dir: Optional[Text] = kwargs.get("dir") or get_default_dir()
+
+        creds = credentials.Credentials(credentials_dir, layer=kwargs.get("layer"))
+        change_passphrase(creds, kwargs["action"])
+
+    def handle_stats(self, *args, **kwargs):
+        credentials_dir: Optional[Text] = kwargs.get("dir") or get_default_dir()
+
+        # Anything loaded by the settings module is already included in the statistics of this process.
+        cache = None if kwargs.get("no_cache") else default_cache
+        creds = credentials.Credentials(credentials_dir, cache=cache, layer=kwargs.get("layer"))
+        creds.values()
+        creds.load()
+
+        data = stats.as_dict()
+
+        if kwargs.get("json"):
+            self.stdout.write(json.dumps(data, indent=2))
+            return
+
+        self.stdout.write(f"{'phase':<10} {'count':>6} {'total':>12} {'max':>12} {'bytes':>12}")
+        for phase, values in data["phases"].items():
+            self.stdout.write(
+                f"{phase:<10} {values['count']:>6} {values['total_s'] * 1000:>10.3f}ms "
+                f"{values['max_s'] * 1000:>10.3f}ms {values['bytes']:>12}"
+            )
+        self.stdout.write(f"cache hits: {data['cache']['hits']}, misses: {data['cache']['misses']}")
+
     def handle(self, *args, **kwargs):
         handlers = {
             "edit": self.handle_edit,
+            "import": self.handle_import,
             "init": self.handle_init,
+            "migrate": self.handle_migrate,
+            "passphrase": self.handle_passphrase,
+            "rotate": self.handle_rotate,
+            "set": self.handle_set,
             "show": self.handle_show,
+            "stats": self.handle_stats,
+            "unset": self.handle_unset,
+            "verify": self.handle_verify,
         }
 
         command = kwargs.get("command")
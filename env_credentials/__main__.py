@@ -0,0 +1,5 @@
+import sys
+
+from env_credentials.cli import main
+
+sys.exit(main())
@@ -0,0 +1,397 @@
+import argparse
+import os
+import socket
+import socketserver
+import struct
+import threading
+import time
+from os import PathLike
+from queue import Empty
+from queue import Full
+from queue import LifoQueue
+from typing import Dict
+from typing import Iterable
+from typing import List
+from typing import Optional
+from typing import Text
+from typing import Tuple
+from typing import Union
+
+from env_credentials.credentials import Credentials
+from env_credentials.credentials import CredentialsException
+from env_credentials.selection import Selector
+from env_credentials.watch import CredentialsWatcher
+
+# Every frame is a 4 byte big endian length followed by the payload. Requests are a single operation byte, followed by
+# the credential name for `GET`. Responses are a status byte followed by the encoded value or values.
+OP_PING = b"P"
+OP_VALUES = b"V"
+OP_GET = b"G"
+
+STATUS_OK = b"\x00"
+STATUS_NOT_FOUND = b"\x01"
+STATUS_ERROR = b"\x02"
+
+SOCKET_ENV = "ENV_CREDENTIALS_AGENT"
+
+_LENGTH = struct.Struct(">I")
+_NAME_LENGTH = struct.Struct(">H")
+_NONE = 0xFFFFFFFF
+
+Values = Dict[Text, Optional[Text]]
+
+
+class AgentException(CredentialsException):
+    def __init__(self, message: str):
+        self.message = f"The credentials agent failed: {message}"
+
+
+class AgentUnavailableException(CredentialsException):
+    def __init__(self, socket_path: Union[Text, PathLike], previous):
+        self.message = f"Could not reach the credentials agent at {socket_path}: {previous}"
+        self.previous = previous
+
+
+def _encode_value(value: Optional[Text]) -> bytes:
+    if value is None:
+        return _LENGTH.pack(_NONE)
+
+    data = value.encode("utf-8")
+    return _LENGTH.pack(len(data)) + data
+
+
+def _decode_value(data: bytes, offset: int = 0) -> Tuple[Optional[Text], int]:
+    (length,) = _LENGTH.unpack_from(data, offset)
+    offset += _LENGTH.size
+
+    if length == _NONE:
+        return None, offset
+
+    return data[offset : offset + length].decode("utf-8"), offset + length
+
+
+def encode_values(values: Values) -> bytes:
+    parts: List[bytes] = []
+
+    for name, value in values.items():
+        encoded = name.encode("utf-8")
+        parts.extend((_NAME_LENGTH.pack(len(encoded)), encoded, _encode_value(value)))
+
+    return b"".join(parts)
+
+
+def decode_values(data: bytes) -> Values:
+    values: Values = {}
+    offset = 0
+
+    while offset < len(data):
+        (length,) = _NAME_LENGTH.unpack_from(data, offset)
+        offset += _NAME_LENGTH.size
+        name = data[offset : offset + length].decode("utf-8")
+        values[name], offset = _decode_value(data, offset + length)
+
+    return values
+
+
+def _read_exactly(read, size: int) -> Optional[bytes]:
+    data = b""
+    while len(data) < size:
+        chunk = read(size - len(data))
+        if not chunk:
+            return None
+        data += chunk
+
+    return data
+
+
+def _read_frame(read) -> Optional[bytes]:
+    header = _read_exactly(read, _LENGTH.size)
+    if header is None:
+        return None
+
+    (length,) = _LENGTH.unpack(header)
+    return _read_exactly(read, length)
+
+
+def _frame(payload: bytes) -> bytes:
+    return _LENGTH.pack(len(payload)) + payload
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    server: "AgentServer"
+
+    def handle(self):
+        # Connections are kept open so pooled clients can send any number of requests.
+        while True:
+            request = _read_frame(self.rfile.read)
+            if request is None:
+                return
+
+            self.wfile.write(_frame(self.server.respond(request)))
+
+
+class AgentServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    Serves the values of a single `Credentials` directory over a Unix domain socket, so the key only has to be readable
+    by the agent and the file is only decrypted once per host.
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        socket_path: Union[Text, PathLike],
+        credentials: Credentials,
+        mode: int = 0o600,
+        watch: bool = True,
+        interval: float = 1.0,
+    ):
+        self.socket_path = os.fspath(socket_path)
+        self.credentials = credentials
+
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+
+        # Create the socket with restricted permissions, rather than narrowing them after clients could connect.
+        umask = os.umask(0o777 & ~mode)
+        try:
+            super().__init__(self.socket_path, _Handler)
+        finally:
+            os.umask(umask)
+
+        self.watcher = CredentialsWatcher(credentials, update_environ=False, interval=interval) if watch else None
+
+    def respond(self, request: bytes) -> bytes:
+        op = request[:1]
+
+        try:
+            if op == OP_PING:
+                return STATUS_OK
+
+            values = self.credentials.values()
+
+            if op == OP_VALUES:
+                return STATUS_OK + encode_values(values)
+
+            if op == OP_GET:
+                name = request[1:].decode("utf-8")
+                if name not in values:
+                    return STATUS_NOT_FOUND
+
+                return STATUS_OK + _encode_value(values[name])
+        except Exception as e:
+            return STATUS_ERROR + str(e).encode("utf-8")
+
+        return STATUS_ERROR + b"Unknown operation"
+
+    def serve_forever(self, poll_interval: float = 0.5) -> None:
+        if self.watcher is not None:
+            self.watcher.start()
+
+        super().serve_forever(poll_interval)
+
+    def server_close(self) -> None:
+        super().server_close()
+
+        if self.watcher is not None:
+            self.watcher.stop()
+
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+
+
+class AgentClient:
+    """
+    Reads credentials from an `AgentServer`, keeping a small pool of open connections and caching the values locally.
+
+    If the agent cannot be reached, values are read directly from the `fallback` credentials instead, when given.
+    Cached values are kept for `ttl` seconds, or until `clear` is called when `ttl` is None.
+    """
+
+    def __init__(
+        self,
+        socket_path: Union[Text, PathLike],
+        fallback: Optional[Credentials] = None,
+        pool_size: int = 4,
+        timeout: float = 5.0,
+        ttl: Optional[float] = None,
+    ):
+        self.socket_path = os.fspath(socket_path)
+        self.fallback = fallback
+        self.timeout = timeout
+        self.ttl = ttl
+
+        self._pool: "LifoQueue[socket.socket]" = LifoQueue(pool_size)
+        self._values: Optional[Values] = None
+        self._fetched = 0.0
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def _connect(self) -> socket.socket:
+        try:
+            return self._pool.get_nowait()
+        except Empty:
+            pass
+
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.socket_path)
+        except OSError:
+            sock.close()
+            raise
+
+        return sock
+
+    def _release(self, sock: socket.socket) -> None:
+        try:
+            self._pool.put_nowait(sock)
+        except Full:
+            sock.close()
+
+    def _request(self, payload: bytes) -> bytes:
+        error: Optional[OSError] = None
+
+        # A pooled connection may have been closed by a restarted agent, so retry once on a fresh one.
+        for _ in range(2):
+            try:
+                sock = self._connect()
+            except OSError as e:
+                raise AgentUnavailableException(self.socket_path, e)
+
+            try:
+                sock.sendall(_frame(payload))
+                response = _read_frame(sock.recv)
+            except OSError as e:
+                sock.close()
+                error = e
+                continue
+
+            if response is None:
+                sock.close()
+                error = ConnectionResetError("The agent closed the connection")
+                continue
+
+            self._release(sock)
+
+            if response[:1] == STATUS_ERROR:
+                raise AgentException(response[1:].decode("utf-8"))
+
+            return response
+
+        raise AgentUnavailableException(self.socket_path, error)
+
+    def _cached(self) -> Optional[Values]:
+        values = self._values
+        if values is not None and (self.ttl is None or time.monotonic() - self._fetched < self.ttl):
+            return values
+
+        return None
+
+    def ping(self) -> bool:
+        try:
+            return self._request(OP_PING) == STATUS_OK
+        except AgentUnavailableException:
+            return False
+
+    def values(self) -> Values:
+        values = self._cached()
+        if values is not None:
+            return values
+
+        with self._lock:
+            values = self._cached()
+            if values is not None:
+                return values
+
+            try:
+                values = decode_values(self._request(OP_VALUES)[1:])
+            except AgentUnavailableException:
+                if self.fallback is None:
+                    raise
+                values = self.fallback.values()
+
+            self._values, self._fetched = values, time.monotonic()
+            return values
+
+    def get(self, name: Text, default: Optional[Text] = None) -> Optional[Text]:
+        values = self._cached()
+        if values is not None:
+            return values.get(name, default)
+
+        try:
+            response = self._request(OP_GET + name.encode("utf-8"))
+        except AgentUnavailableException:
+            if self.fallback is None:
+                raise
+            return self.fallback.get(name, default)
+
+        if response[:1] == STATUS_NOT_FOUND:
+            return default
+
+        return _decode_value(response, 1)[0]
+
+    def names(self) -> List[Text]:
+        return list(self.values())
+
+    def load(
+        self,
+        include: Optional[Union[Text, Iterable[Text]]] = None,
+        exclude: Optional[Union[Text, Iterable[Text]]] = None,
+        prefix: Optional[Union[Text, Iterable[Text]]] = None,
+        strip_prefix: bool = False,
+        override: bool = False,
+    ) -> None:
+        """
+        Inject the credentials into `os.environ`, selecting them like `Credentials.load` does.
+        """
+        selective = include is not None or exclude is not None or prefix is not None or strip_prefix or override
+        if self._loaded and not selective:
+            return
+
+        selected = Selector(include, exclude, prefix, strip_prefix).select(self.values())
+        for name, value in selected.items():
+            if override or name not in os.environ:
+                os.environ[name] = value
+
+        if not selective:
+            self._loaded = True
+
+    def clear(self) -> None:
+        self._values = None
+        self._loaded = False
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except Empty:
+                return
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Serve decrypted credentials over a Unix domain socket.")
+    parser.add_argument("--dir", "-d", required=True, help="The directory holding the key and credentials files.")
+    parser.add_argument(
+        "--socket",
+        "-s",
+        default=os.environ.get(SOCKET_ENV),
+        required=SOCKET_ENV not in os.environ,
+        help=f"The path of the socket to listen on. Defaults to ${SOCKET_ENV}.",
+    )
+    parser.add_argument("--mode", type=lambda v: int(v, 8), default=0o600, help="Permissions of the socket file.")
+    args = parser.parse_args(argv)
+
+    credentials = Credentials(args.dir)
+    # Fail on start up rather than on the first request when the files cannot be decrypted.
+    credentials.values()
+
+    with AgentServer(args.socket, credentials, mode=args.mode) as server:
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+import os
+import threading
+from collections import OrderedDict
+from os import PathLike
+from typing import Callable
+from typing import Dict
+from typing import Hashable
+from typing import Optional
+from typing import Text
+from typing import Tuple
+from typing import Union
+
+FileFingerprint = Tuple[int, int, int]
+# The resolved credentials directory, the name of what is cached from it, and its revision.
+Fingerprint = Tuple[str, str, Hashable]
+
+
+def resolve_dir(credentials_dir: Union[Text, PathLike]) -> str:
+    return os.path.realpath(credentials_dir)
+
+
+def file_fingerprint(path: Union[Text, PathLike]) -> FileFingerprint:
+    stat = os.stat(path)
+
+    return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+
+def fingerprint(
+    credentials_dir: Union[Text, PathLike],
+    key_fingerprint: Optional[Hashable],
+    config_path: Union[Text, PathLike],
+) -> Optional[Fingerprint]:
+    if key_fingerprint is None:
+        return None
+
+    try:
+        return (
+            resolve_dir(credentials_dir),
+            os.path.basename(config_path),
+            (key_fingerprint, file_fingerprint(config_path)),
+        )
+    except OSError:
+        return None
+
+
+class CacheEntry:
+    content: str
+    values: Optional[Dict[Text, Optional[Text]]]
+
+    def __init__(self, content: str, values: Optional[Dict[Text, Optional[Text]]] = None):
+        self.content = content
+        self.values = values
+        self._lock = threading.Lock()
+
+    def get_values(self, parse: Callable[[str], Dict[Text, Optional[Text]]]) -> Dict[Text, Optional[Text]]:
+        values = self.values
+        if values is not None:
+            return values
+
+        # Entries are shared between threads, so make sure the content is only parsed once.
+        with self._lock:
+            if self.values is None:
+                self.values = parse(self.content)
+
+            return self.values
+
+
+class _Flight:
+    def __init__(self):
+        self.event = threading.Event()
+        self.entry: Optional[CacheEntry] = None
+        self.error: Optional[BaseException] = None
+
+
+class CredentialsCache:
+    """
+    A size capped LRU cache of decrypted credentials shared by every `Credentials` instance in the process.
+
+    Entries are keyed by the resolved credentials directory, the name of the encrypted file and its revision: the
+    fingerprint of the key's source and the mtime, size and inode of the file. Replacing either is picked up without
+    explicit invalidation.
+    """
+
+    def __init__(self, max_size: int = 16):
+        self.max_size = max_size
+        self._entries: "OrderedDict[Fingerprint, CacheEntry]" = OrderedDict()
+        self._flights: Dict[Fingerprint, _Flight] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Fingerprint) -> Optional[CacheEntry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+
+            return entry
+
+    def get_or_load(self, key: Fingerprint, load: Callable[[], CacheEntry]) -> Tuple[CacheEntry, bool]:
+        """
+        Return the entry for `key` and whether it was already available, calling `load` on a miss. Concurrent misses
+        for the same key wait for the first caller to finish loading instead of loading it again.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry, True
+
+            flight = self._flights.get(key)
+            leader = flight is None
+            if flight is None:
+                flight = self._flights[key] = _Flight()
+
+        if not leader:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+
+            return flight.entry, True  # type: ignore[return-value]
+
+        try:
+            flight.entry = load()
+            self.set(key, flight.entry)
+            return flight.entry, False
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.event.set()
+
+    def set(self, key: Fingerprint, entry: CacheEntry) -> None:
+        if self.max_size <= 0:
+            return
+
+        with self._lock:
+            # Only one revision of a file is ever current, so drop anything older.
+            for stale in [k for k in self._entries if k[:2] == key[:2] and k != key]:
+                del self._entries[stale]
+
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, credentials_dir: Optional[Union[Text, PathLike]] = None) -> None:
+        with self._lock:
+            if credentials_dir is None:
+                self._entries.clear()
+                return
+
+            resolved = resolve_dir(credentials_dir)
+            for key in [k for k in self._entries if k[0] == resolved]:
+                del self._entries[key]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+default_cache = CredentialsCache()
+
+
+def clear_cache(credentials_dir: Optional[Union[Text, PathLike]] = None) -> None:
+    default_cache.invalidate(credentials_dir)
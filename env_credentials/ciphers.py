@@ -0,0 +1,130 @@
+import os
+from time import perf_counter
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import Iterable
+from typing import NamedTuple
+from typing import Optional
+from typing import Tuple
+
+from env_credentials import container
+
+AES_128_GCM = "aes-128-gcm"
+AES_256_GCM = "aes-256-gcm"
+CHACHA20_POLY1305 = "chacha20-poly1305"
+
+DEFAULT_CIPHER = AES_128_GCM
+
+# Picks the fastest cipher on the current host, see `fastest`.
+AUTO = "auto"
+
+
+def _aes_gcm(key: bytes) -> Any:
+    from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+    return AESGCM(key)
+
+
+def _chacha20_poly1305(key: bytes) -> Any:
+    from cryptography.hazmat.primitives.ciphers.aead import ChaCha20Poly1305
+
+    return ChaCha20Poly1305(key)
+
+
+class Cipher(NamedTuple):
+    name: str
+    # The identifier recorded in the header of encrypted files.
+    algorithm: int
+    key_size: int
+    factory: Callable[[bytes], Any]
+
+
+CIPHERS: Dict[str, Cipher] = {
+    AES_128_GCM: Cipher(AES_128_GCM, container.ALGORITHM_AES_GCM, 16, _aes_gcm),
+    AES_256_GCM: Cipher(AES_256_GCM, container.ALGORITHM_AES_256_GCM, 32, _aes_gcm),
+    CHACHA20_POLY1305: Cipher(CHACHA20_POLY1305, container.ALGORITHM_CHACHA20_POLY1305, 32, _chacha20_poly1305),
+}
+
+_NONCE_SIZE = 12
+
+
+class Aead:
+    """
+    An AEAD primitive of cryptography along with the cipher it implements, so the algorithm can be recorded with
+    anything it encrypts. `encrypt` and `decrypt` are the bound methods of the primitive itself.
+    """
+
+    __slots__ = ("cipher", "encrypt", "decrypt")
+
+    def __init__(self, cipher: Cipher, key: bytes):
+        aead = cipher.factory(key)
+
+        self.cipher = cipher
+        self.encrypt = aead.encrypt
+        self.decrypt = aead.decrypt
+
+    @property
+    def algorithm(self) -> int:
+        return self.cipher.algorithm
+
+
+def get_cipher(name: str) -> Cipher:
+    cipher = CIPHERS.get(name)
+
+    if cipher is None:
+        raise ValueError(f"Unknown cipher {name}, expected one of {', '.join(CIPHERS)}")
+
+    return cipher
+
+
+def new_key(name: str = DEFAULT_CIPHER) -> str:
+    """
+    Generate the text of a key file. Keys of the default cipher keep the original `<key>.<nonce>` format, other
+    ciphers are named in front of it, e.g. `chacha20-poly1305:<key>.<nonce>`.
+    """
+    cipher = get_cipher(name)
+    text = f"{os.urandom(cipher.key_size).hex()}.{os.urandom(_NONCE_SIZE).hex()}"
+
+    return text if name == DEFAULT_CIPHER else f"{name}:{text}"
+
+
+def parse_key(text: str) -> Tuple[Aead, bytes]:
+    name, sep, rest = text.strip().rpartition(":")
+    cipher = get_cipher(name if sep else DEFAULT_CIPHER)
+
+    key, nonce = rest.split(".", 2)
+    key_bytes = bytes.fromhex(key)
+
+    if len(key_bytes) != cipher.key_size:
+        raise ValueError(f"Expected a {cipher.key_size * 8} bit key for {cipher.name}, got {len(key_bytes) * 8} bits")
+
+    return Aead(cipher, key_bytes), bytes.fromhex(nonce)
+
+
+def measure(name: str, size: int = 64 * 1024, runs: int = 20) -> float:
+    """
+    Return the best time to encrypt and decrypt `size` bytes with a cipher on this host.
+    """
+    cipher = get_cipher(name)
+    aead = cipher.factory(os.urandom(cipher.key_size))
+    nonce = os.urandom(_NONCE_SIZE)
+    data = os.urandom(size)
+
+    best = float("inf")
+    for _ in range(runs):
+        start = perf_counter()
+        aead.decrypt(nonce, aead.encrypt(nonce, data, None), None)
+        best = min(best, perf_counter() - start)
+
+    return best
+
+
+def fastest(candidates: Optional[Iterable[str]] = None, size: int = 64 * 1024, runs: int = 20) -> str:
+    """
+    Micro-benchmark the candidate ciphers, every cipher by default, and return the name of the fastest. Hosts without
+    AES instructions are usually faster with ChaCha20-Poly1305.
+    """
+    names = list(CIPHERS if candidates is None else candidates)
+
+    return min(names, key=lambda name: measure(name, size, runs))
@@ -0,0 +1,375 @@
+import argparse
+import os
+import sys
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Text
+
+from env_credentials.credentials import Credentials
+from env_credentials.credentials import CredentialsException
+from env_credentials.edit import BUFFERS
+
+DIR_ENV = "ENV_CREDENTIALS_DIR"
+
+FORMATS = ("dotenv", "json")
+
+BUFFER_HELP = (
+    "Where to keep the decrypted file while editing, defaults to $ENV_CREDENTIALS_EDIT_BUFFER or /dev/shm, falling back "
+    "to the credentials directory. A memfd keeps it off every file system, but only suits editors that write in place."
+)
+
+LAYER_HELP = "Work on the credentials of this layer, e.g. production, instead of the base credentials."
+OWN_KEY_HELP = "Give the layer a key of its own instead of sharing the base key."
+COMPRESSION_HELP = "Compress the credentials before encrypting them, with zlib unless another codec is named."
+PASSPHRASE_ACTIONS = ("set", "remove", "forget")
+PASSPHRASE_HELP = (
+    "Protect the key with a passphrase, read from the terminal or $ENV_CREDENTIALS_PASSPHRASE, store it in plain text "
+    "again, or forget the keys derived from passphrases that are cached."
+)
+CIPHER_HELP = "The cipher of a new key, defaults to aes-128-gcm. `auto` picks the fastest cipher on this host."
+
+
+def read_source(path: Optional[str]) -> str:
+    if path is None or path == "-":
+        return sys.stdin.read()
+
+    with open(path, "r") as f:
+        return f.read()
+
+
+def parse_assignments(assignments: List[str]) -> Dict[Text, Optional[Text]]:
+    """
+    Parse `NAME=VALUE` arguments, reading dotenv formatted assignments from stdin when there are none or given `-`.
+    Values are returned as written, for `Credentials.update(values, raw=True)`.
+    """
+    if not assignments or assignments == ["-"]:
+        return parse_changes(read_source(None), "dotenv")
+
+    values: Dict[Text, Optional[Text]] = {}
+    for assignment in assignments:
+        name, sep, value = assignment.partition("=")
+        if not sep or not name:
+            raise CredentialsException(f"Expected NAME=VALUE, got {assignment!r}")
+        values[name] = value
+
+    return values
+
+
+def parse_changes(text: str, format: str) -> Dict[Text, Optional[Text]]:
+    """
+    Parse the values to import from a dotenv file, or a JSON object of names to strings, numbers, booleans or null.
+
+    Values are returned as written in a dotenv file, for `Credentials.update(values, raw=True)`. `${VAR}` references
+    in dotenv files are kept, to be interpolated when the credentials are read rather than from this environment.
+    """
+    if format == "dotenv":
+        from env_credentials.parser import parse
+
+        return parse(text, environ={}, interpolate=False)
+
+    import json
+
+    try:
+        data = json.loads(text)
+    except ValueError as e:
+        raise CredentialsException(f"Invalid JSON: {e}")
+
+    if not isinstance(data, dict):
+        raise CredentialsException("Expected a JSON object of names to values")
+
+    values: Dict[Text, Optional[Text]] = {}
+    for name, value in data.items():
+        if isinstance(value, (dict, list)):
+            raise CredentialsException(f"The value of {name} must be a string, number, boolean or null")
+        values[name] = value if value is None or isinstance(value, str) else json.dumps(value)
+
+    from env_credentials.parser import escape
+
+    # JSON has no interpolation, so its values are taken literally.
+    return {name: value if value is None else escape(value) for name, value in values.items()}
+
+
+def detect_format(path: Optional[str], format: Optional[str]) -> str:
+    if format is not None:
+        return format
+
+    return "json" if path is not None and path.endswith(".json") else "dotenv"
+
+
+def _init(creds: Credentials, args: argparse.Namespace) -> int:
+    creds.initialize(own_key=args.own_key)
+    if args.passphrase:
+        change_passphrase(creds, "set")
+    return 0
+
+
+def change_passphrase(creds: Credentials, action: str) -> None:
+    from env_credentials.passphrase import forget
+    from env_credentials.passphrase import new_passphrase
+
+    if action == "forget":
+        forget()
+    elif action == "set":
+        creds.set_passphrase(new_passphrase())
+    else:
+        creds.set_passphrase(None)
+
+
+def _passphrase(creds: Credentials, args: argparse.Namespace) -> int:
+    change_passphrase(creds, args.action)
+    return 0
+
+
+def _edit(creds: Credentials, args: argparse.Namespace) -> int:
+    creds.edit(args.buffer)
+    return 0
+
+
+def _show(creds: Credentials, args: argparse.Namespace) -> int:
+    sys.stdout.write(creds.read_file())
+    return 0
+
+
+def _get(creds: Credentials, args: argparse.Namespace) -> int:
+    value = creds.get(args.name)
+
+    if value is None:
+        if args.name not in creds.names():
+            print(f"{args.name} is not defined in the credentials", file=sys.stderr)
+            return 1
+        return 0
+
+    print(value)
+    return 0
+
+
+def _set(creds: Credentials, args: argparse.Namespace) -> int:
+    creds.update(parse_assignments(args.assignments), raw=True)
+    return 0
+
+
+def _unset(creds: Credentials, args: argparse.Namespace) -> int:
+    creds.unset(args.names)
+    return 0
+
+
+def _import(creds: Credentials, args: argparse.Namespace) -> int:
+    creds.update(parse_changes(read_source(args.file), detect_format(args.file, args.format)), raw=True)
+    return 0
+
+
+def rotate_directories(args: argparse.Namespace, report: Callable[[str], None]) -> int:
+    from env_credentials.discovery import find_directories
+    from env_credentials.rotation import FAILED
+    from env_credentials.rotation import Journal
+    from env_credentials.rotation import rotate
+
+    directories = args.paths or [args.dir]
+    if args.recursive:
+        directories = find_directories(directories)
+
+    def progress(result, done, total):
+        error = f": {result.error}" if result.error else ""
+        report(f"[{done}/{total}] {result.status} {result.directory} ({result.duration * 1000:.1f}ms){error}")
+
+    results = rotate(
+        directories,
+        workers=args.workers,
+        processes=args.processes,
+        dry_run=args.dry_run,
+        journal=Journal(args.journal) if args.journal else None,
+        progress=progress,
+    )
+
+    return 1 if any(r.status == FAILED for r in results) else 0
+
+
+def add_rotate_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("paths", nargs="*", help="The credentials directories to rotate. Defaults to --dir.")
+    parser.add_argument(
+        "--recursive",
+        "-r",
+        action="store_true",
+        help="Rotate every credentials directory found below the given paths.",
+    )
+    parser.add_argument("--workers", "-j", type=int, default=None, help="The number of directories to rotate at once.")
+    parser.add_argument("--processes", action="store_true", help="Rotate on a process pool instead of threads.")
+    parser.add_argument("--dry-run", action="store_true", help="Only check that every directory can be decrypted.")
+    parser.add_argument(
+        "--journal",
+        help="Record rotated directories in this file, and skip the directories it already lists when resuming.",
+    )
+
+
+def _rotate(creds: Optional[Credentials], args: argparse.Namespace) -> int:
+    return rotate_directories(args, lambda line: print(line, file=sys.stderr))
+
+
+def add_verify_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("paths", nargs="*", help="The credentials directories to verify. Defaults to --dir.")
+    parser.add_argument(
+        "--recursive",
+        "-r",
+        action="store_true",
+        help="Verify every credentials directory found below the given paths.",
+    )
+    parser.add_argument("--require", action="append", default=[], help="A name every directory must define.")
+    parser.add_argument("--schema", help="A file listing required names, one per line or as a JSON list.")
+    parser.add_argument("--format", choices=("text", "json", "junit"), default="text", help="The format of the report.")
+    parser.add_argument("--output", "-o", help="Write the report to this file instead of stdout.")
+    parser.add_argument("--workers", "-j", type=int, default=None, help="The number of directories to verify at once.")
+
+
+def verify_directories(args: argparse.Namespace, write: Callable[[str], None]) -> int:
+    from env_credentials.discovery import find_directories
+    from env_credentials.verify import REPORTS
+    from env_credentials.verify import read_schema
+    from env_credentials.verify import verify
+
+    directories = args.paths or [args.dir]
+    if args.recursive:
+        # Directories missing their key are reported rather than skipped.
+        directories = find_directories(directories, require_key=False)
+
+    required = list(args.require)
+    if args.schema:
+        required.extend(read_schema(args.schema))
+
+    results = verify(directories, required=required, workers=args.workers)
+    report = REPORTS[args.format](results)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report + "\n")
+    else:
+        write(report)
+
+    return 0 if all(r.ok for r in results) else 1
+
+
+def _verify(creds: Optional[Credentials], args: argparse.Namespace) -> int:
+    return verify_directories(args, print)
+
+
+def _exec(creds: Credentials, args: argparse.Namespace) -> int:
+    command = args.args[1:] if args.args[:1] == ["--"] else args.args
+    if not command:
+        print("A command to run must be provided", file=sys.stderr)
+        return 2
+
+    # Like `Credentials.load`, values already set in the environment take precedence.
+    env = {name: value for name, value in creds.values().items() if value is not None}
+    env.update(os.environ)
+
+    sys.stdout.flush()
+    sys.stderr.flush()
+    os.execvpe(command[0], command, env)
+
+    return 0
+
+
+def add_compression_argument(parser: argparse.ArgumentParser) -> None:
+    from env_credentials.compression import DEFAULT_CODEC
+    from env_credentials.compression import codecs
+
+    parser.add_argument(
+        "--compression",
+        nargs="?",
+        const=DEFAULT_CODEC,
+        default=None,
+        choices=sorted(codecs()),
+        help=COMPRESSION_HELP,
+    )
+
+
+def add_cipher_argument(parser: argparse.ArgumentParser) -> None:
+    from env_credentials.ciphers import AUTO
+    from env_credentials.ciphers import CIPHERS
+
+    parser.add_argument("--cipher", choices=tuple(CIPHERS) + (AUTO,), default=None, help=CIPHER_HELP)
+
+
+def _parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="env-credentials", description="Manage encrypted dotenv credentials.")
+    parser.add_argument(
+        "--dir",
+        "-d",
+        default=os.environ.get(DIR_ENV, "."),
+        help=f"The directory in which the configuration and key files are stored. Defaults to ${DIR_ENV} or the "
+        "current directory.",
+    )
+    parser.add_argument("--layer", "-l", default=None, help=LAYER_HELP)
+    subparsers = parser.add_subparsers(dest="command")
+
+    init = subparsers.add_parser("init", help="Initialize the credentials and master key files.")
+    init.add_argument("--own-key", action="store_true", help=OWN_KEY_HELP)
+    add_compression_argument(init)
+    add_cipher_argument(init)
+    init.add_argument("--passphrase", action="store_true", help="Protect the new key with a passphrase.")
+    init.set_defaults(handler=_init)
+    edit = subparsers.add_parser("edit", help="Open the credentials file in your editor for altering.")
+    edit.add_argument("--buffer", choices=("auto",) + BUFFERS, help=BUFFER_HELP)
+    edit.set_defaults(handler=_edit)
+    subparsers.add_parser("show", help="Decrypt and print the credentials file to the terminal.").set_defaults(handler=_show)
+
+    get = subparsers.add_parser("get", help="Print the value of a single credential.")
+    get.add_argument("name")
+    get.set_defaults(handler=_get)
+
+    set_ = subparsers.add_parser("set", help="Set one or more credentials in a single write.")
+    set_.add_argument("assignments", nargs="*", help="NAME=VALUE pairs. Dotenv formatted lines are read from stdin if omitted.")
+    set_.set_defaults(handler=_set)
+
+    unset = subparsers.add_parser("unset", help="Remove one or more credentials in a single write.")
+    unset.add_argument("names", nargs="+")
+    unset.set_defaults(handler=_unset)
+
+    import_ = subparsers.add_parser("import", help="Set the credentials from a dotenv or JSON file in a single write.")
+    import_.add_argument("file", nargs="?", help="The file to import. Read from stdin if omitted or `-`.")
+    import_.add_argument("--format", choices=FORMATS, help="The format of the file. Defaults to JSON for .json files.")
+    import_.set_defaults(handler=_import)
+
+    rotate = subparsers.add_parser("rotate", help="Re-encrypt the credentials of one or many directories with new keys.")
+    add_rotate_arguments(rotate)
+    rotate.set_defaults(handler=_rotate, credentials=False)
+
+    verify = subparsers.add_parser("verify", help="Check that credentials decrypt, parse and define required names.")
+    add_verify_arguments(verify)
+    verify.set_defaults(handler=_verify, credentials=False)
+
+    passphrase = subparsers.add_parser("passphrase", help="Manage the passphrase protecting the key.")
+    passphrase.add_argument("action", choices=PASSPHRASE_ACTIONS, help=PASSPHRASE_HELP)
+    passphrase.set_defaults(handler=_passphrase)
+
+    execute = subparsers.add_parser("exec", help="Run a command with the credentials in its environment.")
+    execute.add_argument("args", nargs=argparse.REMAINDER, help="The command to run, after `--`.")
+    execute.set_defaults(handler=_exec)
+
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = _parser()
+    args = parser.parse_args(argv)
+
+    if args.command is None:
+        parser.print_help(sys.stderr)
+        return 2
+
+    try:
+        creds = (
+            Credentials(
+                args.dir,
+                layer=args.layer,
+                compression=getattr(args, "compression", None),
+                cipher=getattr(args, "cipher", None),
+            )
+            if getattr(args, "credentials", True)
+            else None
+        )
+        return args.handler(creds, args)
+    except CredentialsException as e:
+        print(e.message, file=sys.stderr)
+        return 1
@@ -0,0 +1,97 @@
+from typing import Callable
+from typing import Dict
+from typing import NamedTuple
+from typing import Union
+
+# Identifiers are stored in the header of compressed files, so they must never change. Identifiers from 128 up are
+# left for codecs registered by applications.
+CODEC_NONE = 0
+CODEC_ZLIB = 1
+CODEC_BZ2 = 2
+CODEC_LZMA = 3
+
+DEFAULT_CODEC = "zlib"
+
+
+class Codec(NamedTuple):
+    id: int
+    name: str
+    compress: Callable[[bytes], bytes]
+    decompress: Callable[[bytes], bytes]
+
+
+def _identity(data: bytes) -> bytes:
+    return data
+
+
+def _zlib_compress(data: bytes) -> bytes:
+    import zlib
+
+    return zlib.compress(data, 9)
+
+
+def _zlib_decompress(data: bytes) -> bytes:
+    import zlib
+
+    return zlib.decompress(data)
+
+
+def _bz2_compress(data: bytes) -> bytes:
+    import bz2
+
+    return bz2.compress(data)
+
+
+def _bz2_decompress(data: bytes) -> bytes:
+    import bz2
+
+    return bz2.decompress(data)
+
+
+def _lzma_compress(data: bytes) -> bytes:
+    import lzma
+
+    return lzma.compress(data)
+
+
+def _lzma_decompress(data: bytes) -> bytes:
+    import lzma
+
+    return lzma.decompress(data)
+
+
+_codecs: Dict[int, Codec] = {}
+_names: Dict[str, Codec] = {}
+
+
+def register(codec: Codec) -> None:
+    """
+    Make a codec available for writing by its name, and for reading files that record its identifier.
+    """
+    if not 0 <= codec.id <= 255:
+        raise ValueError(f"Codec identifiers must fit in a byte, got {codec.id}")
+
+    existing = _codecs.get(codec.id)
+    if existing is not None and existing.name != codec.name:
+        raise ValueError(f"Codec identifier {codec.id} is already used by {existing.name}")
+
+    _codecs[codec.id] = _names[codec.name] = codec
+
+
+def get_codec(codec: Union[int, str]) -> Codec:
+    found = _codecs.get(codec) if isinstance(codec, int) else _names.get(codec)
+
+    if found is None:
+        raise ValueError(f"Unknown compression codec {codec}")
+
+    return found
+
+
+def codecs() -> Dict[str, Codec]:
+    return dict(_names)
+
+
+register(Codec(CODEC_NONE, "none", _identity, _identity))
+register(Codec(CODEC_ZLIB, "zlib", _zlib_compress, _zlib_decompress))
+register(Codec(CODEC_BZ2, "bz2", _bz2_compress, _bz2_decompress))
+register(Codec(CODEC_LZMA, "lzma", _lzma_compress, _lzma_decompress))
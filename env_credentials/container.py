@@ -0,0 +1,245 @@
+import os
+import struct
+from typing import IO
+from typing import Any
+from typing import Dict
+from typing import Iterable
+from typing import List
+from typing import NamedTuple
+from typing import Optional
+from typing import Tuple
+
+MAGIC = b"ENVC"
+INDEXED_MAGIC = b"ENVI"
+VERSION = 1
+# Version 2 adds the codec the plaintext was compressed with, see `env_credentials.compression`.
+CODEC_VERSION = 2
+
+# AES-GCM with a 128 bit key, see `env_credentials.ciphers` for the others.
+ALGORITHM_AES_GCM = 1
+ALGORITHM_AES_256_GCM = 2
+ALGORITHM_CHACHA20_POLY1305 = 3
+
+ALGORITHMS = (ALGORITHM_AES_GCM, ALGORITHM_AES_256_GCM, ALGORITHM_CHACHA20_POLY1305)
+
+_HEADER = struct.Struct(">4sBBB")
+_CODEC_HEADER = struct.Struct(">4sBBBB")
+
+CODEC_HEADER_SIZE = _CODEC_HEADER.size
+_INDEXED_HEADER = struct.Struct(">4sBBQI")
+
+_NONCE_SIZE = 12
+
+
+class Container(NamedTuple):
+    version: int
+    algorithm: int
+    nonce: bytes
+    ciphertext: bytes
+    codec: int = 0
+    # The header the ciphertext is bound to, None for the first version, whose header is not authenticated.
+    associated_data: Optional[bytes] = None
+
+
+def is_container(data: bytes) -> bool:
+    # Legacy files are hex text, which can never start with the magic bytes.
+    return data[: len(MAGIC)] in (MAGIC, INDEXED_MAGIC)
+
+
+def is_indexed(data: bytes) -> bool:
+    return data[: len(INDEXED_MAGIC)] == INDEXED_MAGIC
+
+
+def pack(nonce: bytes, ciphertext: bytes, algorithm: int = ALGORITHM_AES_GCM, codec: int = 0) -> bytes:
+    if not codec:
+        # Uncompressed files keep the first version, so they can still be read by older releases.
+        return b"".join((_HEADER.pack(MAGIC, VERSION, algorithm, len(nonce)), nonce, ciphertext))
+
+    return b"".join((_codec_header(algorithm, codec, len(nonce)), nonce, ciphertext))
+
+
+def _codec_header(algorithm: int, codec: int, nonce_length: int) -> bytes:
+    return _CODEC_HEADER.pack(MAGIC, CODEC_VERSION, algorithm, codec, nonce_length)
+
+
+def seal(aead: Any, plaintext: bytes, codec: int = 0) -> bytes:
+    """
+    Encrypt `plaintext` with a fresh random nonce, which is stored in the header. A nonce must never be used twice with
+    the same key, so every revision of a file gets its own.
+    """
+    nonce = os.urandom(_NONCE_SIZE)
+    algorithm = getattr(aead, "algorithm", ALGORITHM_AES_GCM)
+    # The header of compressed files is authenticated, so the codec cannot be changed without the key.
+    associated_data = _codec_header(algorithm, codec, len(nonce)) if codec else None
+
+    return pack(nonce, aead.encrypt(nonce, plaintext, associated_data), algorithm, codec)
+
+
+def codec_of(data: bytes) -> int:
+    """
+    Return the codec recorded in the header at the start of `data`, 0 for files that are not compressed.
+    """
+    if len(data) < _CODEC_HEADER.size or data[: len(MAGIC)] != MAGIC or data[len(MAGIC)] != CODEC_VERSION:
+        return 0
+
+    return _CODEC_HEADER.unpack_from(data)[3]
+
+
+def unpack(data: bytes) -> Container:
+    if len(data) < _HEADER.size:
+        raise ValueError("Truncated credentials header")
+
+    magic, version, algorithm, nonce_length = _HEADER.unpack_from(data)
+
+    if magic != MAGIC:
+        raise ValueError("Missing credentials header")
+
+    codec = 0
+    header_size = _HEADER.size
+    associated_data = None
+    if version == CODEC_VERSION:
+        if len(data) < _CODEC_HEADER.size:
+            raise ValueError("Truncated credentials header")
+
+        _, _, _, codec, nonce_length = _CODEC_HEADER.unpack_from(data)
+        header_size = _CODEC_HEADER.size
+        associated_data = data[:header_size]
+    elif version != VERSION:
+        raise ValueError(f"Unsupported credentials format version {version}")
+
+    if algorithm not in ALGORITHMS:
+        raise ValueError(f"Unsupported credentials algorithm {algorithm}")
+
+    offset = header_size + nonce_length
+    if len(data) < offset:
+        raise ValueError("Truncated credentials header")
+
+    return Container(version, algorithm, data[header_size:offset], data[offset:], codec, associated_data)
+
+
+def check_algorithm(algorithm: int, aead: Any) -> None:
+    if algorithm not in ALGORITHMS:
+        raise ValueError(f"Unsupported credentials algorithm {algorithm}")
+
+    expected = getattr(aead, "algorithm", ALGORITHM_AES_GCM)
+    if algorithm != expected:
+        raise ValueError(f"The credentials are encrypted with algorithm {algorithm}, but the key is for {expected}")
+
+
+def seal_record(aead: Any, name: str, value: Optional[str]) -> bytes:
+    # Records are bound to their name so they cannot be swapped around inside the file.
+    nonce = os.urandom(_NONCE_SIZE)
+    plaintext = b"\x00" if value is None else b"\x01" + value.encode("utf-8")
+
+    return nonce + aead.encrypt(nonce, plaintext, name.encode("utf-8"))
+
+
+def _open(aead: Any, sealed: bytes, associated_data: bytes) -> bytes:
+    from cryptography.exceptions import InvalidTag
+
+    try:
+        return aead.decrypt(sealed[:_NONCE_SIZE], sealed[_NONCE_SIZE:], associated_data)
+    except InvalidTag:
+        raise ValueError("The credentials could not be authenticated, the key is wrong or the file was modified")
+
+
+def open_record(aead: Any, name: str, record: bytes) -> Optional[str]:
+    plaintext = _open(aead, record, name.encode("utf-8"))
+
+    if plaintext[:1] == b"\x00":
+        return None
+
+    try:
+        return plaintext[1:].decode("utf-8")
+    except UnicodeDecodeError:
+        # The error would quote the plaintext.
+        raise ValueError(f"The record of {name} is not valid UTF-8") from None
+
+
+def pack_indexed(aead: Any, records: Iterable[Tuple[str, bytes]], algorithm: int = ALGORITHM_AES_GCM) -> bytes:
+    body: List[bytes] = []
+    index: List[Tuple[str, int, int]] = []
+    offset = _INDEXED_HEADER.size
+
+    for name, record in records:
+        body.append(record)
+        index.append((name, offset, len(record)))
+        offset += len(record)
+
+    import json
+
+    prefix = struct.pack(">4sBB", INDEXED_MAGIC, VERSION, algorithm)
+    nonce = os.urandom(_NONCE_SIZE)
+    sealed_index = nonce + aead.encrypt(nonce, json.dumps(index, separators=(",", ":")).encode("utf-8"), prefix)
+    header = _INDEXED_HEADER.pack(INDEXED_MAGIC, VERSION, algorithm, offset, len(sealed_index))
+
+    return b"".join([header, *body, sealed_index])
+
+
+class IndexedReader:
+    """
+    Reads single records out of an indexed credentials file without touching the rest of the file.
+    """
+
+    def __init__(self, f: IO[bytes], aead: Any):
+        self._file = f
+        self._aead = aead
+
+        header = f.read(_INDEXED_HEADER.size)
+        if len(header) < _INDEXED_HEADER.size:
+            raise ValueError("Truncated credentials header")
+
+        magic, version, algorithm, index_offset, index_length = _INDEXED_HEADER.unpack(header)
+
+        if magic != INDEXED_MAGIC:
+            raise ValueError("Missing credentials header")
+
+        if version != VERSION:
+            raise ValueError(f"Unsupported credentials format version {version}")
+
+        check_algorithm(algorithm, aead)
+
+        f.seek(index_offset)
+        sealed_index = f.read(index_length)
+        if len(sealed_index) < index_length:
+            raise ValueError("Truncated credentials index")
+
+        import json
+
+        prefix = header[:6]
+        index = json.loads(_open(aead, sealed_index, prefix))
+
+        self.index: Dict[str, Tuple[int, int]] = {name: (offset, length) for name, offset, length in index}
+
+    def names(self) -> List[str]:
+        return list(self.index)
+
+    def raw(self, name: str) -> bytes:
+        offset, length = self.index[name]
+
+        self._file.seek(offset)
+        record = self._file.read(length)
+        if len(record) < length:
+            raise ValueError("Truncated credentials record")
+
+        return record
+
+    def get(self, name: str) -> Optional[str]:
+        value = open_record(self._aead, name, self.raw(name))
+        if value is None or "${" not in value:
+            return value
+
+        # References resolve against the records before this one, exactly as they would in a dotenv file.
+        return self.values()[name]
+
+    def written(self) -> Dict[str, Optional[str]]:
+        """
+        The values as written, with `${VAR}` references left unresolved.
+        """
+        return {name: open_record(self._aead, name, self.raw(name)) for name in self.index}
+
+    def values(self) -> Dict[str, Optional[str]]:
+        from env_credentials.parser import resolve
+
+        # Records hold the values as written, so they are interpolated when read, like the blob format is.
+        return resolve(self.written().items())
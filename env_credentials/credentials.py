@@ -1,18 +1,42 @@
 import os
-import re
-import secrets
-from io import StringIO
+import threading
+from contextlib import ExitStack
+from io import BytesIO
 from os import PathLike
 from pathlib import Path
+from time import perf_counter
+from typing import TYPE_CHECKING
+from typing import Any
+from typing import ContextManager
 from typing import Dict
+from typing import Hashable
+from typing import Iterable
+from typing import List
+from typing import Mapping
 from typing import Optional
+from typing import Sequence
+from typing import Set
 from typing import Text
 from typing import Tuple
 from typing import Union
 
-from cryptography.hazmat.primitives.ciphers.aead import AESGCM
-from dotenv import dotenv_values
-from dotenv import load_dotenv
+from env_credentials import container
+from env_credentials.cache import CacheEntry
+from env_credentials.cache import CredentialsCache
+from env_credentials.cache import Fingerprint
+from env_credentials.cache import default_cache
+from env_credentials.cache import fingerprint
+from env_credentials.instrumentation import record
+from env_credentials.instrumentation import record_cache
+
+# cryptography, the parser's regular expressions and friends dominate the import time of this module, so they are
+# only imported once a file is actually decrypted, parsed or written.
+if TYPE_CHECKING:
+    from concurrent.futures import Executor
+
+    from env_credentials.ciphers import Aead
+    from env_credentials.keys import KeySource
+    from env_credentials.passphrase import Params
 
 
 class CredentialsException(Exception):
@@ -32,7 +56,7 @@ class DirectoryNotFoundException(CredentialsException):
 
 class KeyNotFoundException(CredentialsException):
     def __init__(self, file: Union[Text, PathLike]):
-        self.message = f"Could not find key file: {file}"
+        self.message = f"Could not find key: {file}"
 
 
 class CredentialsNotFoundException(CredentialsException):
@@ -46,62 +70,541 @@ class InvalidKeyException(CredentialsException):
         self.previous = previous
 
 
+class LockTimeoutException(CredentialsException):
+    def __init__(self, file: Union[Text, PathLike]):
+        self.message = f"Timed out waiting for the lock on {file}"
+
+
+class InvalidCredentialsFileException(CredentialsException):
+    def __init__(self, file: Union[Text, PathLike], previous):
+        self.message = f"The credentials file {file} is invalid: {previous}"
+        self.previous = previous
+
+
+def _parse(content: Text, interpolate: bool = True) -> Dict[Text, Optional[Text]]:
+    start = perf_counter()
+
+    from env_credentials.parser import parse
+
+    values = parse(content, interpolate=interpolate)
+    record("parse", perf_counter() - start, len(content))
+
+    return values
+
+
+def _quote(value: Text) -> Text:
+    return "'" + value.replace("\\", "\\\\").replace("'", "\\'") + "'"
+
+
+def _written(value: Optional[Text]) -> Optional[Text]:
+    # The value as written in a file, which is interpolated when read, so `${` is escaped to keep it literal.
+    if value is None or "${" not in value:
+        return value
+
+    from env_credentials.parser import escape
+
+    return escape(value)
+
+
+def _statement(name: Text, written: Optional[Text]) -> Text:
+    return f"{name}\n" if written is None else f"{name}={_quote(written)}\n"
+
+
+def format_values(values: Dict[Text, Optional[Text]]) -> Text:
+    return "".join(_statement(name, _written(value)) for name, value in values.items())
+
+
+def _new_key(cipher: Optional[str] = None) -> str:
+    from env_credentials.ciphers import DEFAULT_CIPHER
+    from env_credentials.ciphers import new_key
+
+    try:
+        return new_key(cipher or DEFAULT_CIPHER)
+    except ValueError as e:
+        raise CredentialsException(str(e))
+
+
+def _parse_key(text: str) -> Tuple["Aead", bytes]:
+    from env_credentials.ciphers import parse_key
+
+    try:
+        if _is_wrapped(text):
+            from env_credentials.passphrase import unwrap
+
+            text = unwrap(text)
+
+        return parse_key(text)
+    except ValueError as e:
+        raise InvalidKeyException(e)
+
+
+def _is_wrapped(text: str) -> bool:
+    # See `env_credentials.passphrase`, which is only imported for keys that need it.
+    return text.lstrip().startswith("scrypt$")
+
+
+def _decompress(path: Union[Text, PathLike], codec: int, data: bytes) -> bytes:
+    from env_credentials.compression import get_codec
+
+    try:
+        return get_codec(codec).decompress(data)
+    except Exception as e:
+        raise InvalidCredentialsFileException(path, e)
+
+
+def _sync_directory(directory: Union[Text, PathLike]) -> None:
+    # Makes a rename durable. Directories cannot be opened for syncing on every platform, so this is best effort.
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _umask() -> int:
+    # The umask can only be read by setting it.
+    umask = os.umask(0o22)
+    os.umask(umask)
+    return umask
+
+
+def _replace_file(
+    path: Union[Text, PathLike],
+    data: bytes,
+    mode_from: Optional[Union[Text, PathLike]] = None,
+    sync_directory: bool = False,
+    mode: Optional[int] = None,
+) -> None:
+    import tempfile
+
+    path = os.fspath(path)
+    mode_from = path if mode_from is None else mode_from
+
+    # Write next to the file and rename over it, so readers only ever see the old or the new file.
+    fd, temp_path = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", dir=os.path.dirname(path) or ".")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+
+        if mode is None:
+            # mkstemp creates the file readable by its owner only, while new files are expected to follow the umask.
+            mode = os.stat(mode_from).st_mode & 0o7777 if os.path.exists(mode_from) else 0o666 & ~_umask()
+        os.chmod(temp_path, mode)
+
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+    if sync_directory:
+        _sync_directory(os.path.dirname(path) or ".")
+
+
 class Credentials:
-    key: AESGCM
+    key: "Aead"
     nonce: bytes
 
     _key_filename = "master.key"
+    # Holds the new key while a rotation is in progress, see `rotate_key`.
+    _new_key_filename = "master.key.new"
     _config_filename = "credentials.env.enc"
+    _lock_filename = "credentials.env.enc.lock"
 
     _content: Optional[str] = None
     _values: Optional[Dict] = None
     _loaded: bool = False
+    _cache_entry: Optional[CacheEntry] = None
+    # The fingerprint of the key source when the key was loaded, see `_ensure_key`.
+    _key_revision: Optional[Hashable] = None
+
+    # The executor the async methods offload file I/O and decryption to, the loop's default executor when None.
+    executor: Optional["Executor"] = None
 
-    def __init__(self, credentials_dir: Union[Text, PathLike]):
+    # Also fsync the directory after replacing a file, so the new file survives a power loss and not just a crash.
+    sync_directory: bool = False
+    # How long writes wait for other writers to release the lock, indefinitely when None.
+    lock_timeout: Optional[float] = None
+
+    def __init__(
+        self,
+        credentials_dir: Union[Text, PathLike],
+        cache: Optional[CredentialsCache] = default_cache,
+        indexed: Optional[bool] = None,
+        key_source: Optional[Union["KeySource", Sequence["KeySource"]]] = None,
+        layer: Optional[Text] = None,
+        compression: Optional[Union[bool, Text]] = None,
+        cipher: Optional[Text] = None,
+    ):
         if not Path(credentials_dir).exists():
             raise DirectoryNotFoundException(credentials_dir)
 
+        if layer is not None:
+            if not layer or os.sep in layer or (os.altsep and os.altsep in layer) or layer.startswith("."):
+                raise CredentialsException(f"Invalid layer name {layer!r}")
+
+            # Layers are stored next to the base credentials, see `env_credentials.layers`.
+            self._key_filename = f"{layer}.key"
+            self._new_key_filename = f"{layer}.key.new"
+            self._config_filename = f"credentials.{layer}.env.enc"
+            self._lock_filename = f"credentials.{layer}.env.enc.lock"
+
         self.credentials_dir = credentials_dir
+        self.cache = cache
+        self.indexed = indexed
+        self.key_source = key_source
+        self.layer = layer
+        self.compression = compression
+        self.cipher = cipher
+        self._lock = threading.RLock()
+        self._pending: Dict[Tuple, Any] = {}
 
-    def initialize(self):
-        self._generate_key()
+    def initialize(self, own_key: bool = False):
+        """
+        Create the key and credentials files if they do not exist yet. Layers share the base key unless `own_key` is
+        given, or they already have a key of their own.
+        """
+        self._generate_key(own_key)
         self._generate_file()
 
+    def fingerprint(self) -> Optional[Fingerprint]:
+        """
+        Identify the current revision of the key and credentials file, or None if either is missing.
+        """
+        return fingerprint(self.credentials_dir, self.key_fingerprint(), self.get_config_path())
+
+    def _cache_key(self) -> Optional[Fingerprint]:
+        if self.cache is None:
+            return None
+
+        return self.fingerprint()
+
     def _read(self) -> str:
-        if self._content:
-            return self._content
+        content = self._content
+        if content is not None:
+            return content
+
+        with self._lock:
+            return self._entry().content
+
+    def _entry(self) -> CacheEntry:
+        # Must be called with the lock held. The entry is published last so the lock free reads in `_read` and
+        # `values` never see partial state.
+        entry = self._cache_entry
+        if entry is not None:
+            return entry
+
+        cache = self.cache
+        cache_key = self._cache_key()
+
+        if cache is not None and cache_key is not None:
+            entry, hit = cache.get_or_load(cache_key, self._decrypt)
+            record_cache(hit)
+        else:
+            entry = self._decrypt()
+
+        self._cache_entry = entry
+        self._content = entry.content
+
+        return entry
 
-        if not hasattr(self, "key") or not hasattr(self, "nonce") or not self.key or not self.nonce:
-            self.key, self.nonce = self._get_key()
+    def _decrypt(self) -> CacheEntry:
+        self._ensure_key()
 
         path = Path(self.get_config_path())
 
         if not path.exists():
             raise CredentialsNotFoundException(path)
 
-        with open(path) as f:
-            encrypted = f.read()
+        start = perf_counter()
+        with open(path, "rb") as f:
+            data = f.read()
+        record("read", perf_counter() - start, len(data))
 
-        self._content = self.key.decrypt(self.nonce, bytes.fromhex(encrypted), None).decode("utf-8")
+        from cryptography.exceptions import InvalidTag
 
-        return self._content
+        codec = 0
+        start = perf_counter()
+        try:
+            if container.is_indexed(data):
+                from env_credentials.parser import resolve
+
+                # Indexed files are already parsed, so there is no need to parse the content again. The content keeps
+                # the values as written, so rewriting it, as `edit` and `rotate_key` do, keeps references unresolved.
+                written = container.IndexedReader(BytesIO(data), self.key).written()
+                content = "".join(_statement(name, value) for name, value in written.items())
+                entry = CacheEntry(content, resolve(written.items()))
+            else:
+                if container.is_container(data):
+                    unpacked = container.unpack(data)
+                    container.check_algorithm(unpacked.algorithm, self.key)
+                    nonce, encrypted, codec = unpacked.nonce, unpacked.ciphertext, unpacked.codec
+                    associated_data = unpacked.associated_data
+                else:
+                    nonce, encrypted = self.nonce, bytes.fromhex(data.decode("ascii"))
+                    associated_data = None
+
+                plaintext = self.key.decrypt(nonce, encrypted, associated_data)
+        except (ValueError, InvalidTag) as e:
+            raise InvalidCredentialsFileException(path, e)
+        record("decrypt", perf_counter() - start, len(data))
+
+        if container.is_indexed(data):
+            return entry
+
+        if codec:
+            # The plaintext is only decompressed once it is authenticated.
+            start = perf_counter()
+            plaintext = _decompress(path, codec, plaintext)
+            record("decompress", perf_counter() - start, len(plaintext))
+
+        try:
+            return CacheEntry(plaintext.decode("utf-8"))
+        except UnicodeDecodeError:
+            # The error would quote the plaintext.
+            raise InvalidCredentialsFileException(path, "the decrypted content is not valid UTF-8") from None
+
+    def _ensure_key(self) -> None:
+        """
+        Load the key, or load it again when its source changed since it was loaded, e.g. rotated by another process.
+        An unchanged key is neither read nor parsed again, so writes never need a preceding decrypt or another read of
+        the key file.
+        """
+        loaded = hasattr(self, "key") and hasattr(self, "nonce") and self.key and self.nonce
+        revision = self.key_fingerprint()
+        # Keys assigned explicitly, such as while rotating, are used as they are.
+        if loaded and (self._key_revision is None or revision == self._key_revision):
+            return
+
+        self.key, self.nonce = self._get_key()
+        self._key_revision = revision
 
     def values(self) -> Dict[Text, Optional[Text]]:
-        if not self._values:
-            self._values = dotenv_values(stream=StringIO(self._read()))
+        values = self._values
+        if values is not None:
+            return values
+
+        with self._lock:
+            if self._values is None:
+                # Entries may be shared with other instances, so hand out a copy.
+                self._values = dict(self._entry().get_values(_parse))
+
+            return self._values
+
+    def _is_indexed_file(self) -> bool:
+        path = Path(self.get_config_path())
+
+        if not path.exists():
+            return False
+
+        with open(path, "rb") as f:
+            return container.is_indexed(f.read(len(container.INDEXED_MAGIC)))
+
+    def get(self, name: Text, default: Optional[Text] = None) -> Optional[Text]:
+        if self._values is None and self._content is None:
+            cache_key = self._cache_key()
+            entry = self.cache.get(cache_key) if self.cache is not None and cache_key is not None else None
+
+            if entry is None and self._is_indexed_file():
+                self._ensure_key()
+                path = Path(self.get_config_path())
+
+                try:
+                    with open(path, "rb") as f:
+                        reader = container.IndexedReader(f, self.key)
+                        return reader.get(name) if name in reader.index else default
+                except ValueError as e:
+                    raise InvalidCredentialsFileException(path, e)
+
+        return self.values().get(name, default)
+
+    def names(self) -> List[Text]:
+        if self._values is None and self._content is None and self._is_indexed_file():
+            self._ensure_key()
+            path = Path(self.get_config_path())
+
+            try:
+                with open(path, "rb") as f:
+                    return container.IndexedReader(f, self.key).names()
+            except ValueError as e:
+                raise InvalidCredentialsFileException(path, e)
+
+        return list(self.values())
+
+    def set(self, name: Text, value: Optional[Text]) -> None:
+        self.update({name: value})
+
+    def update(self, values: Mapping[Text, Optional[Text]], raw: bool = False) -> None:
+        """
+        Set every name in `values`, decrypting and encrypting the file only once however many values change.
+
+        With `raw`, the values are taken as written in a dotenv file, so `${VAR}` references in them are interpolated
+        whenever the credentials are read rather than stored literally.
+        """
+        self._change({name: value if raw else _written(value) for name, value in values.items()}, set())
+
+    def unset(self, names: Iterable[Text]) -> None:
+        """
+        Remove every definition of `names`. Names that are not defined are ignored.
+        """
+        self._change({}, set(names))
+
+    def _change(self, updates: Dict[Text, Optional[Text]], removals: Set[Text]) -> None:
+        # `updates` holds the values as written, see `update`.
+        if not updates and not removals:
+            return
+
+        from env_credentials.parser import is_name
+
+        for name, value in updates.items():
+            if not is_name(name):
+                raise CredentialsException(f"{name!r} is not a valid name, names cannot contain whitespace, = or #")
+
+            # The closing quote would be read as escaped, here and by python-dotenv.
+            if value is not None and value.endswith("\\"):
+                raise CredentialsException(f"The value of {name} cannot end with a backslash")
+
+        with self._lock, self.lock():
+            # Merge into the current file rather than whatever this instance read before another writer changed it.
+            self.clear()
+
+            if self._is_indexed_file() and self.indexed is not False:
+                self._change_records(updates, removals)
+            else:
+                from env_credentials.parser import rewrite
+
+                # Rewrite only the changed statements, so comments and the order of the file are kept.
+                content = self._read()
+                statements = {name: _statement(name, value) for name, value in updates.items()}
+                changed = rewrite(content, statements, removals)
+
+                if changed != content:
+                    self.write_file(changed)
+
+            self.clear()
+
+    def _change_records(self, updates: Dict[Text, Optional[Text]], removals: Set[Text]) -> None:
+        start = perf_counter()
+        self._ensure_key()
+        path = Path(self.get_config_path())
+
+        # Only the changed records are re-encrypted, every other record is copied over as is.
+        try:
+            with open(path, "rb") as f:
+                reader = container.IndexedReader(f, self.key)
+                records = [(n, reader.raw(n)) for n in reader.index if n not in removals]
+        except ValueError as e:
+            raise InvalidCredentialsFileException(path, e)
+
+        sealed = {name: container.seal_record(self.key, name, value) for name, value in updates.items()}
+        records = [(n, sealed.pop(n, r)) for n, r in records]
+        records.extend(sealed.items())
+
+        data = container.pack_indexed(self.key, records, self.key.algorithm)
+        self._write_bytes(data)
+
+        record("write", perf_counter() - start, len(data))
+
+    def load(
+        self,
+        include: Optional[Union[Text, Iterable[Text]]] = None,
+        exclude: Optional[Union[Text, Iterable[Text]]] = None,
+        prefix: Optional[Union[Text, Iterable[Text]]] = None,
+        strip_prefix: bool = False,
+        override: bool = False,
+    ) -> None:
+        """
+        Inject the credentials into `os.environ`, without replacing variables that are already set unless `override`
+        is given.
+
+        `include`, `exclude`, `prefix` and `strip_prefix` limit which credentials are injected and under which name,
+        see `Selector`. Credentials that are not injected can still be read with `values`.
+        """
+        selective = include is not None or exclude is not None or prefix is not None or strip_prefix or override
+        if self._loaded and not selective:
+            return
+
+        with self._lock:
+            if self._loaded and not selective:
+                return
+
+            start = perf_counter()
+
+            values = self.values()
+            if selective:
+                from env_credentials.selection import Selector
+
+                selected = Selector(include, exclude, prefix, strip_prefix).select(values)
+            else:
+                selected = {name: value for name, value in values.items() if value is not None}
+
+            for name, value in selected.items():
+                if override or name not in os.environ:
+                    os.environ[name] = value
+
+            if not selective:
+                self._loaded = True
+
+            record("load", perf_counter() - start, len(selected))
+
+    async def _in_executor(self, operation: Tuple, func, *args):
+        import asyncio
+
+        # Concurrent awaits of the same operation share a single call in the executor, and shielding keeps one
+        # cancelled caller from cancelling it for everyone else.
+        loop = asyncio.get_running_loop()
+        future = self._pending.get(operation)
+
+        if future is None or future.get_loop() is not loop:
+            future = loop.run_in_executor(self.executor, func, *args)
+            self._pending[operation] = future
 
-        return self._values
+            def done(f):
+                if self._pending.get(operation) is f:
+                    del self._pending[operation]
 
-    def load(self) -> None:
+            future.add_done_callback(done)
+
+        return await asyncio.shield(future)
+
+    async def avalues(self) -> Dict[Text, Optional[Text]]:
+        values = self._values
+        if values is not None:
+            return values
+
+        return await self._in_executor(("values",), self.values)
+
+    async def aget(self, name: Text, default: Optional[Text] = None) -> Optional[Text]:
+        values = self._values
+        if values is not None:
+            return values.get(name, default)
+
+        return await self._in_executor(("get", name, default), self.get, name, default)
+
+    async def aload(self) -> None:
         if self._loaded:
             return
 
-        load_dotenv(stream=StringIO(self._read()))
-        self._loaded = True
+        await self._in_executor(("load",), self.load)
+
+    async def awrite_file(self, data) -> None:
+        import asyncio
+
+        await asyncio.get_running_loop().run_in_executor(self.executor, self.write_file, data)
 
     def _ignore_key(self, key_path):
         ignore_file = os.path.join(self.credentials_dir, ".gitignore")
 
+        import re
+
         rel_path = os.path.relpath(key_path, self.credentials_dir)
 
         if os.path.exists(ignore_file):
@@ -117,88 +620,445 @@ class Credentials:
             with open(ignore_file, "a") as f:
                 f.write(rel_path)
 
-    def _generate_key(self):
+    def _generate_key(self, own_key: bool = False):
         full_file_path = os.path.join(self.credentials_dir, self._key_filename)
+        own_key = own_key and self.layer is not None and self.key_source is None
 
-        if os.path.exists(full_file_path):
+        # A key provided by any source, such as the environment or the base layer, is used as is.
+        if os.path.exists(full_file_path) or (
+            not own_key and (self.key_source is not None or self.key_fingerprint() is not None)
+        ):
             key, nonce = self._get_key()
             return full_file_path, key, nonce
 
-        key = AESGCM.generate_key(128)
-        nonce = secrets.token_hex(12)
+        text = _new_key(self._new_cipher())
         with open(full_file_path, "w") as f:
-            f.write(f"{key.hex()}.{nonce}")
+            f.write(text)
 
-        self.key = AESGCM(key)
-        self.nonce = bytes.fromhex(nonce)
+        self.key, self.nonce = _parse_key(text)
+        self._key_revision = self.key_fingerprint()
 
         self._ignore_key(full_file_path)
+        # The advisory locks of every layer live next to the credentials, see `lock`.
+        self._ignore_key(os.path.join(self.credentials_dir, "*.env.enc.lock"))
 
     def _generate_file(self):
+        encrypted_path = os.path.join(self.credentials_dir, self._config_filename)
+        if os.path.exists(encrypted_path):
+            return
+
+        if self.layer is not None:
+            # The example values would override the ones of the layers below.
+            self.write_file(f"# Credentials of the {self.layer} layer, overriding the layers below it\n")
+            return
+
         sample_path = os.path.join(os.path.dirname(os.path.realpath(__file__)), "example.env")
         with open(sample_path) as s:
-            txt = s.read()
-            encrypted_path = os.path.join(self.credentials_dir, self._config_filename)
-            if os.path.exists(encrypted_path):
-                return
+            self.write_file(s.read())
 
-            self.write_file(txt)
+    def _new_cipher(self) -> Optional[str]:
+        from env_credentials.ciphers import AUTO
 
-    def _get_key(self) -> Tuple[AESGCM, bytes]:
-        key = None
-        path = Path(self.credentials_dir, self._key_filename)
+        if self.cipher == AUTO:
+            from env_credentials.ciphers import fastest
 
-        if not path.exists():
-            raise KeyNotFoundException(path)
+            return fastest()
 
-        with open(path) as f:
-            key = f.read()
+        return self.cipher
 
-        try:
-            key, nonce = key.split(".", 2)
+    def get_key_sources(self) -> List["KeySource"]:
+        """
+        The sources the key is read from, in order of precedence. See `env_credentials.keys.default_sources` for the
+        sources used when no `key_source` was given.
+        """
+        from env_credentials.keys import FileKeySource
+        from env_credentials.keys import KeySource
+        from env_credentials.keys import default_sources
 
-            return AESGCM(bytes.fromhex(key)), bytes.fromhex(nonce)
-        except ValueError as e:
-            raise InvalidKeyException(e)
+        if self.key_source is None and self.layer is not None:
+            # A layer's own key takes precedence over the base key.
+            return [FileKeySource(self.get_key_path())] + default_sources(
+                os.path.join(self.credentials_dir, Credentials._key_filename)
+            )
+
+        if self.key_source is None:
+            return default_sources(self.get_key_path())
+
+        if isinstance(self.key_source, KeySource):
+            return [self.key_source]
+
+        return list(self.key_source)
+
+    def key_fingerprint(self) -> Optional[Hashable]:
+        """
+        Identify the key currently provided by the first available source, or None if there is none.
+        """
+        from env_credentials.keys import find_source
+
+        return find_source(self.get_key_sources())[1]
+
+    def _get_key(self) -> Tuple["Aead", bytes]:
+        from env_credentials.keys import find_source
+        from env_credentials.keys import key_cache
+
+        start = perf_counter()
+
+        sources = self.get_key_sources()
+        source, key_fingerprint = find_source(sources)
+
+        if source is None or key_fingerprint is None:
+            raise KeyNotFoundException(" or ".join(str(s) for s in sources))
+
+        # Parsed keys are shared by every instance reading the same key, so only the first reads and parses it.
+        parsed = key_cache.get(key_fingerprint)
+        size = 0
+        if parsed is None:
+            key = source.read()
+            parsed = _parse_key(key)
+            size = len(key)
+
+            # Keys protected by a passphrase are only kept as long as the derived key is, see `set_passphrase`.
+            if not _is_wrapped(key):
+                key_cache.set(key_fingerprint, parsed)
+
+        record("key", perf_counter() - start, size)
+
+        return parsed
+
+    def _uses_key_file(self) -> bool:
+        from env_credentials.keys import FileKeySource
+        from env_credentials.keys import find_source
+
+        source, _ = find_source(self.get_key_sources())
+
+        return isinstance(source, FileKeySource) and os.path.realpath(source.path) == os.path.realpath(self.get_key_path())
+
+    def rotate_key(self) -> None:
+        """
+        Re-encrypt the credentials with a newly generated key, along with every layer sharing the key. Values are
+        re-encrypted as written, so `${VAR}` references are still resolved when read rather than when rotated.
+
+        The new key is first written to `master.key.new`, then the layers and the credentials file are replaced and
+        finally the key. If the process is interrupted in between, `recover_key` (which is also called by this method)
+        finishes or discards the rotation, depending on which key the credentials file is encrypted with.
+        """
+        if not self._uses_key_file():
+            raise CredentialsException(
+                f"Only keys stored in {self.get_key_path()} can be rotated, the key is provided by another source"
+            )
+
+        with self._lock, self.lock(), ExitStack() as stack:
+            layers = self._shared_layers()
+            for layer in layers:
+                stack.enter_context(layer._lock)
+                stack.enter_context(layer.lock())
+
+            self.recover_key()
+            self.clear()
+
+            content = self._read()
+            contents = [layer._read() for layer in layers]
+            self._ensure_key()
+            # The new key keeps the cipher of the current one, unless another cipher was chosen.
+            cipher = self._new_cipher() or self.key.cipher.name
+
+            new_key_path = self.get_new_key_path()
+            text = _new_key(cipher)
+            stored = text
+
+            with open(self.get_key_path()) as f:
+                current = f.read()
+
+            if _is_wrapped(current):
+                from env_credentials.passphrase import rewrap
+
+                # The new key is protected by the same passphrase.
+                stored = rewrap(current, text)
+
+            _replace_file(new_key_path, stored.encode("ascii"), mode_from=self.get_key_path())
+            self._ignore_key(new_key_path)
+
+            self.key, self.nonce = _parse_key(text)
+            # The credentials file goes last, as `recover_key` completes the rotation once it uses the new key.
+            for layer, layer_content in zip(layers, contents):
+                layer.key, layer.nonce = self.key, self.nonce
+                layer._write_file(layer_content, sync_directory=False)
+            self._write_file(content, sync_directory=False)
+
+            os.replace(new_key_path, self.get_key_path())
+            if self.sync_directory:
+                # One sync covers the replaced credentials file and key.
+                _sync_directory(self.credentials_dir)
+            self.clear()
+
+    def set_passphrase(self, passphrase: Optional[str], params: Optional["Params"] = None) -> None:
+        """
+        Protect the key file with `passphrase`, or store the key in plain text again when it is None.
+
+        Unlocking a protected key derives a key from the passphrase with scrypt, which is deliberately slow. Derived
+        keys are cached for `ENV_CREDENTIALS_PASSPHRASE_TTL` seconds, see `env_credentials.passphrase`.
+        """
+        from env_credentials.passphrase import unwrap
+        from env_credentials.passphrase import wrap
+
+        if not self._uses_key_file():
+            raise CredentialsException(f"Only keys stored in {self.get_key_path()} can be protected by a passphrase")
+
+        with self._lock, self.lock():
+            key_path = self.get_key_path()
+            with open(key_path) as f:
+                text = f.read().strip()
+
+            if _is_wrapped(text):
+                text = unwrap(text)
+
+            _parse_key(text)
+            stored = text if passphrase is None else wrap(text, passphrase, params)
+
+            _replace_file(key_path, stored.encode("ascii"), sync_directory=self.sync_directory)
+
+    def recover_key(self) -> bool:
+        """
+        Complete a rotation that was interrupted after the credentials were encrypted with the new key, returning
+        whether there was one. A new key that the credentials are not encrypted with yet is removed.
+        """
+        new_key_path = self.get_new_key_path()
+        if not os.path.exists(new_key_path):
+            return False
+
+        with self._lock, self.lock():
+            if not os.path.exists(new_key_path):
+                return False
+
+            with open(new_key_path) as f:
+                new_key = _parse_key(f.read())
+
+            current = (self.key, self.nonce) if "key" in self.__dict__ and "nonce" in self.__dict__ else None
+            self.key, self.nonce = new_key
+
+            try:
+                self._decrypt()
+            except InvalidCredentialsFileException:
+                # Layers that were already encrypted with the new key are encrypted with the current one again.
+                for layer in self._shared_layers():
+                    with layer._lock, layer.lock():
+                        layer.key, layer.nonce = new_key
+                        try:
+                            content = layer._decrypt().content
+                        except InvalidCredentialsFileException:
+                            continue
+
+                        del layer.key, layer.nonce
+                        layer._write_file(content)
+
+                os.remove(new_key_path)
+                if current is None:
+                    del self.key, self.nonce
+                else:
+                    self.key, self.nonce = current
+                return False
+
+            os.replace(new_key_path, self.get_key_path())
+            if self.sync_directory:
+                _sync_directory(self.credentials_dir)
+            self.clear()
+            return True
+
+    def _shared_layers(self) -> List["Credentials"]:
+        # Layers without a key of their own are encrypted with the base key, see `get_key_sources`.
+        if self.layer is not None or self.key_source is not None:
+            return []
+
+        prefix, suffix = "credentials.", ".env.enc"
+        layers = []
+        for name in sorted(os.listdir(self.credentials_dir)):
+            if not name.startswith(prefix) or not name.endswith(suffix) or len(name) <= len(prefix + suffix):
+                continue
+
+            try:
+                layer = Credentials(self.credentials_dir, cache=None, layer=name[len(prefix) : -len(suffix)])
+            except CredentialsException:
+                continue
+
+            if not os.path.exists(layer.get_key_path()):
+                layers.append(layer)
+
+        return layers
 
     def get_key_path(self) -> str:
         return os.path.join(self.credentials_dir, self._key_filename)
 
+    def get_new_key_path(self) -> str:
+        return os.path.join(self.credentials_dir, self._new_key_filename)
+
+    def get_lock_path(self) -> str:
+        return os.path.join(self.credentials_dir, self._lock_filename)
+
+    def lock(self, timeout: Optional[float] = None) -> ContextManager[None]:
+        """
+        Return a context manager holding the advisory lock every write of these credentials takes, so a read, modify
+        and write sequence is not interleaved with another writer. Readers never take the lock. Methods writing the
+        credentials always take the lock of this instance before this one, never the other way around.
+
+        Waits at most `timeout` seconds, defaulting to `lock_timeout`, before raising `LockTimeoutException`.
+        """
+        from env_credentials.locking import file_lock
+
+        return file_lock(self.get_lock_path(), self.lock_timeout if timeout is None else timeout)
+
     def get_config_path(self) -> str:
         return os.path.join(self.credentials_dir, self._config_filename)
 
     def read_file(self) -> str:
         return self._read()
 
-    def write_file(self, data):
-        with open(self.get_config_path(), "w") as e:
-            e.write(
-                self.key.encrypt(
-                    self.nonce,
-                    bytes(data, "utf-8"),
-                    None,
-                ).hex()
-            )
+    def is_indexed_format(self) -> bool:
+        path = Path(self.get_config_path())
+
+        if not path.exists():
+            raise CredentialsNotFoundException(path)
+
+        return self._is_indexed_file()
+
+    def is_legacy_format(self) -> bool:
+        path = Path(self.get_config_path())
+
+        if not path.exists():
+            raise CredentialsNotFoundException(path)
+
+        with open(path, "rb") as f:
+            return not container.is_container(f.read(len(container.MAGIC)))
+
+    def migrate(self) -> bool:
+        with self._lock, self.lock():
+            if (
+                not self.is_legacy_format()
+                and (self.indexed is None or self.indexed == self.is_indexed_format())
+                and (self.compression is None or self._codec() == self._file_codec())
+                and not self._reuses_key_nonce()
+            ):
+                return False
+
+            self.write_file(self.read_file())
+            return True
+
+    def _reuses_key_nonce(self) -> bool:
+        # Earlier versions encrypted every revision of the file with the nonce stored in the key.
+        with open(self.get_config_path(), "rb") as f:
+            data = f.read()
+
+        if not container.is_container(data) or container.is_indexed(data):
+            return False
+
+        self._ensure_key()
 
-    def edit(self):
-        decrypted_filename = Path(self.credentials_dir, "decrypted.ini")
         try:
-            with open(decrypted_filename, "w") as f:
-                f.write(self.read_file())
+            return container.unpack(data).nonce == self.nonce
+        except ValueError as e:
+            raise InvalidCredentialsFileException(self.get_config_path(), e)
+
+    def _file_codec(self) -> int:
+        path = self.get_config_path()
+
+        if not os.path.exists(path):
+            return 0
+
+        with open(path, "rb") as f:
+            return container.codec_of(f.read(container.CODEC_HEADER_SIZE))
+
+    def _codec(self) -> int:
+        # Without an explicit choice, files keep the codec they were written with.
+        if self.compression is None:
+            return self._file_codec()
+
+        if self.compression is False:
+            return 0
+
+        from env_credentials.compression import DEFAULT_CODEC
+        from env_credentials.compression import get_codec
+
+        try:
+            return get_codec(DEFAULT_CODEC if self.compression is True else self.compression).id
+        except ValueError as e:
+            raise CredentialsException(str(e))
+
+    def write_file(self, data):
+        with self._lock, self.lock():
+            self._write_file(data)
 
-            os.system(f'{os.getenv("EDITOR")} {decrypted_filename}')
+    def _write_file(self, data, sync_directory: Optional[bool] = None):
+        start = perf_counter()
 
-            with open(decrypted_filename, "r") as f:
-                txt = f.read()
-                self.write_file(txt)
+        # Reads may have been served by the cache, which never loads the key.
+        self._ensure_key()
+
+        indexed = self.indexed if self.indexed is not None else self._is_indexed_file()
+
+        if indexed:
+            # Stored as written, so `${VAR}` is interpolated when read, as it is for the blob format.
+            values = _parse(data, interpolate=False)
+            records = [(name, container.seal_record(self.key, name, value)) for name, value in values.items()]
+
+            self._write_bytes(container.pack_indexed(self.key, records, self.key.algorithm), sync_directory)
+        else:
+            codec = self._codec()
+            plaintext = bytes(data, "utf-8")
 
+            if codec:
+                from env_credentials.compression import get_codec
+
+                plaintext = get_codec(codec).compress(plaintext)
+
+            # The nonce of the key is only used to read files written as hex by older versions.
+            self._write_bytes(container.seal(self.key, plaintext, codec), sync_directory)
+
+        record("write", perf_counter() - start, len(data))
+
+    def _write_bytes(self, data: bytes, sync_directory: Optional[bool] = None) -> None:
+        sync_directory = self.sync_directory if sync_directory is None else sync_directory
+        _replace_file(self.get_config_path(), data, sync_directory=sync_directory)
+
+        if self.cache is not None:
+            self.cache.invalidate(self.credentials_dir)
+
+    def edit(self, buffer: Optional[str] = None) -> bool:
+        """
+        Open the decrypted credentials in `$EDITOR` and encrypt the result, returning whether anything changed.
+
+        The plaintext is staged in memory where possible, see `env_credentials.edit.open_buffer`. Other writers wait
+        until the editor is closed, rather than having their changes overwritten.
+        """
+        import shlex
+        import subprocess
+
+        from env_credentials.edit import open_buffer
+
+        with self._lock, self.lock():
             self.clear()
+            content = self.read_file()
+
+            with open_buffer(content, os.path.join(self.credentials_dir, "decrypted.ini"), buffer) as staged:
+                editor = os.getenv("EDITOR") or "vi"
+                result = subprocess.run(f"{editor} {shlex.quote(staged.path)}", shell=True, pass_fds=staged.pass_fds)
+
+                if result.returncode != 0:
+                    raise CredentialsException(f"The editor exited with status {result.returncode}, nothing was changed")
+
+                edited = staged.read()
 
-        finally:
-            if decrypted_filename.is_file():
-                os.remove(decrypted_filename)
+            if edited == content:
+                return False
+
+            self.write_file(edited)
+            self.clear()
+            return True
 
     def clear(self):
-        self._content = None
-        self._values = None
-        self._loaded = None
+        with self._lock:
+            self._content = None
+            self._values = None
+            self._loaded = False
+            self._cache_entry = None
+
+        if self.cache is not None:
+            self.cache.invalidate(self.credentials_dir)
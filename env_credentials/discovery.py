@@ -0,0 +1,25 @@
+import os
+from typing import Iterable
+from typing import List
+from typing import Text
+
+from env_credentials.credentials import Credentials
+
+# Directories that never hold credentials, but can be very large in a monorepo.
+_PRUNED = {"node_modules", "__pycache__", "venv"}
+
+
+def find_directories(roots: Iterable[Text], require_key: bool = True) -> List[str]:
+    """
+    Find every directory below `roots` that holds a credentials file, and a key file unless `require_key` is False.
+    """
+    found = []
+
+    for root in roots:
+        for directory, dirs, files in os.walk(root):
+            dirs[:] = sorted(d for d in dirs if not d.startswith(".") and d not in _PRUNED)
+
+            if Credentials._config_filename in files and (not require_key or Credentials._key_filename in files):
+                found.append(directory)
+
+    return found
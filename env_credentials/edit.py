@@ -0,0 +1,152 @@
+import os
+from typing import Optional
+from typing import Text
+from typing import Tuple
+
+from env_credentials.credentials import CredentialsException
+
+# Staging areas for the plaintext while it is being edited. `auto` picks `shm` where it is available and `file`
+# otherwise, `memfd` has to be chosen explicitly as not every editor can work with it, see `open_buffer`.
+BUFFERS = ("memfd", "shm", "file")
+
+BUFFER_ENV = "ENV_CREDENTIALS_EDIT_BUFFER"
+
+_SHM_DIR = "/dev/shm"
+
+_MFD_CLOEXEC = 0x0001
+
+
+def _memfd_create(name: str) -> int:
+    if hasattr(os, "memfd_create"):
+        return os.memfd_create(name, os.MFD_CLOEXEC)  # type: ignore[attr-defined]
+
+    # Python builds linked against an older libc lack the wrapper even though the kernel supports it.
+    import ctypes
+    import ctypes.util
+
+    libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+    fd = libc.memfd_create(os.fsencode(name), _MFD_CLOEXEC)
+    if fd < 0:
+        raise OSError(ctypes.get_errno(), "memfd_create failed")
+
+    return fd
+
+
+def memfd_available() -> bool:
+    return os.path.isdir("/dev/fd") and (hasattr(os, "memfd_create") or os.uname().sysname == "Linux")
+
+
+class EditBuffer:
+    """
+    Holds the decrypted content while the editor runs. `path` is handed to the editor, which also inherits `pass_fds`.
+    """
+
+    path: str
+    pass_fds: Tuple[int, ...] = ()
+
+    def read(self) -> Text:
+        with open(self.path, "r") as f:
+            return f.read()
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self) -> "EditBuffer":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+class MemfdBuffer(EditBuffer):
+    # An anonymous memory backed file that disappears with the last descriptor, even if the process is killed. The
+    # editor opens it through its own copy of the descriptor.
+
+    def __init__(self, content: Text):
+        self.fd = _memfd_create("credentials.env")
+        try:
+            os.write(self.fd, content.encode("utf-8"))
+        except BaseException:
+            os.close(self.fd)
+            raise
+
+        self.path = f"/dev/fd/{self.fd}"
+        self.pass_fds = (self.fd,)
+
+    def read(self) -> Text:
+        os.lseek(self.fd, 0, os.SEEK_SET)
+        chunks = []
+        while True:
+            chunk = os.read(self.fd, 65536)
+            if not chunk:
+                break
+            chunks.append(chunk)
+
+        return b"".join(chunks).decode("utf-8")
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+class FileBuffer(EditBuffer):
+    def __init__(self, content: Text, path: str, directory: Optional[str] = None):
+        self.path = path
+        self.directory = directory
+
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as f:
+            f.write(content)
+
+    def close(self) -> None:
+        if self.directory is not None:
+            import shutil
+
+            shutil.rmtree(self.directory, ignore_errors=True)
+        elif os.path.isfile(self.path):
+            os.remove(self.path)
+
+
+def _shm_buffer(content: Text) -> FileBuffer:
+    import shutil
+    import tempfile
+
+    # A private directory on tmpfs keeps the extension, so editors still highlight the syntax.
+    directory = tempfile.mkdtemp(prefix="env-credentials-", dir=_SHM_DIR)
+    try:
+        return FileBuffer(content, os.path.join(directory, "credentials.env"), directory)
+    except BaseException:
+        shutil.rmtree(directory, ignore_errors=True)
+        raise
+
+
+def open_buffer(content: Text, fallback_path: str, buffer: Optional[str] = None) -> EditBuffer:
+    """
+    Stage `content` for editing in `buffer`, one of `BUFFERS`, defaulting to `$ENV_CREDENTIALS_EDIT_BUFFER` or `auto`.
+    `auto` uses a private directory on tmpfs, only falling back to a plaintext file at `fallback_path` when there is
+    none.
+
+    A memfd never touches any file system, but the editor has to write to `/dev/fd/N` in place. Editors that save by
+    renaming a new file over the old one, or that hand the path to a server in another process such as `code --wait`
+    or `emacsclient`, cannot use it.
+    """
+    buffer = buffer or os.environ.get(BUFFER_ENV) or "auto"
+    if buffer not in BUFFERS and buffer != "auto":
+        raise CredentialsException(f"Unknown edit buffer {buffer!r}, expected one of auto, {', '.join(BUFFERS)}")
+
+    if buffer == "memfd":
+        if not memfd_available():
+            raise CredentialsException("The memfd edit buffer is not available on this system")
+
+        return MemfdBuffer(content)
+
+    if buffer in ("auto", "shm") and os.path.isdir(_SHM_DIR) and os.access(_SHM_DIR, os.W_OK):
+        try:
+            return _shm_buffer(content)
+        except OSError:
+            if buffer == "shm":
+                raise
+
+    if buffer == "shm":
+        raise CredentialsException("The shm edit buffer is not available on this system")
+
+    return FileBuffer(content, fallback_path)
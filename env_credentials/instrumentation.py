@@ -0,0 +1,108 @@
+import threading
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Optional
+
+
+class Observer:
+    """
+    Receives timings from `Credentials`. Subclass and override the methods you are interested in.
+
+    Phases are `key` (reading and parsing the key), `read` (reading the encrypted file), `decrypt`, `decompress` (only
+    for compressed files), `parse`, `load` (injecting into `os.environ`) and `write` (compressing, encrypting and writing
+    the file). `size` is the number of bytes the phase worked on, when it is known.
+    """
+
+    def on_phase(self, phase: str, duration: float, size: Optional[int]) -> None:
+        pass
+
+    def on_cache(self, hit: bool) -> None:
+        pass
+
+
+class PhaseStats:
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+        self.bytes = 0
+
+    def add(self, duration: float, size: Optional[int]) -> None:
+        self.count += 1
+        self.total += duration
+        self.min = duration if self.min is None else min(self.min, duration)
+        self.max = duration if self.max is None else max(self.max, duration)
+        self.bytes += size or 0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "total_s": self.total,
+            "min_s": self.min,
+            "max_s": self.max,
+            "bytes": self.bytes,
+        }
+
+
+class Stats(Observer):
+    """
+    Aggregates the timings of every phase, along with cache hits and misses, since it was created or last reset.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.phases: Dict[str, PhaseStats] = {}
+            self.cache_hits = 0
+            self.cache_misses = 0
+
+    def on_phase(self, phase: str, duration: float, size: Optional[int]) -> None:
+        with self._lock:
+            if phase not in self.phases:
+                self.phases[phase] = PhaseStats()
+
+            self.phases[phase].add(duration, size)
+
+    def on_cache(self, hit: bool) -> None:
+        with self._lock:
+            if hit:
+                self.cache_hits += 1
+            else:
+                self.cache_misses += 1
+
+    def as_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "phases": {name: phase.as_dict() for name, phase in self.phases.items()},
+                "cache": {"hits": self.cache_hits, "misses": self.cache_misses},
+            }
+
+
+stats = Stats()
+
+_observers: List[Observer] = [stats]
+
+
+def add_observer(observer: Observer) -> None:
+    if observer not in _observers:
+        _observers.append(observer)
+
+
+def remove_observer(observer: Observer) -> None:
+    if observer in _observers:
+        _observers.remove(observer)
+
+
+def record(phase: str, duration: float, size: Optional[int] = None) -> None:
+    for observer in list(_observers):
+        observer.on_phase(phase, duration, size)
+
+
+def record_cache(hit: bool) -> None:
+    for observer in list(_observers):
+        observer.on_cache(hit)
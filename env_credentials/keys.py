@@ -0,0 +1,213 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import TYPE_CHECKING
+from typing import Callable
+from typing import Dict
+from typing import Hashable
+from typing import List
+from typing import Optional
+from typing import Sequence
+from typing import Text
+from typing import Tuple
+
+if TYPE_CHECKING:
+    from env_credentials.ciphers import Aead
+
+KEY_ENV = "ENV_CREDENTIALS_MASTER_KEY"
+KEY_FD_ENV = "ENV_CREDENTIALS_MASTER_KEY_FD"
+KEY_FILE_ENV = "ENV_CREDENTIALS_MASTER_KEY_FILE"
+
+ParsedKey = Tuple["Aead", bytes]
+
+
+class KeySource:
+    """
+    Somewhere a master key can be read from.
+
+    `fingerprint` must be cheap, it is called on every read to find the first available source and to look up the
+    parsed key. It returns None when the source has no key, and otherwise a value that changes whenever the key does.
+    """
+
+    def fingerprint(self) -> Optional[Hashable]:
+        raise NotImplementedError
+
+    def read(self) -> Text:
+        raise NotImplementedError
+
+    def __str__(self) -> str:
+        return self.__class__.__name__
+
+
+class EnvKeySource(KeySource):
+    def __init__(self, variable: str = KEY_ENV):
+        self.variable = variable
+
+    def fingerprint(self) -> Optional[Hashable]:
+        value = os.environ.get(self.variable)
+        # Only a hash of the key ends up in the cache keys.
+        return None if not value else ("env", self.variable, hash(value))
+
+    def read(self) -> Text:
+        return os.environ[self.variable].strip()
+
+    def __str__(self) -> str:
+        return f"${self.variable}"
+
+
+class FileKeySource(KeySource):
+    def __init__(self, path: Text):
+        self.path = path
+
+    def fingerprint(self) -> Optional[Hashable]:
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+
+        return "file", os.path.realpath(self.path), stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+    def read(self) -> Text:
+        with open(self.path) as f:
+            return f.read().strip()
+
+    def __str__(self) -> str:
+        return str(self.path)
+
+
+class FdKeySource(KeySource):
+    # Descriptors, such as a pipe from a secrets manager, can usually only be read once, so the key is kept.
+
+    def __init__(self, fd: int):
+        self.fd = fd
+        self._key: Optional[Text] = None
+
+    def fingerprint(self) -> Optional[Hashable]:
+        try:
+            key = self.read()
+        except OSError:
+            return None
+
+        return ("fd", self.fd, hash(key)) if key else None
+
+    def read(self) -> Text:
+        if self._key is None:
+            chunks = []
+            while True:
+                chunk = os.read(self.fd, 4096)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+            self._key = b"".join(chunks).decode("ascii").strip()
+
+        return self._key
+
+    def __str__(self) -> str:
+        return f"file descriptor {self.fd}"
+
+
+class CallableKeySource(KeySource):
+    """
+    A key returned by `func`, such as one fetched from a secrets manager. `func` is only called once and its key kept,
+    unless `version` is given, which is called on every read instead and must be cheap. The key is fetched again
+    whenever the version it returns changes.
+    """
+
+    def __init__(self, func: Callable[[], Optional[Text]], version: Optional[Callable[[], Hashable]] = None):
+        self.func = func
+        self.version = version
+        self._key: Optional[Text] = None
+        self._version: Optional[Hashable] = None
+        self._fetched = False
+        self._lock = threading.Lock()
+
+    def _get(self) -> Optional[Text]:
+        version = self.version() if self.version is not None else None
+
+        with self._lock:
+            if not self._fetched or version != self._version:
+                self._key = self.func()
+                self._version = version
+                self._fetched = True
+
+            return self._key
+
+    def fingerprint(self) -> Optional[Hashable]:
+        key = self._get()
+        return ("callable", id(self.func), hash(key)) if key else None
+
+    def read(self) -> Text:
+        return (self._get() or "").strip()
+
+    def __str__(self) -> str:
+        return repr(self.func)
+
+
+_fd_sources: Dict[str, FdKeySource] = {}
+
+
+def default_sources(key_path: Text) -> List[KeySource]:
+    """
+    The key sources in order of precedence: the key itself in `ENV_CREDENTIALS_MASTER_KEY`, an inherited descriptor
+    numbered by `ENV_CREDENTIALS_MASTER_KEY_FD`, a file named by `ENV_CREDENTIALS_MASTER_KEY_FILE`, and finally
+    `master.key` in the credentials directory.
+    """
+    sources: List[KeySource] = [EnvKeySource(KEY_ENV)]
+
+    fd = os.environ.get(KEY_FD_ENV)
+    if fd:
+        # The descriptor is read once, every instance shares that read.
+        if fd not in _fd_sources:
+            _fd_sources[fd] = FdKeySource(int(fd))
+        sources.append(_fd_sources[fd])
+
+    path = os.environ.get(KEY_FILE_ENV)
+    if path:
+        sources.append(FileKeySource(path))
+
+    sources.append(FileKeySource(key_path))
+
+    return sources
+
+
+def find_source(sources: Sequence[KeySource]) -> Tuple[Optional[KeySource], Optional[Hashable]]:
+    for source in sources:
+        fingerprint = source.fingerprint()
+        if fingerprint is not None:
+            return source, fingerprint
+
+    return None, None
+
+
+class KeyCache:
+    """
+    Parsed keys by the fingerprint of their source, so instances reading the same key skip reading and parsing it.
+    """
+
+    def __init__(self, max_size: int = 32):
+        self.max_size = max_size
+        self._keys: "OrderedDict[Hashable, ParsedKey]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, fingerprint: Hashable) -> Optional[ParsedKey]:
+        with self._lock:
+            key = self._keys.get(fingerprint)
+            if key is not None:
+                self._keys.move_to_end(fingerprint)
+
+            return key
+
+    def set(self, fingerprint: Hashable, key: ParsedKey) -> None:
+        with self._lock:
+            self._keys[fingerprint] = key
+            self._keys.move_to_end(fingerprint)
+
+            while len(self._keys) > self.max_size:
+                self._keys.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._keys.clear()
+
+
+key_cache = KeyCache()
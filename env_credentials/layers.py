@@ -0,0 +1,174 @@
+import os
+import threading
+from os import PathLike
+from time import perf_counter
+from typing import Dict
+from typing import Iterable
+from typing import List
+from typing import Optional
+from typing import Sequence
+from typing import Text
+from typing import Union
+
+from env_credentials.cache import CacheEntry
+from env_credentials.cache import CredentialsCache
+from env_credentials.cache import Fingerprint
+from env_credentials.cache import default_cache
+from env_credentials.cache import resolve_dir
+from env_credentials.credentials import Credentials
+from env_credentials.credentials import format_values
+from env_credentials.instrumentation import record
+from env_credentials.instrumentation import record_cache
+from env_credentials.keys import KeySource
+from env_credentials.selection import Selector
+
+ENVIRONMENT_ENV = "ENV_CREDENTIALS_ENVIRONMENT"
+
+
+def expand(environment: Text) -> List[Text]:
+    """
+    The layers selected by an environment name, each of its dotted prefixes followed by the name itself, so
+    `production.eu` selects `production` and `production.eu`.
+    """
+    parts = environment.split(".")
+
+    return [".".join(parts[:i]) for i in range(1, len(parts) + 1)]
+
+
+class LayeredCredentials:
+    """
+    Read only credentials merged from the base credentials and any number of layers stacked on top of them.
+
+    Each layer is stored next to the base files as `credentials.<layer>.env.enc`, encrypted with `<layer>.key` when it
+    exists and the base key otherwise. Later layers override the names defined by earlier ones. Given an environment
+    name, layers are selected with `expand` and missing parent layers are skipped. Given a list of names, every layer
+    must exist.
+
+    The layers are decrypted concurrently and the merged values are cached by the fingerprints of every layer, so
+    further instances only stat the files.
+    """
+
+    def __init__(
+        self,
+        credentials_dir: Union[Text, PathLike],
+        layers: Union[Text, Sequence[Text]],
+        cache: Optional[CredentialsCache] = default_cache,
+        key_source: Optional[Union[KeySource, Sequence[KeySource]]] = None,
+    ):
+        if isinstance(layers, str):
+            names = expand(layers)
+            self._optional = set(names[:-1])
+        else:
+            names = list(layers)
+            self._optional = set()
+
+        self.credentials_dir = credentials_dir
+        self.cache = cache
+        self.layers: List[Credentials] = [Credentials(credentials_dir, cache=cache, key_source=key_source)] + [
+            Credentials(credentials_dir, cache=cache, key_source=key_source, layer=name) for name in names
+        ]
+
+        self._values: Optional[Dict[Text, Optional[Text]]] = None
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def present(self) -> List[Credentials]:
+        """
+        The layers that are merged, leaving out optional layers without a credentials file.
+        """
+        return [layer for layer in self.layers if layer.layer not in self._optional or os.path.exists(layer.get_config_path())]
+
+    def _cache_key(self, layers: List[Credentials]) -> Optional[Fingerprint]:
+        if self.cache is None:
+            return None
+
+        revisions = []
+        for layer in layers:
+            fingerprint = layer.fingerprint()
+            if fingerprint is None:
+                return None
+            revisions.append(fingerprint[1:])
+
+        return resolve_dir(self.credentials_dir), "+".join(layer._config_filename for layer in layers), tuple(revisions)
+
+    def _merge(self, layers: List[Credentials]) -> CacheEntry:
+        if len(layers) == 1:
+            results = [layers[0].values()]
+        else:
+            from concurrent.futures import ThreadPoolExecutor
+
+            # Decryption releases the GIL, so reading the layers on threads overlaps both the I/O and the decryption.
+            with ThreadPoolExecutor(max_workers=len(layers)) as executor:
+                results = list(executor.map(Credentials.values, layers))
+
+        merged: Dict[Text, Optional[Text]] = {}
+        for values in results:
+            merged.update(values)
+
+        return CacheEntry(format_values(merged), merged)
+
+    def values(self) -> Dict[Text, Optional[Text]]:
+        values = self._values
+        if values is not None:
+            return values
+
+        with self._lock:
+            if self._values is None:
+                layers = self.present()
+                cache = self.cache
+                cache_key = self._cache_key(layers)
+
+                if cache is not None and cache_key is not None:
+                    entry, hit = cache.get_or_load(cache_key, lambda: self._merge(layers))
+                    record_cache(hit)
+                else:
+                    entry = self._merge(layers)
+
+                # Entries may be shared with other instances, so hand out a copy.
+                self._values = dict(entry.values or {})
+
+            return self._values
+
+    def get(self, name: Text, default: Optional[Text] = None) -> Optional[Text]:
+        return self.values().get(name, default)
+
+    def names(self) -> List[Text]:
+        return list(self.values())
+
+    def read_file(self) -> str:
+        return format_values(self.values())
+
+    def load(
+        self,
+        include: Optional[Union[Text, Iterable[Text]]] = None,
+        exclude: Optional[Union[Text, Iterable[Text]]] = None,
+        prefix: Optional[Union[Text, Iterable[Text]]] = None,
+        strip_prefix: bool = False,
+        override: bool = False,
+    ) -> None:
+        """
+        Inject the merged credentials into `os.environ`, selecting them like `Credentials.load` does.
+        """
+        selective = include is not None or exclude is not None or prefix is not None or strip_prefix or override
+        if self._loaded and not selective:
+            return
+
+        start = perf_counter()
+
+        selected = Selector(include, exclude, prefix, strip_prefix).select(self.values())
+        for name, value in selected.items():
+            if override or name not in os.environ:
+                os.environ[name] = value
+
+        if not selective:
+            self._loaded = True
+
+        record("load", perf_counter() - start, len(selected))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values = None
+            self._loaded = False
+
+        for layer in self.layers:
+            layer.clear()
@@ -0,0 +1,174 @@
+import os
+import threading
+from typing import TYPE_CHECKING
+from typing import Any
+from typing import Dict
+from typing import Iterable
+from typing import Iterator
+from typing import List
+from typing import Mapping
+from typing import Optional
+from typing import Text
+from typing import Union
+
+from env_credentials.credentials import Credentials
+from env_credentials.selection import Selector
+
+if TYPE_CHECKING:
+    from env_credentials.agent import AgentClient
+    from env_credentials.layers import LayeredCredentials
+
+
+class LazyValues(Mapping[Text, Optional[Text]]):
+    """
+    A read only view of the credentials that only decrypts them on first access.
+
+    When `include`, `exclude`, `prefix` or `strip_prefix` are given, only the selected credentials are part of the
+    view, under the name they are injected with, see `Selector`.
+    """
+
+    def __init__(
+        self,
+        credentials: Union[Credentials, "AgentClient", "LayeredCredentials"],
+        names: Optional[Iterable[Text]] = None,
+        include: Optional[Union[Text, Iterable[Text]]] = None,
+        exclude: Optional[Union[Text, Iterable[Text]]] = None,
+        prefix: Optional[Union[Text, Iterable[Text]]] = None,
+        strip_prefix: bool = False,
+        override: bool = False,
+    ):
+        self._credentials = credentials
+        self._names = list(names) if names is not None else None
+        self._options: Dict[str, Any] = {}
+        self._selector: Optional[Selector] = None
+        self._targets: Optional[Dict[Text, Text]] = None
+
+        if include is not None or exclude is not None or prefix is not None or strip_prefix or override:
+            self._options = dict(include=include, exclude=exclude, prefix=prefix, strip_prefix=strip_prefix, override=override)
+            self._selector = Selector(include, exclude, prefix, strip_prefix)
+
+    def _source_names(self) -> List[Text]:
+        if self._names is None:
+            self._names = self._credentials.names()
+
+        return self._names
+
+    def _source(self, name: Text) -> Text:
+        if self._selector is None:
+            return name
+
+        return self._selected()[name]
+
+    def _selected(self) -> Dict[Text, Text]:
+        if self._targets is None:
+            self._targets = self._selector.names(self._source_names())  # type: ignore[union-attr]
+
+        return self._targets
+
+    def names(self) -> List[Text]:
+        if self._selector is None:
+            return self._source_names()
+
+        return list(self._selected())
+
+    def __getitem__(self, name: Text) -> Optional[Text]:
+        if self._selector is not None and name not in self._selected():
+            raise KeyError(name)
+
+        return self._credentials.values()[self._source(name)]
+
+    def __contains__(self, name: object) -> bool:
+        return name in self.names()
+
+    def __iter__(self) -> Iterator[Text]:
+        return iter(self.names())
+
+    def __len__(self) -> int:
+        return len(self.names())
+
+    def load(self) -> None:
+        self._credentials.load(**self._options)
+
+
+_lock = threading.RLock()
+_pending: Dict[Text, List[LazyValues]] = {}
+
+
+def _resolve(names: Optional[Iterable[Text]] = None) -> bool:
+    with _lock:
+        if names is None:
+            sources = {id(v): v for values in _pending.values() for v in values}
+        else:
+            sources = {id(v): v for name in names for v in _pending.get(name, [])}
+
+        for source in sources.values():
+            for name in source.names():
+                registered = _pending.get(name, [])
+                if source in registered:
+                    registered.remove(source)
+                if not registered:
+                    _pending.pop(name, None)
+
+        for source in sources.values():
+            source.load()
+
+        return bool(sources)
+
+
+class _LazyEnviron(os._Environ):  # type: ignore[name-defined]
+    # Swapped in as the class of `os.environ` so every existing reference, including `os.getenv`, sees the hook.
+
+    def __getitem__(self, key):
+        try:
+            return super().__getitem__(key)
+        except KeyError:
+            if key not in _pending or not _resolve([key]):
+                raise
+
+        return super().__getitem__(key)
+
+    def __iter__(self):
+        if _pending:
+            _resolve()
+
+        return super().__iter__()
+
+    def __len__(self):
+        if _pending:
+            _resolve()
+
+        return super().__len__()
+
+
+def _install() -> None:
+    if type(os.environ) is os._Environ:  # type: ignore[attr-defined]
+        os.environ.__class__ = _LazyEnviron
+
+
+def uninstall() -> None:
+    with _lock:
+        _pending.clear()
+
+        if type(os.environ) is _LazyEnviron:
+            os.environ.__class__ = os._Environ  # type: ignore[attr-defined]
+
+
+def load(
+    credentials: Union[Credentials, "AgentClient", "LayeredCredentials"], names: Optional[Iterable[Text]] = None, **options
+) -> LazyValues:
+    """
+    Register the credential names with `os.environ` and defer decrypting them until one of the names is read.
+
+    The names are read from the index of indexed files without decrypting any value. For other files they should be
+    passed explicitly, otherwise listing them requires decrypting the file. `options` select the credentials to load
+    like they do for `Credentials.load`.
+    """
+    values = LazyValues(credentials, names, **options)
+
+    with _lock:
+        for name in values.names():
+            _pending.setdefault(name, []).append(values)
+
+        _install()
+
+    return values
@@ -0,0 +1,90 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict
+from typing import Iterator
+from typing import Optional
+from typing import Text
+
+from env_credentials.credentials import LockTimeoutException
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None  # type: ignore[assignment]
+
+
+class _PathLock:
+    def __init__(self):
+        # Serializes the threads of this process, and lets the owning thread re-enter without locking the file again.
+        self.thread_lock = threading.RLock()
+        self.depth = 0
+        self.fd: Optional[int] = None
+
+
+_locks: Dict[str, _PathLock] = {}
+_locks_lock = threading.Lock()
+
+
+def _get(path: str) -> _PathLock:
+    with _locks_lock:
+        lock = _locks.get(path)
+        if lock is None:
+            lock = _locks[path] = _PathLock()
+
+        return lock
+
+
+def _flock(fd: int, path: str, deadline: Optional[float], poll_interval: float) -> None:
+    if fcntl is None:
+        return
+
+    while True:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return
+        except BlockingIOError:
+            if deadline is not None and time.monotonic() >= deadline:
+                raise LockTimeoutException(path)
+
+            time.sleep(poll_interval)
+
+
+@contextmanager
+def file_lock(path: Text, timeout: Optional[float] = None, poll_interval: float = 0.05) -> Iterator[None]:
+    """
+    Hold an exclusive advisory lock on `path`, creating the file if needed, for the duration of the block.
+
+    The lock is re-entrant within a thread and also excludes other threads of this process. Other processes are
+    excluded with `flock`, which is not available on Windows, where only threads are serialized. Raises
+    `LockTimeoutException` if the lock could not be acquired within `timeout` seconds.
+    """
+    path = os.path.realpath(path)
+    lock = _get(path)
+    deadline = None if timeout is None else time.monotonic() + timeout
+
+    if not lock.thread_lock.acquire(timeout=-1 if timeout is None else timeout):
+        raise LockTimeoutException(path)
+
+    try:
+        if lock.depth == 0:
+            fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                _flock(fd, path, deadline, poll_interval)
+            except BaseException:
+                os.close(fd)
+                raise
+            lock.fd = fd
+
+        lock.depth += 1
+        try:
+            yield
+        finally:
+            lock.depth -= 1
+            if lock.depth == 0 and lock.fd is not None:
+                # Closing the descriptor releases the flock.
+                os.close(lock.fd)
+                lock.fd = None
+    finally:
+        lock.thread_lock.release()
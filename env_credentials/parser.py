@@ -0,0 +1,266 @@
+import os
+import re
+from typing import Collection
+from typing import Dict
+from typing import Iterable
+from typing import Iterator
+from typing import Mapping
+from typing import NamedTuple
+from typing import Optional
+from typing import Text
+from typing import Tuple
+
+# A single pass parser for the subset of the dotenv format python-dotenv understands. The grammar follows
+# `dotenv.parser` so files parse identically, but matches against the whole string without tracking line numbers,
+# which is where python-dotenv spends most of its time on large files.
+
+_multiline_whitespace = re.compile(r"\s*")
+_export = re.compile(r"(?:export[^\S\r\n]+)?")
+_single_quoted_key = re.compile(r"'([^']+)'")
+_unquoted_key = re.compile(r"([^=\#\s]+)")
+_whitespace = re.compile(r"[^\S\r\n]*")
+_equal_sign = re.compile(r"=[^\S\r\n]*")
+_single_quoted_value = re.compile(r"'((?:\\'|[^'])*)'")
+_double_quoted_value = re.compile(r'"((?:\\"|[^"])*)"')
+_unquoted_value = re.compile(r"[^\r\n]*")
+_inline_comment = re.compile(r"\s+#.*")
+_comment = re.compile(r"(?:[^\S\r\n]*#[^\r\n]*)?")
+_end_of_line = re.compile(r"[^\S\r\n]*(?:\r\n|\n|\r|$)")
+_rest_of_line = re.compile(r"[^\r\n]*(?:\r|\n|\r\n)?")
+
+_single_quote_escapes = re.compile(r"\\[\\']")
+_double_quote_escapes = re.compile(r"\\[\\'\"abfnrtv]")
+_escapes = {
+    "\\\\": "\\",
+    "\\'": "'",
+    '\\"': '"',
+    "\\a": "\a",
+    "\\b": "\b",
+    "\\f": "\f",
+    "\\n": "\n",
+    "\\r": "\r",
+    "\\t": "\t",
+    "\\v": "\v",
+}
+
+# No variable has an empty name, so this always expands to a literal `${`, see `escape`.
+_ESCAPED_REFERENCE = "${:-$}{"
+
+_variable = re.compile(r"\$\{(?P<name>[^\}:]*)(?::-(?P<default>[^\}]*))?\}")
+
+
+class Binding(NamedTuple):
+    key: Optional[Text]
+    value: Optional[Text]
+    # Offsets of the whole statement, including leading blank lines and its trailing newline.
+    start: int
+    end: int
+    error: bool
+
+
+class _Error(Exception):
+    def __init__(self, pos: int):
+        self.pos = pos
+
+
+def _match(regex, text: str, pos: int):
+    match = regex.match(text, pos)
+    if match is None:
+        raise _Error(pos)
+
+    return match
+
+
+def _quoted(text: str, pos: int, quote: str, regex) -> Tuple[str, int]:
+    # Scanning with str.find is much faster than the regex on large values such as certificates. A quote preceded by
+    # a backslash is escaped, exactly as the regex alternation treats it.
+    end = text.find(quote, pos + 1)
+    while end != -1 and text[end - 1] == "\\":
+        end = text.find(quote, end + 1)
+
+    if end == -1:
+        # Unterminated values are left to the regex, which backtracks the same way python-dotenv does.
+        match = _match(regex, text, pos)
+        return match.group(1), match.end()
+
+    return text[pos + 1 : end], end + 1
+
+
+def _decode(regex, value: str) -> str:
+    if "\\" not in value:
+        return value
+
+    return regex.sub(lambda m: _escapes[m.group(0)], value)
+
+
+def _parse_binding(text: str, pos: int) -> Binding:
+    start = pos
+    pos = _multiline_whitespace.match(text, pos).end()  # type: ignore[union-attr]
+
+    if pos >= len(text):
+        return Binding(None, None, start, pos, False)
+
+    pos = _export.match(text, pos).end()  # type: ignore[union-attr]
+
+    key: Optional[str]
+    char = text[pos : pos + 1]
+    if char == "#":
+        key = None
+    else:
+        match = _match(_single_quoted_key if char == "'" else _unquoted_key, text, pos)
+        key, pos = match.group(1), match.end()
+
+    pos = _whitespace.match(text, pos).end()  # type: ignore[union-attr]
+
+    value: Optional[str] = None
+    if text.startswith("=", pos):
+        pos = _equal_sign.match(text, pos).end()  # type: ignore[union-attr]
+        char = text[pos : pos + 1]
+
+        if char == "'":
+            value, pos = _quoted(text, pos, "'", _single_quoted_value)
+            value = _decode(_single_quote_escapes, value)
+        elif char == '"':
+            value, pos = _quoted(text, pos, '"', _double_quoted_value)
+            value = _decode(_double_quote_escapes, value)
+        elif char in ("", "\n", "\r"):
+            value = ""
+        else:
+            match = _unquoted_value.match(text, pos)  # type: ignore[assignment]
+            value, pos = _inline_comment.sub("", match.group(0)).rstrip(), match.end()
+
+    pos = _comment.match(text, pos).end()  # type: ignore[union-attr]
+    pos = _match(_end_of_line, text, pos).end()
+
+    return Binding(key, value, start, pos, False)
+
+
+def parse_bindings(text: Text) -> Iterator[Binding]:
+    pos = 0
+    length = len(text)
+
+    while pos < length:
+        try:
+            binding = _parse_binding(text, pos)
+        except _Error as e:
+            # Like python-dotenv, skip the rest of the line the statement failed on.
+            end = _rest_of_line.match(text, e.pos).end()  # type: ignore[union-attr]
+            binding = Binding(None, None, pos, end, True)
+
+            import logging
+
+            line = text.count("\n", 0, pos) + 1
+            logging.getLogger(__name__).warning("Could not parse credentials statement starting at line %s", line)
+
+        pos = binding.end
+        yield binding
+
+
+def is_name(name: Text) -> bool:
+    """
+    Whether `name` can be written unquoted as the name of a statement and read back, here and by python-dotenv.
+    """
+    # A leading quote starts a quoted name instead.
+    return _unquoted_key.fullmatch(name) is not None and not name.startswith("'")
+
+
+def escape(value: Text) -> Text:
+    """
+    Escape the `${` of `value`, so it is read back literally rather than interpolated, here and by python-dotenv.
+    """
+    return value.replace("${", _ESCAPED_REFERENCE)
+
+
+def _interpolate(value: str, env: Mapping[str, Optional[str]]) -> str:
+    def resolve(match):
+        default = match.group("default")
+        result = env.get(match.group("name"), default if default is not None else "")
+        return result if result is not None else ""
+
+    return _variable.sub(resolve, value)
+
+
+class _Environment(Mapping[str, Optional[str]]):
+    # Looks values up in the file first and the process environment second, without copying `os.environ`.
+
+    def __init__(self, values: Dict[str, Optional[str]], environ: Mapping[str, str]):
+        self._values = values
+        self._environ = environ
+
+    def __getitem__(self, name):
+        if name in self._values:
+            return self._values[name]
+
+        return self._environ[name]
+
+    def __iter__(self):
+        return iter({**self._environ, **self._values})
+
+    def __len__(self):
+        return len(set(self._environ) | set(self._values))
+
+
+def resolve(
+    values: Iterable[Tuple[Text, Optional[Text]]], environ: Optional[Mapping[str, str]] = None
+) -> Dict[Text, Optional[Text]]:
+    """
+    Interpolate `${VAR}` and `${VAR:-default}` in values as written in a file, in order, from the values before them,
+    then from `environ`, which defaults to `os.environ`.
+    """
+    resolved: Dict[str, Optional[str]] = {}
+    env = None
+
+    for name, value in values:
+        if value is not None and "${" in value:
+            if env is None:
+                env = _Environment(resolved, os.environ if environ is None else environ)
+            value = _interpolate(value, env)
+
+        resolved[name] = value
+
+    return resolved
+
+
+def parse(text: Text, environ: Optional[Mapping[str, str]] = None, interpolate: bool = True) -> Dict[Text, Optional[Text]]:
+    """
+    Parse dotenv formatted `text` into a dict, interpolating the values with `resolve`. Without `interpolate`, values
+    are returned as written, so they can be stored and interpolated when they are read.
+    """
+    bindings = ((binding.key, binding.value) for binding in parse_bindings(text) if binding.key is not None)
+
+    if not interpolate:
+        return dict(bindings)
+
+    return resolve(bindings, environ)
+
+
+def rewrite(text: Text, statements: Mapping[Text, Text], removals: Collection[Text] = ()) -> Text:
+    """
+    Replace every definition of the names in `statements` with the given statement and drop every definition of the
+    names in `removals`. Names that are not defined yet are appended. Comments, blank lines and every other statement
+    are kept exactly as they are.
+    """
+    parts = []
+    missing = dict(statements)
+
+    for binding in parse_bindings(text):
+        key = binding.key
+        if key is None or (key not in statements and key not in removals):
+            parts.append(text[binding.start : binding.end])
+            continue
+
+        # Keep the blank lines separating the statement from the previous one.
+        start = _multiline_whitespace.match(text, binding.start).end()  # type: ignore[union-attr]
+        parts.append(text[binding.start : start])
+
+        if key in statements:
+            parts.append(statements[key])
+            missing.pop(key, None)
+
+    result = "".join(parts)
+    if missing:
+        if result and not result.endswith("\n"):
+            result += "\n"
+        result += "".join(missing.values())
+
+    return result
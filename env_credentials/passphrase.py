@@ -0,0 +1,325 @@
+import os
+import struct
+import sys
+import threading
+import time
+from typing import Dict
+from typing import NamedTuple
+from typing import Optional
+from typing import Tuple
+
+from env_credentials.credentials import CredentialsException
+
+PASSPHRASE_ENV = "ENV_CREDENTIALS_PASSPHRASE"
+# `process` (the default) keeps derived keys in memory, `runtime` also shares them between processes through the user's
+# runtime directory, and `none` derives the key every time it is read.
+CACHE_ENV = "ENV_CREDENTIALS_PASSPHRASE_CACHE"
+TTL_ENV = "ENV_CREDENTIALS_PASSPHRASE_TTL"
+
+DEFAULT_TTL = 900.0
+
+PREFIX = "scrypt$"
+
+_DERIVED_KEY_SIZE = 32
+_SALT_SIZE = 16
+_NONCE_SIZE = 12
+_EXPIRY = struct.Struct(">d")
+
+
+class Params(NamedTuple):
+    n: int = 2**15
+    r: int = 8
+    p: int = 1
+
+    def __str__(self) -> str:
+        return f"n={self.n},r={self.r},p={self.p}"
+
+    @classmethod
+    def parse(cls, text: str) -> "Params":
+        values = dict(item.split("=", 1) for item in text.split(","))
+
+        return cls(int(values["n"]), int(values["r"]), int(values["p"]))
+
+
+class Wrapped(NamedTuple):
+    params: Params
+    salt: bytes
+    nonce: bytes
+    ciphertext: bytes
+
+    @property
+    def header(self) -> bytes:
+        # Authenticated along with the key, so the parameters and salt cannot be changed.
+        return f"{PREFIX}{self.params}${self.salt.hex()}".encode("ascii")
+
+    @property
+    def id(self) -> str:
+        import hashlib
+
+        return hashlib.sha256(self.header).hexdigest()[:32]
+
+    def __str__(self) -> str:
+        return f"{self.header.decode('ascii')}${self.nonce.hex()}${self.ciphertext.hex()}"
+
+
+def is_wrapped(text: str) -> bool:
+    return text.lstrip().startswith(PREFIX)
+
+
+def parse(text: str) -> Wrapped:
+    parts = text.strip()[len(PREFIX) :].split("$")
+    if len(parts) != 4:
+        raise ValueError("Malformed passphrase protected key")
+
+    params, salt, nonce, ciphertext = parts
+
+    return Wrapped(Params.parse(params), bytes.fromhex(salt), bytes.fromhex(nonce), bytes.fromhex(ciphertext))
+
+
+def derive(passphrase: str, salt: bytes, params: Params) -> bytes:
+    from cryptography.hazmat.primitives.kdf.scrypt import Scrypt
+
+    kdf = Scrypt(salt=salt, length=_DERIVED_KEY_SIZE, n=params.n, r=params.r, p=params.p)
+
+    return kdf.derive(passphrase.encode("utf-8"))
+
+
+def _seal(derived: bytes, header: bytes, key_text: str) -> Tuple[bytes, bytes]:
+    from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+    nonce = os.urandom(_NONCE_SIZE)
+
+    return nonce, AESGCM(derived).encrypt(nonce, key_text.encode("utf-8"), header)
+
+
+def _open(derived: bytes, wrapped: Wrapped) -> Optional[str]:
+    from cryptography.exceptions import InvalidTag
+    from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+    try:
+        return AESGCM(derived).decrypt(wrapped.nonce, wrapped.ciphertext, wrapped.header).decode("utf-8")
+    except InvalidTag:
+        return None
+
+
+def _runtime_dir() -> Optional[str]:
+    base = os.environ.get("XDG_RUNTIME_DIR") or f"/run/user/{os.getuid()}"
+    if not os.path.isdir(base):
+        return None
+
+    return os.path.join(base, "env-credentials")
+
+
+class DerivedKeyCache:
+    """
+    Keys derived from passphrases, by the parameters and salt they were derived with, for `ttl` seconds.
+
+    With a `directory`, the keys are also written there, readable only by the current user, so further processes
+    such as consecutive `show` and `edit` commands skip the KDF as well.
+    """
+
+    def __init__(self, ttl: float = DEFAULT_TTL, directory: Optional[str] = None):
+        self.ttl = ttl
+        self.directory = directory
+        self._keys: Dict[str, Tuple[float, bytes]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, id: str) -> Optional[bytes]:
+        now = time.time()
+
+        with self._lock:
+            cached = self._keys.get(id)
+            if cached is not None and cached[0] > now:
+                return cached[1]
+            self._keys.pop(id, None)
+
+        if self.directory is None:
+            return None
+
+        cached = self._read(id)
+        if cached is not None and cached[0] > now:
+            with self._lock:
+                self._keys[id] = cached
+            return cached[1]
+
+        self._remove(id)
+        return None
+
+    def set(self, id: str, derived: bytes) -> None:
+        if self.ttl <= 0:
+            return
+
+        expiry = time.time() + self.ttl
+
+        with self._lock:
+            self._keys[id] = (expiry, derived)
+
+        if self.directory is not None:
+            self._write(id, expiry, derived)
+
+    def forget(self) -> None:
+        with self._lock:
+            self._keys.clear()
+
+        if self.directory is not None and os.path.isdir(self.directory):
+            for name in os.listdir(self.directory):
+                self._remove(name)
+
+    def _path(self, id: str) -> str:
+        return os.path.join(self.directory, id)  # type: ignore[arg-type]
+
+    def _private_directory(self) -> bool:
+        try:
+            os.makedirs(self.directory, mode=0o700, exist_ok=True)  # type: ignore[arg-type]
+            stat = os.stat(self.directory)  # type: ignore[arg-type]
+        except OSError:
+            return False
+
+        # Never trust a directory that someone else could have prepared.
+        return stat.st_uid == os.getuid() and stat.st_mode & 0o077 == 0
+
+    def _read(self, id: str) -> Optional[Tuple[float, bytes]]:
+        if not self._private_directory():
+            return None
+
+        try:
+            with open(self._path(id), "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+
+        if len(data) != _EXPIRY.size + _DERIVED_KEY_SIZE:
+            return None
+
+        return _EXPIRY.unpack_from(data)[0], data[_EXPIRY.size :]
+
+    def _write(self, id: str, expiry: float, derived: bytes) -> None:
+        if not self._private_directory():
+            return
+
+        from env_credentials.credentials import _replace_file
+
+        try:
+            _replace_file(self._path(id), _EXPIRY.pack(expiry) + derived, mode=0o600)
+        except OSError:
+            pass
+
+    def _remove(self, id: str) -> None:
+        try:
+            os.remove(self._path(id))
+        except OSError:
+            pass
+
+
+_caches: Dict[Tuple[str, float], DerivedKeyCache] = {}
+
+
+def default_cache() -> DerivedKeyCache:
+    """
+    The cache configured by `ENV_CREDENTIALS_PASSPHRASE_CACHE` and `ENV_CREDENTIALS_PASSPHRASE_TTL`.
+    """
+    mode = os.environ.get(CACHE_ENV, "process")
+    ttl = 0.0 if mode == "none" else float(os.environ.get(TTL_ENV, DEFAULT_TTL))
+
+    cache = _caches.get((mode, ttl))
+    if cache is None:
+        cache = _caches[(mode, ttl)] = DerivedKeyCache(ttl, _runtime_dir() if mode == "runtime" else None)
+
+    return cache
+
+
+def get_passphrase(prompt: str = "Passphrase: ") -> str:
+    passphrase = os.environ.get(PASSPHRASE_ENV)
+    if passphrase:
+        return passphrase
+
+    if not sys.stdin.isatty():
+        raise CredentialsException(f"The key is protected by a passphrase, set {PASSPHRASE_ENV} to unlock it")
+
+    import getpass
+
+    return getpass.getpass(prompt)
+
+
+def new_passphrase() -> str:
+    """
+    Ask for a new passphrase twice, or take it from `ENV_CREDENTIALS_PASSPHRASE` when there is no terminal.
+    """
+    if not sys.stdin.isatty():
+        return get_passphrase()
+
+    import getpass
+
+    passphrase = getpass.getpass("New passphrase: ")
+    if not passphrase:
+        raise CredentialsException("The passphrase must not be empty")
+
+    if getpass.getpass("Repeat the passphrase: ") != passphrase:
+        raise CredentialsException("The passphrases do not match")
+
+    return passphrase
+
+
+def wrap(key_text: str, passphrase: str, params: Optional[Params] = None, cache: Optional[DerivedKeyCache] = None) -> str:
+    """
+    Encrypt the text of a key with a key derived from `passphrase`.
+    """
+    params = params or Params()
+    salt = os.urandom(_SALT_SIZE)
+    derived = derive(passphrase, salt, params)
+
+    wrapped = Wrapped(params, salt, b"", b"")
+    nonce, ciphertext = _seal(derived, wrapped.header, key_text)
+    wrapped = wrapped._replace(nonce=nonce, ciphertext=ciphertext)
+
+    (cache or default_cache()).set(wrapped.id, derived)
+
+    return str(wrapped)
+
+
+def _derived_key(wrapped: Wrapped, cache: DerivedKeyCache, passphrase: Optional[str]) -> Tuple[bytes, str]:
+    derived = cache.get(wrapped.id) if passphrase is None else None
+
+    if derived is not None:
+        key_text = _open(derived, wrapped)
+        if key_text is not None:
+            return derived, key_text
+
+    derived = derive(passphrase or get_passphrase(), wrapped.salt, wrapped.params)
+    key_text = _open(derived, wrapped)
+    if key_text is None:
+        raise ValueError("Wrong passphrase")
+
+    cache.set(wrapped.id, derived)
+
+    return derived, key_text
+
+
+def unwrap(text: str, passphrase: Optional[str] = None, cache: Optional[DerivedKeyCache] = None) -> str:
+    """
+    Return the text of a passphrase protected key, only deriving the key from the passphrase when it is not cached.
+    """
+    return _derived_key(parse(text), cache or default_cache(), passphrase)[1]
+
+
+def rewrap(text: str, key_text: str, cache: Optional[DerivedKeyCache] = None) -> str:
+    """
+    Protect another key with the same passphrase as the key in `text`, e.g. when rotating it.
+    """
+    wrapped = parse(text)
+    derived, _ = _derived_key(wrapped, cache or default_cache(), None)
+    nonce, ciphertext = _seal(derived, wrapped.header, key_text)
+
+    return str(wrapped._replace(nonce=nonce, ciphertext=ciphertext))
+
+
+def forget() -> None:
+    """
+    Drop every cached derived key, in this process and in the runtime directory.
+    """
+    for cache in _caches.values():
+        cache.forget()
+
+    directory = _runtime_dir()
+    if directory is not None:
+        DerivedKeyCache(0, directory).forget()
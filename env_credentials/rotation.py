@@ -0,0 +1,135 @@
+import os
+import threading
+import time
+from typing import Callable
+from typing import Iterable
+from typing import List
+from typing import NamedTuple
+from typing import Optional
+from typing import Set
+from typing import Text
+
+from env_credentials.credentials import Credentials
+
+ROTATED = "rotated"
+DRY_RUN = "dry-run"
+SKIPPED = "skipped"
+FAILED = "failed"
+
+
+class RotationResult(NamedTuple):
+    directory: str
+    status: str
+    duration: float
+    error: Optional[str] = None
+
+
+Progress = Callable[[RotationResult, int, int], None]
+
+
+class Journal:
+    """
+    An append only log of rotated directories, so an interrupted rotation can be resumed without rotating the same
+    directories twice.
+    """
+
+    def __init__(self, path: Text):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def completed(self) -> Set[str]:
+        import json
+
+        if not os.path.exists(self.path):
+            return set()
+
+        completed = set()
+        with open(self.path, "r") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # The last line may be incomplete when the previous run was killed while writing it.
+                    continue
+
+                if entry.get("status") == ROTATED:
+                    completed.add(entry["directory"])
+
+        return completed
+
+    def record(self, result: RotationResult) -> None:
+        import json
+
+        line = json.dumps({"directory": result.directory, "status": result.status, "error": result.error, "time": time.time()})
+
+        with self._lock:
+            with open(self.path, "a") as f:
+                f.write(line + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+
+def rotate_directory(directory: Text, dry_run: bool = False) -> RotationResult:
+    """
+    Rotate the key of a single directory. A dry run only checks that the credentials can be decrypted.
+    """
+    start = time.perf_counter()
+
+    try:
+        creds = Credentials(directory, cache=None)
+        if dry_run:
+            creds.read_file()
+        else:
+            creds.rotate_key()
+    except Exception as e:
+        return RotationResult(directory, FAILED, time.perf_counter() - start, str(e))
+
+    return RotationResult(directory, DRY_RUN if dry_run else ROTATED, time.perf_counter() - start)
+
+
+def rotate(
+    directories: Iterable[Text],
+    workers: Optional[int] = None,
+    processes: bool = False,
+    dry_run: bool = False,
+    journal: Optional[Journal] = None,
+    progress: Optional[Progress] = None,
+) -> List[RotationResult]:
+    """
+    Rotate the keys of many directories in parallel, on a thread pool or, with `processes`, a process pool.
+
+    Directories the `journal` already recorded as rotated are skipped. `progress` is called with every result, the
+    number of finished directories and the total.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+    from concurrent.futures import ThreadPoolExecutor
+    from concurrent.futures import as_completed
+
+    directories = [os.path.abspath(d) for d in directories]
+    completed = journal.completed() if journal is not None else set()
+    total = len(directories)
+    results: List[RotationResult] = []
+
+    def finish(result: RotationResult) -> None:
+        results.append(result)
+
+        if journal is not None and result.status in (ROTATED, FAILED):
+            journal.record(result)
+        if progress is not None:
+            progress(result, len(results), total)
+
+    pending = []
+    for directory in directories:
+        if directory in completed:
+            finish(RotationResult(directory, SKIPPED, 0.0))
+        else:
+            pending.append(directory)
+
+    if pending:
+        pool = ProcessPoolExecutor if processes else ThreadPoolExecutor
+        with pool(max_workers=workers) as executor:
+            futures = [executor.submit(rotate_directory, d, dry_run) for d in pending]
+            for future in as_completed(futures):
+                finish(future.result())
+
+    return results
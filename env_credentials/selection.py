@@ -0,0 +1,92 @@
+from typing import Dict
+from typing import Iterable
+from typing import List
+from typing import Mapping
+from typing import Optional
+from typing import Text
+from typing import Union
+
+
+def _compile(patterns: Optional[Union[Text, Iterable[Text]]]):
+    if patterns is None:
+        return None
+
+    import fnmatch
+    import re
+
+    if isinstance(patterns, str):
+        patterns = [patterns]
+
+    # A single alternation keeps matching a name to one regex call however many patterns are given.
+    return re.compile("|".join(fnmatch.translate(p) for p in patterns) or "(?!)")
+
+
+class Selector:
+    """
+    Chooses which credentials are injected into `os.environ`, and under which name.
+
+    Names must match one of the `include` glob patterns, when given, and none of the `exclude` patterns. With `prefix`
+    only names starting with one of the prefixes are selected, and `strip_prefix` removes the prefix from the name
+    they are injected under. Patterns are matched against the full name, before stripping.
+    """
+
+    def __init__(
+        self,
+        include: Optional[Union[Text, Iterable[Text]]] = None,
+        exclude: Optional[Union[Text, Iterable[Text]]] = None,
+        prefix: Optional[Union[Text, Iterable[Text]]] = None,
+        strip_prefix: bool = False,
+    ):
+        self._include = _compile(include)
+        self._exclude = _compile(exclude)
+
+        prefixes: Optional[List[Text]] = None
+        if prefix is not None:
+            # Try the longest prefix first, so stripping removes as much as possible.
+            prefixes = sorted([prefix] if isinstance(prefix, str) else prefix, key=len, reverse=True)
+        self._prefixes = prefixes
+        self.strip_prefix = strip_prefix
+
+    def rename(self, name: Text) -> Optional[Text]:
+        """
+        Return the name to inject `name` under, or None if it is not selected.
+        """
+        if self._include is not None and not self._include.match(name):
+            return None
+
+        if self._exclude is not None and self._exclude.match(name):
+            return None
+
+        if self._prefixes is None:
+            return name
+
+        for prefix in self._prefixes:
+            if name.startswith(prefix):
+                target = name[len(prefix) :] if self.strip_prefix else name
+                return target or None
+
+        return None
+
+    def names(self, names: Iterable[Text]) -> Dict[Text, Text]:
+        """
+        Map the injected name of every selected name to the name of the credential.
+        """
+        selected = {}
+        for name in names:
+            target = self.rename(name)
+            if target is not None:
+                selected[target] = name
+
+        return selected
+
+    def select(self, values: Mapping[Text, Optional[Text]]) -> Dict[Text, Text]:
+        """
+        Return the selected values that are set, keyed by the name to inject them under.
+        """
+        selected = {}
+        for target, name in self.names(values).items():
+            value = values[name]
+            if value is not None:
+                selected[target] = value
+
+        return selected
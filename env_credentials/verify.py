@@ -0,0 +1,191 @@
+import time
+from typing import Callable
+from typing import Iterable
+from typing import List
+from typing import NamedTuple
+from typing import Optional
+from typing import Sequence
+from typing import Text
+
+from env_credentials.credentials import Credentials
+from env_credentials.credentials import CredentialsException
+
+KEY = "key"
+DECRYPT = "decrypt"
+PARSE = "parse"
+SCHEMA = "schema"
+
+
+class Problem(NamedTuple):
+    check: str
+    message: str
+
+
+class VerificationResult(NamedTuple):
+    directory: str
+    problems: List[Problem]
+    duration: float
+    names: int = 0
+
+    @property
+    def ok(self) -> bool:
+        return not self.problems
+
+
+Progress = Callable[[VerificationResult, int, int], None]
+
+
+def _describe(e: Exception) -> str:
+    if isinstance(e, CredentialsException):
+        return e.message
+
+    # Other errors may quote the plaintext, so only their type is reported.
+    return f"Unexpected {type(e).__name__}"
+
+
+def verify_directory(directory: Text, required: Sequence[Text] = ()) -> VerificationResult:
+    """
+    Check that the key of `directory` is valid, the credentials decrypt and parse, and define every `required` name.
+
+    Problems only ever describe names and line numbers, never values, so the result is safe to publish from CI. Errors
+    are reported as problems rather than raised, so one broken directory never stops the others from being checked.
+    """
+    start = time.perf_counter()
+    problems: List[Problem] = []
+
+    def done(names: int = 0) -> VerificationResult:
+        return VerificationResult(str(directory), problems, time.perf_counter() - start, names)
+
+    try:
+        creds = Credentials(directory, cache=None)
+        creds._ensure_key()
+    except Exception as e:
+        problems.append(Problem(KEY, _describe(e)))
+        return done()
+
+    try:
+        content = creds.read_file()
+    except Exception as e:
+        problems.append(Problem(DECRYPT, _describe(e)))
+        return done()
+
+    from env_credentials.parser import parse_bindings
+
+    for binding in parse_bindings(content):
+        if binding.error:
+            line = content.count("\n", 0, binding.start) + 1
+            problems.append(Problem(PARSE, f"Could not parse the statement starting at line {line}"))
+
+    try:
+        values = creds.values()
+    except Exception as e:
+        problems.append(Problem(PARSE, _describe(e)))
+        return done()
+
+    missing = [name for name in required if values.get(name) is None]
+    if missing:
+        problems.append(Problem(SCHEMA, f"Missing required names: {', '.join(missing)}"))
+
+    return done(len(values))
+
+
+def verify(
+    directories: Iterable[Text],
+    required: Sequence[Text] = (),
+    workers: Optional[int] = None,
+    progress: Optional[Progress] = None,
+) -> List[VerificationResult]:
+    """
+    Verify many directories on a thread pool, returning the results in the order of `directories`. Every directory is
+    checked, whatever problems the others have.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    from concurrent.futures import as_completed
+
+    directories = list(directories)
+    results = {}
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(verify_directory, d, required): d for d in directories}
+        for future in as_completed(futures):
+            result = future.result()
+            results[futures[future]] = result
+
+            if progress is not None:
+                progress(result, len(results), len(directories))
+
+    return [results[d] for d in directories]
+
+
+def read_schema(path: Text) -> List[str]:
+    """
+    Read the required names from a JSON list, or a text file with one name per line and `#` comments.
+    """
+    with open(path, "r") as f:
+        content = f.read()
+
+    if content.lstrip().startswith("["):
+        import json
+
+        return [str(name) for name in json.loads(content)]
+
+    return [line.strip() for line in content.splitlines() if line.strip() and not line.strip().startswith("#")]
+
+
+def to_json(results: Sequence[VerificationResult]) -> str:
+    import json
+
+    return json.dumps(
+        {
+            "ok": all(r.ok for r in results),
+            "directories": [
+                {
+                    "directory": r.directory,
+                    "ok": r.ok,
+                    "names": r.names,
+                    "duration_s": r.duration,
+                    "problems": [p._asdict() for p in r.problems],
+                }
+                for r in results
+            ],
+        },
+        indent=2,
+    )
+
+
+def to_junit(results: Sequence[VerificationResult]) -> str:
+    from xml.etree import ElementTree
+
+    suite = ElementTree.Element(
+        "testsuite",
+        name="env-credentials verify",
+        tests=str(len(results)),
+        failures=str(sum(1 for r in results if not r.ok)),
+        time=f"{sum(r.duration for r in results):.6f}",
+    )
+
+    for result in results:
+        case = ElementTree.SubElement(
+            suite, "testcase", classname="credentials", name=result.directory, time=f"{result.duration:.6f}"
+        )
+        for problem in result.problems:
+            failure = ElementTree.SubElement(case, "failure", type=problem.check, message=problem.message)
+            failure.text = problem.message
+
+    return ElementTree.tostring(suite, encoding="unicode")
+
+
+def to_text(results: Sequence[VerificationResult]) -> str:
+    lines = []
+    for result in results:
+        status = "ok" if result.ok else "FAIL"
+        lines.append(f"{status:<4} {result.directory} ({result.duration * 1000:.1f}ms, {result.names} names)")
+        lines.extend(f"     {problem.check}: {problem.message}" for problem in result.problems)
+
+    failed = sum(1 for r in results if not r.ok)
+    lines.append(f"{len(results) - failed} of {len(results)} credentials directories are valid")
+
+    return "\n".join(lines)
+
+
+REPORTS = {"text": to_text, "json": to_json, "junit": to_junit}
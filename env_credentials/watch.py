@@ -0,0 +1,228 @@
+import logging
+import os
+import sys
+import threading
+from typing import Callable
+from typing import Dict
+from typing import Hashable
+from typing import Iterable
+from typing import List
+from typing import NamedTuple
+from typing import Optional
+from typing import Set
+from typing import Text
+from typing import Tuple
+
+from env_credentials.cache import FileFingerprint
+from env_credentials.cache import file_fingerprint
+from env_credentials.credentials import Credentials
+
+logger = logging.getLogger(__name__)
+
+Values = Dict[Text, Optional[Text]]
+
+
+class CredentialsChange(NamedTuple):
+    added: Values
+    changed: Values
+    removed: List[Text]
+
+
+ChangeCallback = Callable[[CredentialsChange], None]
+
+# IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+_INOTIFY_MASK = 0x002 | 0x004 | 0x008 | 0x040 | 0x080 | 0x100 | 0x200
+
+
+def diff(previous: Values, current: Values) -> CredentialsChange:
+    return CredentialsChange(
+        added={name: value for name, value in current.items() if name not in previous},
+        changed={name: value for name, value in current.items() if name in previous and previous[name] != value},
+        removed=[name for name in previous if name not in current],
+    )
+
+
+class _Inotify:
+    def __init__(self, directory: Text):
+        import ctypes
+        import ctypes.util
+
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+        # Watch the directory rather than the files, as deployments usually replace the files rather than write them.
+        if libc.inotify_add_watch(self.fd, os.fsencode(directory), _INOTIFY_MASK) < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, "inotify_add_watch failed")
+
+    def wait(self, timeout: float) -> bool:
+        import select
+
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return False
+
+        try:
+            while os.read(self.fd, 4096):
+                pass
+        except BlockingIOError:
+            pass
+
+        return True
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+class CredentialsWatcher:
+    """
+    Watches the key and credentials files of a `Credentials` instance and re-applies changed values to `os.environ`.
+
+    Changes are detected with inotify where it is available, and by polling the fingerprint of the key's source and
+    the modification time, size and inode of the credentials file every `interval` seconds otherwise. Only names that
+    were loaded into `os.environ` from the credentials, or that are not set at all, are updated, so values set by the
+    environment keep precedence like they do for `Credentials.load`.
+    """
+
+    def __init__(
+        self,
+        credentials: Credentials,
+        callbacks: Iterable[ChangeCallback] = (),
+        interval: float = 1.0,
+        update_environ: bool = True,
+        use_inotify: Optional[bool] = None,
+    ):
+        self.credentials = credentials
+        self.callbacks: List[ChangeCallback] = list(callbacks)
+        self.interval = interval
+        self.update_environ = update_environ
+        self.use_inotify = sys.platform.startswith("linux") if use_inotify is None else use_inotify
+
+        self._values: Values = dict(credentials.values())
+        self._fingerprint = self._stat()
+        self._managed: Set[Text] = {name for name, value in self._values.items() if os.environ.get(name) == value}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def add_callback(self, callback: ChangeCallback) -> None:
+        self.callbacks.append(callback)
+
+    def _stat(self) -> Optional[Tuple[Hashable, FileFingerprint]]:
+        key_fingerprint = self.credentials.key_fingerprint()
+        if key_fingerprint is None:
+            return None
+
+        try:
+            return key_fingerprint, file_fingerprint(self.credentials.get_config_path())
+        except OSError:
+            return None
+
+    def check(self) -> Optional[CredentialsChange]:
+        """
+        Reload the credentials if either file changed since the last check, returning the changes if there were any.
+        """
+        with self._lock:
+            fingerprint = self._stat()
+            if fingerprint is None or fingerprint == self._fingerprint:
+                return None
+
+            self._fingerprint = fingerprint
+            self.credentials.clear()
+
+            try:
+                current = dict(self.credentials.values())
+            except Exception:
+                # Most likely the files are being replaced one after the other, the next change will retry.
+                logger.exception("Could not reload the credentials in %s", self.credentials.credentials_dir)
+                return None
+
+            change = diff(self._values, current)
+            self._values = current
+
+            if not (change.added or change.changed or change.removed):
+                return None
+
+            if self.update_environ:
+                self._apply(change)
+
+        for callback in self.callbacks:
+            try:
+                callback(change)
+            except Exception:
+                logger.exception("Credentials change callback %r failed", callback)
+
+        return change
+
+    def _apply(self, change: CredentialsChange) -> None:
+        for name, value in {**change.added, **change.changed}.items():
+            if name not in self._managed and name in os.environ:
+                continue
+
+            if value is None:
+                os.environ.pop(name, None)
+                self._managed.discard(name)
+            else:
+                os.environ[name] = value
+                self._managed.add(name)
+
+        for name in change.removed:
+            if name in self._managed:
+                os.environ.pop(name, None)
+                self._managed.discard(name)
+
+    def _run(self) -> None:
+        inotify = None
+        if self.use_inotify:
+            try:
+                inotify = _Inotify(os.fspath(self.credentials.credentials_dir))
+            except (OSError, AttributeError):
+                logger.debug("inotify is not available, polling for credentials changes instead")
+
+        try:
+            while not self._stop.is_set():
+                if inotify is not None:
+                    # Still check on every timeout, in case an event was missed.
+                    inotify.wait(self.interval)
+                else:
+                    self._stop.wait(self.interval)
+
+                if not self._stop.is_set():
+                    self.check()
+        finally:
+            if inotify is not None:
+                inotify.close()
+
+    def start(self) -> "CredentialsWatcher":
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="credentials-watcher", daemon=True)
+            self._thread.start()
+
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self) -> "CredentialsWatcher":
+        return self.start()
+
+    def __exit__(self, *args) -> None:
+        self.stop()
+
+
+def watch(credentials: Credentials, callback: Optional[ChangeCallback] = None, **kwargs) -> CredentialsWatcher:
+    """
+    Load the credentials into `os.environ` and start watching them for changes in a background thread.
+    """
+    credentials.load()
+
+    return CredentialsWatcher(credentials, [callback] if callback else [], **kwargs).start()
@@ -32,3 +32,9 @@ def formatting(session):
     session.run("flake8", *lint_dirs)
     session.run("isort", "--check-only", "--diff", "--force-single-line-imports", "--profile", "black", *lint_dirs)
     session.run("black", "--check", "--diff", *lint_dirs)
+
+
+@nox.session(python=["3.10"])
+def benchmarks(session):
+    session.run("poetry", "install", external=True)
+    session.run("python", "-m", "benchmarks.credentials", *session.posargs)
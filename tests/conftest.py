@@ -0,0 +1,49 @@
+import os
+from tempfile import TemporaryDirectory
+
+import pytest
+
+from env_credentials.credentials import Credentials
+from env_credentials.instrumentation import Stats
+from env_credentials.instrumentation import add_observer
+from env_credentials.instrumentation import remove_observer
+
+# The values `initialize` encrypts into new credentials, see env_credentials/example.env.
+EXAMPLE = {"FIRST": "one", "SECOND": "2", "A_BOOL": "true"}
+
+
+@pytest.fixture(autouse=True)
+def environ():
+    names = set(os.environ)
+    yield
+
+    # Drop whatever credentials the test loaded into the environment.
+    for name in set(os.environ) - names:
+        os.environ.pop(name, None)
+
+
+@pytest.fixture
+def credentials_dir():
+    with TemporaryDirectory() as dir:
+        yield dir
+
+
+@pytest.fixture
+def initialized_dir(credentials_dir: str):
+    Credentials(credentials_dir).initialize()
+    return credentials_dir
+
+
+@pytest.fixture
+def root():
+    # Holds any number of credentials directories.
+    with TemporaryDirectory() as dir:
+        yield dir
+
+
+@pytest.fixture
+def stats():
+    stats = Stats()
+    add_observer(stats)
+    yield stats
+    remove_observer(stats)
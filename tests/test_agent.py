@@ -0,0 +1,134 @@
+import os
+import threading
+import time
+
+import pytest
+
+from env_credentials.agent import AgentClient
+from env_credentials.agent import AgentServer
+from env_credentials.agent import AgentUnavailableException
+from env_credentials.agent import decode_values
+from env_credentials.agent import encode_values
+from env_credentials.credentials import Credentials
+from tests.conftest import EXAMPLE
+
+pytestmark = pytest.mark.skipif(not hasattr(os, "fork"), reason="Unix domain sockets are required")
+
+
+@pytest.fixture
+def server(initialized_dir: str):
+    server = AgentServer(os.path.join(initialized_dir, "agent.sock"), Credentials(initialized_dir), watch=False)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    yield server
+
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+def test_encode_values_round_trips():
+    values = {"FIRST": "one", "EMPTY": "", "NONE": None, "UNICODE": "snowman ☃\nline"}
+
+    assert decode_values(encode_values(values)) == values
+
+
+def test_socket_is_private(server: AgentServer):
+    assert os.stat(server.socket_path).st_mode & 0o777 == 0o600
+
+
+def test_client_reads_values(server: AgentServer):
+    client = AgentClient(server.socket_path)
+
+    assert client.ping()
+    assert client.get("FIRST") == "one"
+    assert client.get("MISSING", "default") == "default"
+    assert client.values() == EXAMPLE
+    client.close()
+
+
+def test_client_caches_values(server: AgentServer, initialized_dir: str):
+    client = AgentClient(server.socket_path)
+    client.values()
+
+    Credentials(initialized_dir).set("FIRST", "changed")
+    server.credentials.clear()
+
+    assert client.get("FIRST") == "one"
+    client.clear()
+    assert client.get("FIRST") == "changed"
+    client.close()
+
+
+def test_agent_serves_values_after_key_rotation(initialized_dir: str):
+    server = AgentServer(os.path.join(initialized_dir, "agent.sock"), Credentials(initialized_dir), interval=0.05)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    client = AgentClient(server.socket_path)
+
+    try:
+        assert client.get("FIRST") == "one"
+
+        rotated = Credentials(initialized_dir)
+        rotated.rotate_key()
+        rotated.set("FIRST", "rotated")
+
+        # The watcher reloads the credentials, and with them the new key, shortly after the files change.
+        deadline = time.monotonic() + 5
+        while client.get("FIRST") != "rotated" and time.monotonic() < deadline:
+            time.sleep(0.05)
+            client.clear()
+
+        assert client.get("FIRST") == "rotated"
+        assert client.values()["SECOND"] == "2"
+    finally:
+        client.close()
+        server.shutdown()
+        server.server_close()
+        thread.join()
+
+
+def test_client_reuses_connections(server: AgentServer):
+    client = AgentClient(server.socket_path, pool_size=1)
+    client.get("FIRST")
+    sock = client._pool.queue[0]
+
+    client.get("SECOND")
+
+    assert client._pool.queue == [sock]
+    client.close()
+
+
+def test_client_reconnects_to_restarted_agent(initialized_dir: str, server: AgentServer):
+    client = AgentClient(server.socket_path)
+    client.get("FIRST")
+
+    server.shutdown()
+    server.server_close()
+    restarted = AgentServer(server.socket_path, Credentials(initialized_dir), watch=False)
+    thread = threading.Thread(target=restarted.serve_forever, daemon=True)
+    thread.start()
+
+    try:
+        assert client.get("SECOND") == "2"
+    finally:
+        client.close()
+        restarted.shutdown()
+        restarted.server_close()
+        thread.join()
+
+
+def test_client_falls_back_to_credentials(initialized_dir: str):
+    client = AgentClient(os.path.join(initialized_dir, "missing.sock"), fallback=Credentials(initialized_dir))
+
+    assert not client.ping()
+    assert client.get("FIRST") == "one"
+    assert client.values()["SECOND"] == "2"
+
+
+def test_client_without_fallback_raises(initialized_dir: str):
+    client = AgentClient(os.path.join(initialized_dir, "missing.sock"))
+
+    with pytest.raises(AgentUnavailableException):
+        client.values()
@@ -0,0 +1,62 @@
+import asyncio
+import os
+
+from env_credentials.credentials import Credentials
+from env_credentials.instrumentation import Stats
+from tests.conftest import EXAMPLE
+
+
+def test_avalues(initialized_dir: str):
+    assert asyncio.run(Credentials(initialized_dir).avalues()) == EXAMPLE
+
+
+def test_concurrent_awaits_share_one_call(initialized_dir: str, stats: Stats):
+    creds = Credentials(initialized_dir, cache=None)
+
+    async def main():
+        return await asyncio.gather(*[creds.avalues() for _ in range(20)], creds.aget("FIRST"))
+
+    *results, first = asyncio.run(main())
+
+    assert all(r == EXAMPLE for r in results)
+    assert first == "one"
+    assert stats.phases["decrypt"].count == 1
+    assert creds._pending == {}
+
+
+def test_aget_on_indexed_files(initialized_dir: str):
+    creds = Credentials(initialized_dir, indexed=True)
+    creds.migrate()
+
+    async def main():
+        return await asyncio.gather(creds.aget("SECOND"), creds.aget("MISSING", "default"))
+
+    assert asyncio.run(main()) == ["2", "default"]
+
+
+def test_aload(initialized_dir: str):
+    asyncio.run(Credentials(initialized_dir).aload())
+
+    assert os.environ["FIRST"] == "one"
+
+
+def test_awrite_file(initialized_dir: str):
+    creds = Credentials(initialized_dir)
+
+    asyncio.run(creds.awrite_file("WRITTEN=async"))
+
+    assert Credentials(initialized_dir).values() == {"WRITTEN": "async"}
+
+
+def test_cancelled_await_does_not_cancel_other_callers(initialized_dir: str):
+    creds = Credentials(initialized_dir, cache=None)
+
+    async def main():
+        first = asyncio.ensure_future(creds.avalues())
+        second = asyncio.ensure_future(creds.avalues())
+        await asyncio.sleep(0)
+        first.cancel()
+
+        return await second
+
+    assert asyncio.run(main()) == EXAMPLE
@@ -0,0 +1,26 @@
+from benchmarks.credentials import CASES
+from benchmarks.credentials import compare
+from benchmarks.credentials import run
+
+
+def test_benchmarks_report_each_phase():
+    results = run([CASES[0]], runs=1)
+
+    phases = {(r["layout"], r["phase"]) for r in results["results"]}
+
+    assert {
+        ("blob", "key_read"),
+        ("blob", "key_cached"),
+        ("legacy", "hex_decode"),
+        ("blob", "decrypt"),
+        ("blob", "parse"),
+        ("blob", "inject"),
+        ("environ", "spawn_all"),
+        ("environ", "spawn_selected"),
+        ("blob", "encrypt_write"),
+        ("none", "values"),
+        ("zlib", "encrypt_write"),
+        ("zlib", "values"),
+        ("indexed", "get_one"),
+    } <= phases
+    assert len(compare(results, results)) == len(results["results"]) + 1
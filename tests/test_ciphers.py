@@ -0,0 +1,100 @@
+import os
+
+import pytest
+
+from env_credentials import container
+from env_credentials.ciphers import AES_128_GCM
+from env_credentials.ciphers import AES_256_GCM
+from env_credentials.ciphers import CHACHA20_POLY1305
+from env_credentials.ciphers import CIPHERS
+from env_credentials.ciphers import fastest
+from env_credentials.ciphers import new_key
+from env_credentials.ciphers import parse_key
+from env_credentials.cli import main
+from env_credentials.credentials import Credentials
+from env_credentials.credentials import InvalidCredentialsFileException
+from env_credentials.credentials import InvalidKeyException
+
+
+def _read_key(creds: Credentials) -> str:
+    with open(creds.get_key_path()) as f:
+        return f.read()
+
+
+def _algorithm(creds: Credentials) -> int:
+    with open(creds.get_config_path(), "rb") as f:
+        return container.unpack(f.read()).algorithm
+
+
+@pytest.mark.parametrize("cipher", list(CIPHERS))
+def test_ciphers(credentials_dir: str, cipher: str):
+    creds = Credentials(credentials_dir, cipher=cipher)
+    creds.initialize()
+
+    assert parse_key(_read_key(creds))[0].cipher.name == cipher
+    assert _algorithm(creds) == CIPHERS[cipher].algorithm
+    assert Credentials(credentials_dir, cache=None).values()["FIRST"] == "one"
+
+    Credentials(credentials_dir, indexed=True).migrate()
+    assert Credentials(credentials_dir, cache=None).get("SECOND") == "2"
+
+
+def test_default_key_format_is_unchanged():
+    assert ":" not in new_key()
+    assert new_key(CHACHA20_POLY1305).startswith("chacha20-poly1305:")
+    assert parse_key(f"{AES_128_GCM}:{new_key()}")[0].cipher.name == AES_128_GCM
+
+
+def test_key_size_must_match_cipher():
+    key = new_key(AES_256_GCM)
+
+    with pytest.raises(ValueError):
+        parse_key(key.replace(AES_256_GCM, AES_128_GCM))
+
+    with pytest.raises(ValueError):
+        parse_key(f"rot13:{new_key()}")
+
+
+def test_invalid_key_is_reported(credentials_dir: str):
+    creds = Credentials(credentials_dir)
+    creds.initialize()
+
+    with open(creds.get_key_path(), "w") as f:
+        f.write(new_key(AES_256_GCM).replace(AES_256_GCM, CHACHA20_POLY1305 + "x"))
+
+    with pytest.raises(InvalidKeyException):
+        Credentials(credentials_dir, cache=None).values()
+
+
+def test_file_and_key_algorithms_must_match(credentials_dir: str):
+    creds = Credentials(credentials_dir, cipher=AES_256_GCM)
+    creds.initialize()
+    key = _read_key(creds)
+
+    with open(creds.get_key_path(), "w") as f:
+        f.write(key.replace(AES_256_GCM, CHACHA20_POLY1305))
+
+    with pytest.raises(InvalidCredentialsFileException) as e:
+        Credentials(credentials_dir, cache=None).values()
+
+    assert "algorithm 2" in e.value.message
+
+
+def test_rotation_keeps_or_changes_cipher(credentials_dir: str):
+    Credentials(credentials_dir, cipher=CHACHA20_POLY1305).initialize()
+
+    Credentials(credentials_dir).rotate_key()
+    assert _algorithm(Credentials(credentials_dir)) == container.ALGORITHM_CHACHA20_POLY1305
+
+    Credentials(credentials_dir, cipher=AES_256_GCM).rotate_key()
+    assert _algorithm(Credentials(credentials_dir)) == container.ALGORITHM_AES_256_GCM
+    assert Credentials(credentials_dir, cache=None).values()["FIRST"] == "one"
+
+
+def test_auto_picks_the_fastest(credentials_dir: str):
+    assert fastest([AES_128_GCM], size=1024, runs=1) == AES_128_GCM
+    assert fastest(size=1024, runs=2) in CIPHERS
+
+    assert main(["-d", credentials_dir, "init", "--cipher", "auto"]) == 0
+    assert parse_key(_read_key(Credentials(credentials_dir)))[0].cipher.name in CIPHERS
+    assert os.path.exists(os.path.join(credentials_dir, "credentials.env.enc"))
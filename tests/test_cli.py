@@ -0,0 +1,148 @@
+import io
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+from env_credentials.cli import main
+from env_credentials.credentials import Credentials
+
+ROOT = Path(__file__).parent.parent
+
+
+def test_init_creates_files(credentials_dir: str):
+    assert main(["-d", credentials_dir, "init"]) == 0
+
+    assert os.path.exists(os.path.join(credentials_dir, "master.key"))
+    assert os.path.exists(os.path.join(credentials_dir, "credentials.env.enc"))
+
+
+def test_show_prints_content(credentials_dir: str, capsys):
+    main(["-d", credentials_dir, "init"])
+
+    assert main(["-d", credentials_dir, "show"]) == 0
+    assert 'FIRST="one"' in capsys.readouterr().out
+
+
+def test_get_prints_value(credentials_dir: str, capsys):
+    main(["-d", credentials_dir, "init"])
+
+    assert main(["-d", credentials_dir, "get", "SECOND"]) == 0
+    assert capsys.readouterr().out == "2\n"
+
+
+def test_get_missing_value_fails(credentials_dir: str, capsys):
+    main(["-d", credentials_dir, "init"])
+
+    assert main(["-d", credentials_dir, "get", "MISSING"]) == 1
+    assert "MISSING" in capsys.readouterr().err
+
+
+def test_missing_directory_fails(credentials_dir: str, capsys):
+    assert main(["-d", os.path.join(credentials_dir, "missing"), "show"]) == 1
+    assert "Could not find credentials directory" in capsys.readouterr().err
+
+
+def test_unknown_edit_buffer_fails(credentials_dir: str, capsys, monkeypatch):
+    main(["-d", credentials_dir, "init"])
+    monkeypatch.setenv("ENV_CREDENTIALS_EDIT_BUFFER", "bogus")
+
+    assert main(["-d", credentials_dir, "edit"]) == 1
+    assert "Unknown edit buffer 'bogus'" in capsys.readouterr().err
+
+
+def test_dir_defaults_to_environment(credentials_dir: str, capsys, monkeypatch):
+    Credentials(credentials_dir).initialize()
+    monkeypatch.setenv("ENV_CREDENTIALS_DIR", credentials_dir)
+
+    assert main(["get", "FIRST"]) == 0
+    assert capsys.readouterr().out == "one\n"
+
+
+def test_exec_runs_command_with_credentials(credentials_dir: str):
+    Credentials(credentials_dir).initialize()
+    env = {**os.environ, "SECOND": "from environment"}
+
+    result = subprocess.run(
+        [sys.executable, "-m", "env_credentials", "-d", credentials_dir, "exec", "--"]
+        + [sys.executable, "-c", "import os; print(os.environ['FIRST'], os.environ['SECOND'])"],
+        cwd=ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    assert result.stdout == "one from environment\n"
+
+
+def test_cli_does_not_import_django():
+    script = "import sys, env_credentials.cli; print('\\n'.join(sys.modules))"
+    result = subprocess.run([sys.executable, "-c", script], cwd=ROOT, capture_output=True, text=True, check=True)
+
+    assert not [m for m in result.stdout.split() if m.split(".")[0] in ("django", "django_credentials")]
+
+
+def test_set_and_unset(credentials_dir: str):
+    Credentials(credentials_dir).initialize()
+
+    assert main(["-d", credentials_dir, "set", "FIRST=uno", "URL=https://example.com/?a=b"]) == 0
+    assert main(["-d", credentials_dir, "unset", "SECOND", "A_BOOL"]) == 0
+
+    assert Credentials(credentials_dir).values() == {"FIRST": "uno", "URL": "https://example.com/?a=b"}
+
+
+def test_layer(credentials_dir: str):
+    Credentials(credentials_dir).initialize()
+
+    assert main(["-d", credentials_dir, "--layer", "production", "init", "--own-key"]) == 0
+    assert main(["-d", credentials_dir, "--layer", "production", "set", "FIRST=prod"]) == 0
+
+    assert os.path.exists(os.path.join(credentials_dir, "production.key"))
+    assert Credentials(credentials_dir, layer="production").values() == {"FIRST": "prod"}
+    assert Credentials(credentials_dir).get("FIRST") == "one"
+
+
+def test_set_reads_stdin(credentials_dir: str, monkeypatch):
+    Credentials(credentials_dir).initialize()
+    monkeypatch.setattr("sys.stdin", io.StringIO("FIRST=uno\n# ignored\nNEW='value'\n"))
+
+    assert main(["-d", credentials_dir, "set"]) == 0
+    assert Credentials(credentials_dir).get("NEW") == "value"
+
+
+def test_references_are_interpolated_when_read(credentials_dir: str, monkeypatch):
+    Credentials(credentials_dir).initialize()
+    path = os.path.join(credentials_dir, "import.json")
+    with open(path, "w") as f:
+        json.dump({"LITERAL": "${DB_USER}"}, f)
+    monkeypatch.setenv("DB_USER", "operator")
+    monkeypatch.setattr("sys.stdin", io.StringIO("URL=postgres://${DB_USER}@host\n"))
+
+    assert main(["-d", credentials_dir, "import", "-"]) == 0
+    assert main(["-d", credentials_dir, "set", "HOST=${DB_USER}.example.com"]) == 0
+    assert main(["-d", credentials_dir, "import", path]) == 0
+
+    monkeypatch.setenv("DB_USER", "app")
+    values = Credentials(credentials_dir, cache=None).values()
+    assert (values["URL"], values["HOST"], values["LITERAL"]) == ("postgres://app@host", "app.example.com", "${DB_USER}")
+
+
+def test_set_rejects_invalid_assignment(credentials_dir: str, capsys):
+    Credentials(credentials_dir).initialize()
+
+    assert main(["-d", credentials_dir, "set", "FIRST"]) == 1
+    assert "Expected NAME=VALUE" in capsys.readouterr().err
+
+
+def test_import_json(credentials_dir: str):
+    Credentials(credentials_dir).initialize()
+    path = os.path.join(credentials_dir, "import.json")
+    with open(path, "w") as f:
+        json.dump({"FIRST": "uno", "PORT": 8080, "DEBUG": False, "EMPTY": None}, f)
+
+    assert main(["-d", credentials_dir, "import", path]) == 0
+
+    values = Credentials(credentials_dir).values()
+    assert (values["FIRST"], values["PORT"], values["DEBUG"], values["EMPTY"]) == ("uno", "8080", "false", None)
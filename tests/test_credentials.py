@@ -1,20 +1,30 @@
 import os
+from io import StringIO
 from pathlib import Path
-from tempfile import TemporaryDirectory
+from unittest.mock import patch
 
 import pytest
-
+from cryptography.exceptions import InvalidTag
+from dotenv import dotenv_values
+
+from env_credentials import compression
+from env_credentials import container
+from env_credentials.cache import CacheEntry
+from env_credentials.cache import CredentialsCache
+from env_credentials.cache import clear_cache
+from env_credentials.cache import default_cache
 from env_credentials.credentials import Credentials
+from env_credentials.credentials import CredentialsException
 from env_credentials.credentials import CredentialsNotFoundException
 from env_credentials.credentials import DirectoryNotFoundException
+from env_credentials.credentials import InvalidCredentialsFileException
 from env_credentials.credentials import InvalidKeyException
 from env_credentials.credentials import KeyNotFoundException
-
-
-@pytest.fixture
-def credentials_dir():
-    with TemporaryDirectory() as dir:
-        yield dir
+from env_credentials.credentials import _new_key
+from env_credentials.edit import MemfdBuffer
+from env_credentials.edit import memfd_available
+from env_credentials.edit import open_buffer
+from tests.conftest import EXAMPLE
 
 
 def test_init_fails_on_missing_directory():
@@ -57,7 +67,7 @@ def test_initialization_does_nothing_if_files_exist(credentials_dir: str):
     with open(key_path, "r") as f:
         initialized_key = f.read()
 
-    with open(credentials_path, "r") as f:
+    with open(credentials_path, "rb") as f:
         initialized_credentials = f.read()
 
     new_creds = Credentials(credentials_dir)
@@ -67,7 +77,7 @@ def test_initialization_does_nothing_if_files_exist(credentials_dir: str):
     with open(key_path, "r") as f:
         assert initialized_key == f.read()
 
-    with open(credentials_path, "r") as f:
+    with open(credentials_path, "rb") as f:
         assert initialized_credentials == f.read()
 
 
@@ -79,7 +89,7 @@ def test_initialize_creates_ignore_file(credentials_dir: str):
     creds.initialize()
 
     with open(ignore_path, "r") as f:
-        assert f.read() == "master.key"
+        assert f.read() == "master.key\n*.env.enc.lock"
 
 
 def test_initialize_updates_ignore_file(credentials_dir: str):
@@ -91,7 +101,7 @@ def test_initialize_updates_ignore_file(credentials_dir: str):
     creds.initialize()
 
     with open(ignore_path, "r") as f:
-        assert f.read() == "\nmaster.key"
+        assert f.read() == "\nmaster.key\n*.env.enc.lock"
 
 
 def test_initialize_does_not_update_ignore_file_if_already_set(credentials_dir: str):
@@ -104,7 +114,7 @@ def test_initialize_does_not_update_ignore_file_if_already_set(credentials_dir:
     creds.initialize()
 
     with open(ignore_path, "r") as f:
-        assert f.read() == "stuff\nmaster.key"
+        assert f.read() == "stuff\nmaster.key\n*.env.enc.lock"
 
 
 def test_load_key_not_found_returns_helpful_error(credentials_dir: str):
@@ -175,3 +185,564 @@ def test_edits_file_based_on_editor(credentials_dir: str):
     creds.edit()
 
     assert creds.values() == {"test": "1"}
+
+
+@pytest.mark.parametrize("buffer", ["auto", "memfd", "shm", "file"])
+def test_edit_buffers(credentials_dir: str, buffer: str, monkeypatch):
+    if buffer == "memfd" and not memfd_available():
+        pytest.skip("memfd_create is not available")
+    if buffer == "shm" and not os.path.isdir("/dev/shm"):
+        pytest.skip("/dev/shm is not available")
+
+    creds = Credentials(credentials_dir)
+    creds.initialize()
+    # sed replaces the file rather than writing to it, which a memfd cannot support.
+    monkeypatch.setenv("EDITOR", 'echo "FIRST=uno" >' if buffer == "memfd" else 'sed -i "s/one/uno/"')
+
+    assert creds.edit(buffer=buffer)
+
+    assert creds.values()["FIRST"] == "uno"
+    assert sorted(os.listdir(credentials_dir)) == [
+        ".gitignore",
+        "credentials.env.enc",
+        "credentials.env.enc.lock",
+        "master.key",
+    ]
+
+
+def test_auto_buffer_is_not_a_memfd(credentials_dir: str):
+    with open_buffer("FIRST=one", os.path.join(credentials_dir, "decrypted.ini"), "auto") as staged:
+        assert not isinstance(staged, MemfdBuffer)
+        assert not staged.path.startswith("/dev/fd/")
+        assert staged.read() == "FIRST=one"
+
+
+def test_edit_buffer_from_environment(credentials_dir: str, monkeypatch):
+    creds = Credentials(credentials_dir)
+    creds.initialize()
+    monkeypatch.setenv("ENV_CREDENTIALS_EDIT_BUFFER", "file")
+    monkeypatch.setenv("EDITOR", 'sh -c \'case "$1" in */decrypted.ini) echo FIRST=uno > "$1";; esac\' editor')
+
+    assert creds.edit()
+    assert creds.values() == {"FIRST": "uno"}
+
+
+def test_edit_skips_write_when_unchanged(credentials_dir: str, monkeypatch):
+    creds = Credentials(credentials_dir)
+    creds.initialize()
+    monkeypatch.setenv("EDITOR", "true")
+
+    with patch.object(Credentials, "write_file", side_effect=AssertionError("written")):
+        assert not creds.edit()
+
+
+def test_edit_aborts_when_editor_fails(credentials_dir: str, monkeypatch):
+    creds = Credentials(credentials_dir)
+    creds.initialize()
+    monkeypatch.setenv("EDITOR", "sh -c 'echo FIRST=uno > \"$1\"; exit 1' editor")
+
+    with pytest.raises(CredentialsException):
+        creds.edit()
+
+    assert Credentials(credentials_dir).values()["FIRST"] == "one"
+
+
+def test_shares_decrypted_content_between_instances(credentials_dir: str):
+    Credentials(credentials_dir).initialize()
+
+    first = Credentials(credentials_dir)
+    assert first.values() == EXAMPLE
+
+    with patch.object(Credentials, "_get_key", side_effect=AssertionError("decrypted twice")):
+        second = Credentials(credentials_dir)
+        assert second.values() == first.values()
+        assert second.values() is not first.values()
+
+
+def test_cache_is_invalidated_when_files_change(credentials_dir: str):
+    creds = Credentials(credentials_dir)
+    creds.initialize()
+    assert Credentials(credentials_dir).values().get("FIRST") == "one"
+
+    creds.write_file("FIRST=uno")
+
+    assert Credentials(credentials_dir).values() == {"FIRST": "uno"}
+
+
+def test_cache_can_be_disabled(credentials_dir: str):
+    Credentials(credentials_dir).initialize()
+    Credentials(credentials_dir).values()
+
+    with patch.object(Credentials, "_get_key", wraps=Credentials(credentials_dir)._get_key) as get_key:
+        Credentials(credentials_dir, cache=None).values()
+
+    get_key.assert_called_once()
+
+
+def test_clear_cache_removes_entries(credentials_dir: str):
+    Credentials(credentials_dir).initialize()
+    Credentials(credentials_dir).values()
+
+    assert len(default_cache) > 0
+
+    clear_cache(credentials_dir)
+
+    with patch.object(Credentials, "_get_key", wraps=Credentials(credentials_dir)._get_key) as get_key:
+        Credentials(credentials_dir).values()
+
+    get_key.assert_called_once()
+
+
+def test_cache_respects_size_cap():
+    cache = CredentialsCache(max_size=2)
+
+    for i in range(3):
+        cache.set((f"/dir{i}", (0, 0, 0), (0, 0, 0)), CacheEntry(str(i)))
+
+    assert len(cache) == 2
+    assert cache.get(("/dir0", (0, 0, 0), (0, 0, 0))) is None
+    assert cache.get(("/dir2", (0, 0, 0), (0, 0, 0))).content == "2"
+
+
+def _write_legacy_file(creds: Credentials, data: str):
+    with open(creds.get_config_path(), "w") as f:
+        f.write(creds.key.encrypt(creds.nonce, bytes(data, "utf-8"), None).hex())
+
+
+def test_writes_binary_container(credentials_dir: str):
+    creds = Credentials(credentials_dir)
+    creds.initialize()
+
+    with open(creds.get_config_path(), "rb") as f:
+        data = f.read()
+
+    assert data.startswith(b"ENVC")
+    assert not creds.is_legacy_format()
+
+
+def test_reads_legacy_hex_file(credentials_dir: str):
+    creds = Credentials(credentials_dir)
+    creds.initialize()
+    _write_legacy_file(creds, "LEGACY=yes")
+    clear_cache()
+
+    reloaded_creds = Credentials(credentials_dir)
+
+    assert reloaded_creds.is_legacy_format()
+    assert reloaded_creds.values() == {"LEGACY": "yes"}
+
+
+def test_migrate_converts_legacy_file(credentials_dir: str):
+    creds = Credentials(credentials_dir)
+    creds.initialize()
+    _write_legacy_file(creds, "LEGACY=yes")
+    legacy_size = os.path.getsize(creds.get_config_path())
+
+    reloaded_creds = Credentials(credentials_dir)
+
+    assert reloaded_creds.migrate()
+    assert not reloaded_creds.migrate()
+    assert os.path.getsize(creds.get_config_path()) < legacy_size
+    assert Credentials(credentials_dir).values() == {"LEGACY": "yes"}
+
+
+def _nonce(creds: Credentials) -> bytes:
+    with open(creds.get_config_path(), "rb") as f:
+        return container.unpack(f.read()).nonce
+
+
+def test_every_write_uses_a_fresh_nonce(credentials_dir: str):
+    creds = Credentials(credentials_dir)
+    creds.initialize()
+    first = _nonce(creds)
+
+    creds.write_file("FIRST=one")
+
+    assert _nonce(creds) not in (first, creds.nonce)
+    assert Credentials(credentials_dir, cache=None).values() == {"FIRST": "one"}
+
+
+def test_migrate_replaces_reused_nonce(credentials_dir: str):
+    creds = Credentials(credentials_dir)
+    creds.initialize()
+    # Written like earlier versions did, with the nonce of the key.
+    with open(creds.get_config_path(), "wb") as f:
+        f.write(container.pack(creds.nonce, creds.key.encrypt(creds.nonce, b"REUSED=yes", None)))
+
+    assert Credentials(credentials_dir, cache=None).values() == {"REUSED": "yes"}
+    assert Credentials(credentials_dir, cache=None).migrate()
+    assert _nonce(creds) != creds.nonce
+    assert not Credentials(credentials_dir, cache=None).migrate()
+
+
+def test_writes_load_the_key_without_decrypting(credentials_dir: str):
+    Credentials(credentials_dir).initialize()
+    creds = Credentials(credentials_dir, cache=None)
+
+    with patch.object(Credentials, "_decrypt") as decrypt:
+        creds.write_file("FIRST=one")
+        creds.write_file("FIRST=two")
+
+    decrypt.assert_not_called()
+    assert Credentials(credentials_dir, cache=None).get("FIRST") == "two"
+
+    # The parsed key is cached, so writes of further instances do not read the key file either.
+    with patch("env_credentials.keys.FileKeySource.read") as read:
+        Credentials(credentials_dir, cache=None).write_file("FIRST=three")
+
+    read.assert_not_called()
+
+
+def test_writes_pick_up_a_replaced_key(credentials_dir: str):
+    creds = Credentials(credentials_dir, cache=None)
+    creds.initialize()
+
+    Credentials(credentials_dir).rotate_key()
+    creds.write_file("FIRST=one")
+
+    assert Credentials(credentials_dir, cache=None).values() == {"FIRST": "one"}
+
+
+def test_load_invalid_credentials_file_returns_helpful_error(credentials_dir: str):
+    creds = Credentials(credentials_dir)
+    creds.initialize()
+
+    with open(creds.get_config_path(), "wb") as f:
+        f.write(b"ENVC\x63")
+
+    with pytest.raises(InvalidCredentialsFileException):
+        Credentials(credentials_dir).load()
+
+
+def test_indexed_files_round_trip(credentials_dir: str):
+    creds = Credentials(credentials_dir, indexed=True)
+    creds.initialize()
+
+    assert creds.is_indexed_format()
+    assert Credentials(credentials_dir, cache=None).values() == EXAMPLE
+
+
+def test_indexed_get_only_decrypts_requested_record(credentials_dir: str):
+    creds = Credentials(credentials_dir, indexed=True)
+    creds.initialize()
+    creds.write_file('FIRST=one\nCERT="-----BEGIN-----\nabc\n-----END-----"\nEMPTY\n')
+
+    with patch("env_credentials.container.open_record", wraps=container.open_record) as open_record:
+        reloaded_creds = Credentials(credentials_dir, cache=None)
+        assert reloaded_creds.get("CERT") == "-----BEGIN-----\nabc\n-----END-----"
+        assert reloaded_creds.get("EMPTY") is None
+        assert reloaded_creds.get("MISSING", "default") == "default"
+        assert reloaded_creds.names() == ["FIRST", "CERT", "EMPTY"]
+
+    assert [c.args[1] for c in open_record.call_args_list] == ["CERT", "EMPTY"]
+
+
+@pytest.mark.parametrize("indexed", [False, True])
+def test_values_are_interpolated_when_read(credentials_dir: str, monkeypatch, indexed: bool):
+    creds = Credentials(credentials_dir, indexed=indexed)
+    creds.initialize()
+    monkeypatch.setenv("HOSTVAR", "written")
+    creds.write_file('HOST=db\nURL="db://${HOSTVAR}/${HOST}"\n')
+    creds.set("LITERAL", "${HOST}")
+
+    monkeypatch.setenv("HOSTVAR", "read")
+    reloaded_creds = Credentials(credentials_dir, cache=None)
+
+    assert reloaded_creds.get("URL") == "db://read/db"
+    assert reloaded_creds.values() == {"HOST": "db", "URL": "db://read/db", "LITERAL": "${HOST}"}
+
+
+@pytest.mark.parametrize("rewrite", ["edit", "migrate", "set"])
+def test_indexed_rewrites_keep_references(credentials_dir: str, monkeypatch, rewrite: str):
+    creds = Credentials(credentials_dir, indexed=True)
+    creds.initialize()
+    creds.write_file('HOST=db\nURL="db://${HOSTVAR}/${HOST}"\n')
+    monkeypatch.setenv("HOSTVAR", "written")
+    monkeypatch.setenv("EDITOR", "sed -i \"s/HOST='db'/HOST='other'/\"")
+
+    if rewrite == "migrate":
+        # Reusing the nonce of the key is one of the reasons to migrate.
+        with patch.object(Credentials, "_reuses_key_nonce", return_value=True):
+            assert Credentials(credentials_dir, cache=None, indexed=True).migrate()
+    elif rewrite == "edit":
+        assert Credentials(credentials_dir, cache=None).edit()
+    else:
+        Credentials(credentials_dir, cache=None).set("HOST", "other")
+
+    host = "db" if rewrite == "migrate" else "other"
+    monkeypatch.setenv("HOSTVAR", "read")
+    reloaded_creds = Credentials(credentials_dir, cache=None)
+
+    assert "${HOSTVAR}" in reloaded_creds.read_file()
+    assert reloaded_creds.values() == {"HOST": host, "URL": f"db://read/{host}"}
+
+
+def test_indexed_get_with_wrong_key(credentials_dir: str):
+    Credentials(credentials_dir, indexed=True).initialize()
+    with open(os.path.join(credentials_dir, "master.key"), "w") as f:
+        f.write(_new_key())
+
+    with pytest.raises(InvalidCredentialsFileException):
+        Credentials(credentials_dir, cache=None).get("FIRST")
+
+    with pytest.raises(InvalidCredentialsFileException):
+        Credentials(credentials_dir, cache=None).names()
+
+
+def test_get_reads_blob_files(credentials_dir: str):
+    Credentials(credentials_dir).initialize()
+
+    assert Credentials(credentials_dir).get("FIRST") == "one"
+    assert Credentials(credentials_dir).get("MISSING") is None
+
+
+def test_indexed_set_only_reseals_changed_record(credentials_dir: str):
+    creds = Credentials(credentials_dir, indexed=True)
+    creds.initialize()
+
+    with open(creds.get_config_path(), "rb") as f:
+        before = container.IndexedReader(f, creds.key)
+        first, second = before.raw("FIRST"), before.raw("SECOND")
+
+    creds.set("SECOND", "two")
+    creds.set("THIRD", "it's \\ quoted")
+
+    with open(creds.get_config_path(), "rb") as f:
+        after = container.IndexedReader(f, creds.key)
+        assert after.raw("FIRST") == first
+        assert after.raw("SECOND") != second
+
+    assert Credentials(credentials_dir).values() == {
+        "FIRST": "one",
+        "SECOND": "two",
+        "A_BOOL": "true",
+        "THIRD": "it's \\ quoted",
+    }
+
+
+def test_set_on_blob_files_keeps_content(credentials_dir: str):
+    creds = Credentials(credentials_dir)
+    creds.initialize()
+
+    creds.set("FIRST", "uno")
+
+    assert creds.read_file().startswith("# Add your secure credentials to this file.")
+    assert Credentials(credentials_dir).values() == {"FIRST": "uno", "SECOND": "2", "A_BOOL": "true"}
+
+
+def test_migrate_to_indexed(credentials_dir: str):
+    Credentials(credentials_dir).initialize()
+
+    creds = Credentials(credentials_dir, indexed=True)
+
+    assert creds.migrate()
+    assert not creds.migrate()
+    assert Credentials(credentials_dir).is_indexed_format()
+    assert Credentials(credentials_dir).values() == EXAMPLE
+
+
+def test_indexed_values_skip_parsing(credentials_dir: str):
+    Credentials(credentials_dir, indexed=True).initialize()
+
+    with patch("env_credentials.credentials._parse", side_effect=AssertionError("parsed")):
+        assert Credentials(credentials_dir, cache=None).values() == EXAMPLE
+
+
+def test_load_selects_names(credentials_dir: str, monkeypatch):
+    creds = Credentials(credentials_dir)
+    creds.initialize()
+    creds.write_file("APP_TOKEN=token\nAPP_SECRET=secret\nDB_PASSWORD=password\nOTHER=other\n")
+    # Registering the names restores them to unset once the test is done.
+    for name in ("APP_TOKEN", "APP_SECRET", "DB_PASSWORD", "OTHER"):
+        monkeypatch.delenv(name, raising=False)
+
+    creds.load(include=["APP_*", "DB_*"], exclude="*_SECRET")
+
+    assert [n for n in ("APP_TOKEN", "APP_SECRET", "DB_PASSWORD", "OTHER") if n in os.environ] == ["APP_TOKEN", "DB_PASSWORD"]
+    assert creds.values()["OTHER"] == "other"
+
+    creds.load(prefix="APP_", strip_prefix=True)
+
+    assert os.environ["TOKEN"] == "token"
+    assert os.environ["SECRET"] == "secret"
+    os.environ.pop("TOKEN")
+    os.environ.pop("SECRET")
+
+
+def test_load_override(credentials_dir: str, monkeypatch):
+    Credentials(credentials_dir).initialize()
+    monkeypatch.setenv("FIRST", "from environment")
+
+    Credentials(credentials_dir).load(include="FIRST")
+    assert os.environ["FIRST"] == "from environment"
+
+    Credentials(credentials_dir).load(include="FIRST", override=True)
+    assert os.environ["FIRST"] == "one"
+
+
+def test_update_and_unset_keep_comments(credentials_dir: str):
+    creds = Credentials(credentials_dir)
+    creds.initialize()
+
+    creds.update({"SECOND": "two", "THIRD": "3"})
+    creds.unset(["A_BOOL", "MISSING"])
+
+    content = Credentials(credentials_dir).read_file()
+    assert content.startswith("# Add your secure credentials to this file.")
+    assert content.endswith("FIRST=\"one\"\nSECOND='two'\nTHIRD='3'\n")
+    assert Credentials(credentials_dir).values() == {"FIRST": "one", "SECOND": "two", "THIRD": "3"}
+
+
+ROUND_TRIP = {
+    "BACKSLASH": "a\\b",
+    "INNER_BACKSLASHES": "\\'\\\\'",
+    "QUOTES": 'it\'s "quoted"',
+    "QUOTE_AT_END": "'",
+    "NEWLINES": "one\ntwo\r\nthree\n",
+    "REFERENCE": "${FIRST} and ${NOT_SET:-default} and ${",
+    "COMMENT": " # not a comment",
+    "EMPTY": "",
+    "NONE": None,
+}
+
+
+@pytest.mark.parametrize("indexed", [False, True])
+def test_written_values_are_read_back(credentials_dir: str, indexed: bool):
+    Credentials(credentials_dir, indexed=indexed).initialize()
+    creds = Credentials(credentials_dir)
+
+    for name, value in ROUND_TRIP.items():
+        creds.set(name, value)
+
+    content = Credentials(credentials_dir, cache=None).read_file()
+    assert Credentials(credentials_dir, cache=None).values() == {**EXAMPLE, **ROUND_TRIP}
+    assert dict(dotenv_values(stream=StringIO(content))) == {**EXAMPLE, **ROUND_TRIP}
+
+
+@pytest.mark.parametrize("name", ["", "BAD NAME", "A=B", "#A", "'A", "A\n"])
+def test_names_that_cannot_be_read_back_are_rejected(initialized_dir: str, name: str):
+    with pytest.raises(CredentialsException):
+        Credentials(initialized_dir).set(name, "x")
+
+    assert Credentials(initialized_dir, cache=None).values() == EXAMPLE
+
+
+def test_trailing_backslash_is_rejected(initialized_dir: str):
+    creds = Credentials(initialized_dir)
+
+    with pytest.raises(CredentialsException):
+        creds.update({"X": "a\\", "Y": "plain"})
+
+    assert Credentials(initialized_dir, cache=None).values() == EXAMPLE
+
+
+def test_update_writes_once(credentials_dir: str):
+    creds = Credentials(credentials_dir)
+    creds.initialize()
+
+    with patch.object(Credentials, "_write_bytes", autospec=True, side_effect=Credentials._write_bytes) as write:
+        creds.update({f"NAME_{i}": str(i) for i in range(10)})
+
+    write.assert_called_once()
+    assert Credentials(credentials_dir).get("NAME_9") == "9"
+
+
+def test_indexed_update_and_unset(credentials_dir: str):
+    Credentials(credentials_dir, indexed=True).initialize()
+    creds = Credentials(credentials_dir)
+
+    creds.update({"FIRST": "uno", "NEW": None})
+    creds.unset(["SECOND"])
+
+    assert Credentials(credentials_dir).is_indexed_format()
+    assert Credentials(credentials_dir).values() == {"FIRST": "uno", "A_BOOL": "true", "NEW": None}
+
+
+def test_writes_replace_the_file(credentials_dir: str):
+    creds = Credentials(credentials_dir)
+    creds.initialize()
+    os.chmod(creds.get_config_path(), 0o640)
+    inode = os.stat(creds.get_config_path()).st_ino
+
+    creds.set("FIRST", "uno")
+
+    assert os.stat(creds.get_config_path()).st_ino != inode
+    assert os.stat(creds.get_config_path()).st_mode & 0o777 == 0o640
+    assert sorted(os.listdir(credentials_dir)) == [
+        ".gitignore",
+        "credentials.env.enc",
+        "credentials.env.enc.lock",
+        "master.key",
+    ]
+
+
+@pytest.mark.parametrize("umask", [0o022, 0o077])
+def test_new_files_follow_the_umask(credentials_dir: str, umask: int):
+    previous = os.umask(umask)
+    try:
+        Credentials(credentials_dir).initialize()
+    finally:
+        os.umask(previous)
+
+    assert os.stat(os.path.join(credentials_dir, "credentials.env.enc")).st_mode & 0o777 == 0o666 & ~umask
+    assert os.stat(os.path.join(credentials_dir, "master.key")).st_mode & 0o777 == 0o666 & ~umask
+
+
+def test_compressed_file(credentials_dir: str):
+    pem = "\n".join(["-----BEGIN CERTIFICATE-----"] + ["MIIEowIBAAKCAQEAu1SU1LfVLPHCozMxH2Mo4lgOEePzNm0"] * 64)
+    Credentials(credentials_dir, compression=True).initialize()
+    creds = Credentials(credentials_dir)
+    creds.set("CERT", pem)
+
+    with open(creds.get_config_path(), "rb") as f:
+        header = container.unpack(f.read())
+
+    assert header.version == container.CODEC_VERSION
+    assert header.codec == compression.CODEC_ZLIB
+    assert len(header.ciphertext) < len(pem)
+    assert Credentials(credentials_dir, cache=None).get("CERT") == pem
+    assert Credentials(credentials_dir, cache=None).get("FIRST") == "one"
+
+
+def test_compressed_header_is_authenticated(credentials_dir: str):
+    Credentials(credentials_dir, compression=True).initialize()
+    path = Credentials(credentials_dir).get_config_path()
+
+    with open(path, "rb") as f:
+        data = bytearray(f.read())
+    # Claim the plaintext is not compressed.
+    data[container.CODEC_HEADER_SIZE - 2] = compression.CODEC_NONE
+    with open(path, "wb") as f:
+        f.write(data)
+
+    with pytest.raises(InvalidCredentialsFileException) as e:
+        Credentials(credentials_dir, cache=None).values()
+    assert isinstance(e.value.previous, InvalidTag)
+
+
+def test_migrate_changes_compression(credentials_dir: str):
+    Credentials(credentials_dir).initialize()
+
+    assert not Credentials(credentials_dir, compression=False).migrate()
+    assert Credentials(credentials_dir, compression="lzma").migrate()
+    assert Credentials(credentials_dir)._file_codec() == compression.CODEC_LZMA
+    assert Credentials(credentials_dir, compression=False).migrate()
+
+    with open(Credentials(credentials_dir).get_config_path(), "rb") as f:
+        assert container.unpack(f.read()).version == container.VERSION
+
+
+def test_custom_codec(credentials_dir: str):
+    compression.register(compression.Codec(200, "reversed", lambda data: data[::-1], lambda data: data[::-1]))
+    try:
+        Credentials(credentials_dir, compression="reversed").initialize()
+
+        assert Credentials(credentials_dir, cache=None).values()["FIRST"] == "one"
+
+        with pytest.raises(ValueError):
+            compression.register(compression.Codec(200, "other", bytes, bytes))
+    finally:
+        del compression._codecs[200], compression._names["reversed"]
+
+    with pytest.raises(CredentialsException):
+        Credentials(credentials_dir, compression="unknown").set("FIRST", "uno")
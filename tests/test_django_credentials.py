@@ -1,12 +1,18 @@
+import json
 import os
 import shutil
 import tempfile
+import threading
 from io import StringIO
 
+from django.core.management import CommandError
 from django.core.management import call_command
 from django.test import TestCase
 
 from django_credentials import credentials
+from env_credentials import lazy
+from env_credentials.agent import AgentServer
+from env_credentials.credentials import Credentials
 from env_credentials.credentials import CredentialsException
 
 
@@ -47,6 +53,20 @@ class TestCredentialCommands(TestCase):
         content = out.getvalue()
         self.assertEqual("test=1\n", content)
 
+    def test_stats(self):
+        out = StringIO()
+        call_command("credentials", "-d", self.tmpdir, "init")
+        call_command("credentials", "-d", self.tmpdir, "stats", "--no-cache", "--json", stdout=out)
+        data = json.loads(out.getvalue())
+        self.assertGreater(data["phases"]["decrypt"]["count"], 0)
+        self.assertIn("hits", data["cache"])
+
+    def test_migrate(self):
+        out = StringIO()
+        call_command("credentials", "-d", self.tmpdir, "init")
+        call_command("credentials", "-d", self.tmpdir, "migrate", stdout=out)
+        self.assertIn("already in the binary format", out.getvalue())
+
 
 class TestCredentials(TestCase):
     def setUp(self):
@@ -57,11 +77,115 @@ class TestCredentials(TestCase):
         super().tearDown()
         shutil.rmtree(self.tmpdir)
 
+    def test_set_unset_and_import(self):
+        call_command("credentials", "-d", self.tmpdir, "init")
+        call_command("credentials", "-d", self.tmpdir, "set", "FIRST=uno", "NEW=value")
+        call_command("credentials", "-d", self.tmpdir, "unset", "SECOND")
+
+        path = os.path.join(self.tmpdir, "import.env")
+        with open(path, "w") as f:
+            f.write("A_BOOL=false\nIMPORTED=yes\n")
+        call_command("credentials", "-d", self.tmpdir, "import", path)
+
+        self.assertEqual(
+            Credentials(self.tmpdir).values(),
+            {"FIRST": "uno", "A_BOOL": "false", "NEW": "value", "IMPORTED": "yes"},
+        )
+
+    def test_rotate(self):
+        call_command("credentials", "-d", self.tmpdir, "init")
+        with open(os.path.join(self.tmpdir, "master.key")) as f:
+            key = f.read()
+
+        out = StringIO()
+        call_command("credentials", "-d", self.tmpdir, "rotate", stdout=out)
+
+        with open(os.path.join(self.tmpdir, "master.key")) as f:
+            self.assertNotEqual(f.read(), key)
+        self.assertIn("[1/1] rotated", out.getvalue())
+        self.assertEqual(Credentials(self.tmpdir).get("FIRST"), "one")
+
+    def test_verify(self):
+        call_command("credentials", "-d", self.tmpdir, "init")
+
+        out = StringIO()
+        call_command("credentials", "-d", self.tmpdir, "verify", "--require", "FIRST", stdout=out)
+        self.assertIn("1 of 1 credentials directories are valid", out.getvalue())
+
+        with self.assertRaises(CommandError):
+            call_command("credentials", "-d", self.tmpdir, "verify", "--require", "MISSING", stdout=StringIO())
+
     def test_loads_credentials(self):
         call_command("credentials", "-d", self.tmpdir, "init")
         credentials.load(credentials_dir=self.tmpdir)
         assert os.environ.get("FIRST") == "one"
 
+    def test_loads_credentials_of_environment(self):
+        call_command("credentials", "-d", self.tmpdir, "init")
+        call_command("credentials", "-d", self.tmpdir, "--layer", "production", "init")
+        call_command("credentials", "-d", self.tmpdir, "--layer", "production", "set", "LAYERED=prod")
+
+        os.environ["ENV_CREDENTIALS_ENVIRONMENT"] = "production"
+        try:
+            credentials.load(credentials_dir=self.tmpdir)
+        finally:
+            del os.environ["ENV_CREDENTIALS_ENVIRONMENT"]
+
+        self.assertEqual(os.environ.pop("LAYERED", None), "prod")
+        self.assertEqual(os.environ.get("SECOND"), "2")
+
+    def test_environment_cannot_be_loaded_through_agent(self):
+        call_command("credentials", "-d", self.tmpdir, "init")
+
+        with self.assertRaises(CredentialsException):
+            credentials.load(
+                credentials_dir=self.tmpdir, environment="production", agent=os.path.join(self.tmpdir, "missing.sock")
+            )
+        self.assertNotIn("FIRST", os.environ)
+
+    def test_loads_credentials_lazily(self):
+        call_command("credentials", "-d", self.tmpdir, "init")
+        values = credentials.load(credentials_dir=self.tmpdir, lazy=True, names=["SECOND"])
+        try:
+            self.assertEqual(list(values), ["SECOND"])
+            self.assertEqual(os.environ.get("SECOND"), "2")
+        finally:
+            lazy.uninstall()
+
+    def test_loads_selected_credentials(self):
+        call_command("credentials", "-d", self.tmpdir, "init")
+        Credentials(self.tmpdir).set("SELECTED_ONLY", "yes")
+
+        credentials.load(credentials_dir=self.tmpdir, prefix="SELECTED_", strip_prefix=True)
+        self.assertEqual(os.environ.pop("ONLY"), "yes")
+        self.assertNotIn("SELECTED_ONLY", os.environ)
+
+    def test_loads_credentials_through_agent(self):
+        call_command("credentials", "-d", self.tmpdir, "init")
+        Credentials(self.tmpdir).set("FROM_AGENT", "yes")
+        server = AgentServer(os.path.join(self.tmpdir, "agent.sock"), Credentials(self.tmpdir), watch=False)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+
+        try:
+            # The local directory is only used when the agent cannot be reached.
+            local_dir = os.path.join(self.tmpdir, "local")
+            os.mkdir(local_dir)
+            Credentials(local_dir).initialize()
+            credentials.load(credentials_dir=local_dir, agent=server.socket_path)
+            self.assertEqual(os.environ.pop("FROM_AGENT"), "yes")
+        finally:
+            server.shutdown()
+            server.server_close()
+            thread.join()
+
+    def test_loads_credentials_without_agent(self):
+        call_command("credentials", "-d", self.tmpdir, "init")
+        Credentials(self.tmpdir).set("FROM_FALLBACK", "yes")
+
+        credentials.load(credentials_dir=self.tmpdir, agent=os.path.join(self.tmpdir, "missing.sock"))
+        self.assertEqual(os.environ.pop("FROM_FALLBACK"), "yes")
+
     def test_default_dir_without_settings(self):
         with self.assertRaises(CredentialsException) as cm:
             existing_settings = os.environ["DJANGO_SETTINGS_MODULE"]
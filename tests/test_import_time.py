@@ -0,0 +1,67 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+# Importing the settings helpers must stay cheap, decrypting is only paid for when credentials are actually read. The
+# wall clock time of a whole import is too noisy to assert on, so the modules that dominate it are checked instead.
+DEFERRED_PACKAGES = ("cryptography", "dotenv", "secrets", "json")
+DEFERRED_MODULES = (
+    "env_credentials.parser",
+    "env_credentials.keys",
+    "env_credentials.ciphers",
+    "env_credentials.compression",
+    "env_credentials.passphrase",
+    "env_credentials.layers",
+)
+
+# The self times `-X importtime` reports for the modules of this project, summed, with their bytecode already compiled.
+# They add up to about 5 ms, the budget leaves headroom for slower machines. Dependencies are covered by the check of
+# the imported modules instead, so their import time does not count.
+IMPORT_BUDGET_MS = 25
+PACKAGES = ("env_credentials", "django_credentials")
+
+ROOT = Path(__file__).parent.parent
+
+
+def test_heavy_dependencies_are_not_imported():
+    script = (
+        "import sys; before = set(sys.modules); import django_credentials.credentials; "
+        "print('\\n'.join(set(sys.modules) - before))"
+    )
+    result = subprocess.run([sys.executable, "-c", script], cwd=ROOT, capture_output=True, text=True, check=True)
+    imported = result.stdout.split()
+
+    assert "django_credentials.credentials" in imported
+    assert not [m for m in imported if m.split(".")[0] in DEFERRED_PACKAGES or m in DEFERRED_MODULES]
+
+
+def _import_time_ms(pycache: str) -> float:
+    # Bytecode is written to `pycache`, so only the first run compiles the modules.
+    env = {name: value for name, value in os.environ.items() if name != "PYTHONDONTWRITEBYTECODE"}
+    command = [sys.executable, "-X", "importtime", "-X", f"pycache_prefix={pycache}"]
+    result = subprocess.run(
+        command + ["-c", "import django_credentials.credentials"],
+        cwd=ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    total = 0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+
+        self_time, _, module = line[len("import time:") :].split("|")
+        if self_time.strip().isdigit() and module.strip().split(".")[0] in PACKAGES:
+            total += int(self_time)
+
+    return total / 1000
+
+
+def test_import_time_budget(tmp_path):
+    _import_time_ms(str(tmp_path))
+
+    assert min(_import_time_ms(str(tmp_path)) for _ in range(3)) < IMPORT_BUDGET_MS
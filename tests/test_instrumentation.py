@@ -0,0 +1,63 @@
+import pytest
+
+from env_credentials.credentials import Credentials
+from env_credentials.instrumentation import Observer
+from env_credentials.instrumentation import Stats
+from env_credentials.instrumentation import add_observer
+from env_credentials.instrumentation import remove_observer
+
+
+class RecordingObserver(Observer):
+    def __init__(self):
+        self.phases = []
+        self.cache = []
+
+    def on_phase(self, phase, duration, size):
+        self.phases.append((phase, size))
+
+    def on_cache(self, hit):
+        self.cache.append(hit)
+
+
+@pytest.fixture
+def observer():
+    observer = RecordingObserver()
+    add_observer(observer)
+    yield observer
+    remove_observer(observer)
+
+
+def test_observer_receives_each_phase(initialized_dir: str, observer: RecordingObserver):
+    Credentials(initialized_dir, cache=None).load()
+
+    assert [phase for phase, _ in observer.phases] == ["key", "read", "decrypt", "parse", "load"]
+    assert all(size for _, size in observer.phases)
+
+
+def test_observer_receives_cache_hits_and_misses(initialized_dir: str, observer: RecordingObserver):
+    Credentials(initialized_dir).values()
+    Credentials(initialized_dir).values()
+
+    assert observer.cache == [False, True]
+    assert [phase for phase, _ in observer.phases].count("parse") == 1
+
+
+def test_stats_aggregate_phases(initialized_dir: str):
+    stats = Stats()
+    add_observer(stats)
+
+    try:
+        for _ in range(2):
+            Credentials(initialized_dir, cache=None).values()
+    finally:
+        remove_observer(stats)
+
+    data = stats.as_dict()
+
+    assert data["phases"]["decrypt"]["count"] == 2
+    assert data["phases"]["decrypt"]["total_s"] >= data["phases"]["decrypt"]["max_s"] > 0
+    assert data["phases"]["parse"]["bytes"] > 0
+
+    stats.reset()
+
+    assert stats.as_dict() == {"phases": {}, "cache": {"hits": 0, "misses": 0}}
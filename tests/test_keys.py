@@ -0,0 +1,163 @@
+import os
+from unittest.mock import Mock
+from unittest.mock import patch
+
+import pytest
+
+from env_credentials.credentials import Credentials
+from env_credentials.credentials import CredentialsException
+from env_credentials.credentials import KeyNotFoundException
+from env_credentials.credentials import _new_key
+from env_credentials.keys import KEY_ENV
+from env_credentials.keys import KEY_FILE_ENV
+from env_credentials.keys import CallableKeySource
+from env_credentials.keys import EnvKeySource
+from env_credentials.keys import FdKeySource
+from env_credentials.keys import FileKeySource
+from env_credentials.keys import KeyCache
+from env_credentials.keys import key_cache
+
+
+@pytest.fixture(autouse=True)
+def clean_environment(monkeypatch):
+    monkeypatch.delenv(KEY_ENV, raising=False)
+    monkeypatch.delenv(KEY_FILE_ENV, raising=False)
+    key_cache.clear()
+
+
+def test_environment_key_takes_precedence(credentials_dir: str, monkeypatch):
+    monkeypatch.setenv(KEY_ENV, _new_key())
+
+    Credentials(credentials_dir).initialize()
+
+    assert not os.path.exists(os.path.join(credentials_dir, "master.key"))
+    assert Credentials(credentials_dir).values()["FIRST"] == "one"
+
+    monkeypatch.setenv(KEY_ENV, _new_key())
+    with pytest.raises(CredentialsException):
+        Credentials(credentials_dir).values()
+
+
+def test_key_file_from_environment(credentials_dir: str, monkeypatch):
+    creds = Credentials(credentials_dir)
+    creds.initialize()
+    moved = os.path.join(credentials_dir, "elsewhere.key")
+    os.rename(creds.get_key_path(), moved)
+
+    with pytest.raises(KeyNotFoundException):
+        Credentials(credentials_dir).values()
+
+    monkeypatch.setenv(KEY_FILE_ENV, moved)
+
+    assert Credentials(credentials_dir).values()["FIRST"] == "one"
+
+
+def test_explicit_sources(credentials_dir: str):
+    key = _new_key()
+    Credentials(credentials_dir, key_source=CallableKeySource(lambda: key)).initialize()
+
+    read, write = os.pipe()
+    os.write(write, key.encode("ascii") + b"\n")
+    os.close(write)
+
+    try:
+        source = FdKeySource(read)
+        assert Credentials(credentials_dir, key_source=source, cache=None).values()["FIRST"] == "one"
+        # The descriptor is only read once.
+        assert Credentials(credentials_dir, key_source=source, cache=None).values()["FIRST"] == "one"
+    finally:
+        os.close(read)
+
+
+def test_callable_is_only_called_once(credentials_dir: str):
+    key = _new_key()
+    func = Mock(return_value=key)
+    source = CallableKeySource(func)
+
+    Credentials(credentials_dir, key_source=source).initialize()
+    Credentials(credentials_dir, key_source=source).values()
+    Credentials(credentials_dir, key_source=source).values()
+    Credentials(credentials_dir, key_source=source).set("FIRST", "uno")
+
+    assert func.call_count == 1
+    assert Credentials(credentials_dir, key_source=source, cache=None).get("FIRST") == "uno"
+
+
+def test_callable_is_called_again_for_a_new_version(credentials_dir: str):
+    keys = {1: _new_key(), 2: _new_key()}
+    version = 1
+    func = Mock(side_effect=lambda: keys[version])
+    source = CallableKeySource(func, version=lambda: version)
+
+    Credentials(credentials_dir, key_source=source).initialize()
+    Credentials(credentials_dir, key_source=source).values()
+    assert func.call_count == 1
+
+    version = 2
+    with pytest.raises(CredentialsException):
+        Credentials(credentials_dir, key_source=source, cache=None).values()
+    assert func.call_count == 2
+
+
+def test_sources_are_tried_in_order(credentials_dir: str, monkeypatch):
+    key_path = os.path.join(credentials_dir, "custom.key")
+    with open(key_path, "w") as f:
+        f.write(_new_key())
+
+    sources = [EnvKeySource("CUSTOM_MASTER_KEY"), FileKeySource(key_path)]
+    creds = Credentials(credentials_dir, key_source=sources)
+    creds.initialize()
+
+    assert not os.path.exists(creds.get_key_path())
+    assert creds.key_fingerprint()[0] == "file"
+
+    monkeypatch.setenv("CUSTOM_MASTER_KEY", "invalid")
+    assert creds.key_fingerprint()[0] == "env"
+
+
+def test_missing_key_lists_sources(credentials_dir: str):
+    creds = Credentials(credentials_dir, key_source=[EnvKeySource("CUSTOM_MASTER_KEY"), FileKeySource("missing.key")])
+
+    assert creds.key_fingerprint() is None
+
+    with pytest.raises(KeyNotFoundException) as e:
+        creds.initialize()
+
+    assert e.value.message == "Could not find key: $CUSTOM_MASTER_KEY or missing.key"
+
+
+def test_parsed_keys_are_cached(credentials_dir: str):
+    Credentials(credentials_dir).initialize()
+    Credentials(credentials_dir, cache=None).values()
+
+    with patch.object(FileKeySource, "read", side_effect=AssertionError("read twice")):
+        assert Credentials(credentials_dir, cache=None).values()["FIRST"] == "one"
+
+
+def test_replaced_key_is_read_again(credentials_dir: str):
+    creds = Credentials(credentials_dir)
+    creds.initialize()
+    creds.values()
+
+    creds.rotate_key()
+
+    assert Credentials(credentials_dir, cache=None).values()["FIRST"] == "one"
+
+
+def test_rotation_requires_key_file(credentials_dir: str, monkeypatch):
+    monkeypatch.setenv(KEY_ENV, _new_key())
+    creds = Credentials(credentials_dir)
+    creds.initialize()
+
+    with pytest.raises(CredentialsException):
+        creds.rotate_key()
+
+
+def test_key_cache_respects_size_cap():
+    cache = KeyCache(max_size=2)
+
+    for i in range(3):
+        cache.set(i, (None, b""))
+
+    assert cache.get(0) is None
+    assert cache.get(2) is not None
@@ -0,0 +1,135 @@
+import os
+from unittest.mock import patch
+
+import pytest
+
+from env_credentials.cache import CredentialsCache
+from env_credentials.credentials import Credentials
+from env_credentials.credentials import CredentialsException
+from env_credentials.credentials import CredentialsNotFoundException
+from env_credentials.credentials import _new_key
+from env_credentials.credentials import _parse_key
+from env_credentials.layers import LayeredCredentials
+from env_credentials.layers import expand
+
+
+def _layer(initialized_dir: str, name: str, own_key: bool = False, **values) -> Credentials:
+    creds = Credentials(initialized_dir, layer=name)
+    creds.initialize(own_key=own_key)
+    creds.update(values)
+
+    return creds
+
+
+def test_expand():
+    assert expand("production") == ["production"]
+    assert expand("production.eu.tenant") == ["production", "production.eu", "production.eu.tenant"]
+
+
+def test_layers_are_stored_next_to_base(initialized_dir: str):
+    _layer(initialized_dir, "production", FIRST="prod")
+
+    assert os.path.exists(os.path.join(initialized_dir, "credentials.production.env.enc"))
+    assert not os.path.exists(os.path.join(initialized_dir, "production.key"))
+    assert Credentials(initialized_dir, layer="production").values() == {"FIRST": "prod"}
+    assert Credentials(initialized_dir).values()["FIRST"] == "one"
+
+
+def test_layer_with_own_key(initialized_dir: str):
+    _layer(initialized_dir, "production", own_key=True, FIRST="prod")
+    os.remove(os.path.join(initialized_dir, "master.key"))
+
+    assert Credentials(initialized_dir, layer="production").values() == {"FIRST": "prod"}
+
+    with open(os.path.join(initialized_dir, ".gitignore")) as f:
+        assert "production.key" in f.read()
+
+
+def test_invalid_layer_name(initialized_dir: str):
+    with pytest.raises(CredentialsException):
+        Credentials(initialized_dir, layer="../production")
+
+
+@pytest.mark.parametrize("indexed", [False, True])
+def test_rotating_the_base_key_re_encrypts_layers_sharing_it(initialized_dir: str, indexed: bool):
+    Credentials(initialized_dir, indexed=indexed, layer="production").initialize()
+    Credentials(initialized_dir, layer="production").set("FIRST", "prod")
+    own = _layer(initialized_dir, "staging", own_key=True, FIRST="staging")
+    with open(own.get_key_path()) as f:
+        own_key = f.read()
+
+    Credentials(initialized_dir).rotate_key()
+
+    assert Credentials(initialized_dir, cache=None, layer="production").values() == {"FIRST": "prod"}
+    assert Credentials(initialized_dir, cache=None, layer="production").is_indexed_format() == indexed
+    assert Credentials(initialized_dir, cache=None, layer="staging").values() == {"FIRST": "staging"}
+    with open(own.get_key_path()) as f:
+        assert f.read() == own_key
+
+
+def test_recover_restores_layers_sharing_the_key(initialized_dir: str):
+    layer = _layer(initialized_dir, "production", FIRST="prod")
+
+    # Interrupted after the layer was encrypted with the new key, before the base credentials were.
+    new_key = _new_key()
+    base = Credentials(initialized_dir, cache=None)
+    with open(base.get_new_key_path(), "w") as f:
+        f.write(new_key)
+    rotated = Credentials(initialized_dir, cache=None, layer="production")
+    rotated.key, rotated.nonce = _parse_key(new_key)
+    rotated.write_file(layer.read_file())
+
+    assert not base.recover_key()
+    assert Credentials(initialized_dir, cache=None, layer="production").values() == {"FIRST": "prod"}
+
+
+def test_later_layers_override(initialized_dir: str):
+    _layer(initialized_dir, "production", FIRST="prod", REGION="us")
+    _layer(initialized_dir, "production.eu", own_key=True, REGION="eu")
+
+    creds = LayeredCredentials(initialized_dir, "production.eu")
+
+    assert creds.values() == {"FIRST": "prod", "SECOND": "2", "A_BOOL": "true", "REGION": "eu"}
+    assert creds.get("REGION") == "eu"
+
+
+def test_missing_parent_layers_are_skipped(initialized_dir: str):
+    _layer(initialized_dir, "production.eu", REGION="eu")
+
+    assert LayeredCredentials(initialized_dir, "production.eu").get("REGION") == "eu"
+
+    with pytest.raises(CredentialsNotFoundException):
+        LayeredCredentials(initialized_dir, ["production", "production.eu"]).values()
+
+    with pytest.raises(CredentialsNotFoundException):
+        LayeredCredentials(initialized_dir, "staging").values()
+
+
+def test_merged_values_are_cached(initialized_dir: str):
+    _layer(initialized_dir, "production", FIRST="prod")
+    cache = CredentialsCache()
+
+    assert LayeredCredentials(initialized_dir, "production", cache=cache).get("FIRST") == "prod"
+
+    with patch.object(Credentials, "values", side_effect=AssertionError("merged twice")):
+        assert LayeredCredentials(initialized_dir, "production", cache=cache).get("FIRST") == "prod"
+
+
+def test_changed_layer_is_merged_again(initialized_dir: str):
+    layer = _layer(initialized_dir, "production", FIRST="prod")
+    assert LayeredCredentials(initialized_dir, "production").get("FIRST") == "prod"
+
+    layer.set("FIRST", "changed")
+
+    assert LayeredCredentials(initialized_dir, "production").get("FIRST") == "changed"
+    assert Credentials(initialized_dir).get("FIRST") == "one"
+
+
+def test_load(initialized_dir: str):
+    _layer(initialized_dir, "production", FIRST="prod")
+    os.environ["SECOND"] = "from environment"
+
+    LayeredCredentials(initialized_dir, "production").load()
+
+    assert os.environ["FIRST"] == "prod"
+    assert os.environ["SECOND"] == "from environment"
@@ -0,0 +1,79 @@
+import os
+from unittest.mock import patch
+
+import pytest
+
+from env_credentials import lazy
+from env_credentials.credentials import Credentials
+
+
+@pytest.fixture
+def credentials_dir(credentials_dir: str):
+    Credentials(credentials_dir, indexed=True).initialize()
+    Credentials(credentials_dir).set("LAZY_SECRET", "hidden")
+    yield credentials_dir
+
+    lazy.uninstall()
+
+
+def test_names_are_registered_without_decrypting_values(credentials_dir: str):
+    with patch.object(Credentials, "values", side_effect=AssertionError("decrypted eagerly")):
+        values = lazy.load(Credentials(credentials_dir, cache=None))
+
+        assert list(values) == ["FIRST", "SECOND", "A_BOOL", "LAZY_SECRET"]
+        assert "LAZY_SECRET" in values
+        assert "UNRELATED_NAME" not in os.environ
+
+
+def test_environ_access_decrypts_once(credentials_dir: str):
+    creds = Credentials(credentials_dir, cache=None)
+    lazy.load(creds)
+
+    with patch.object(creds, "load", wraps=creds.load) as load:
+        assert os.getenv("LAZY_SECRET") == "hidden"
+        assert os.environ["FIRST"] == "one"
+        assert "SECOND" in os.environ
+
+    load.assert_called_once()
+
+
+def test_existing_environment_wins(credentials_dir: str):
+    os.environ["FIRST"] = "from environment"
+    lazy.load(Credentials(credentials_dir), names=["FIRST", "LAZY_SECRET"])
+
+    assert os.environ["LAZY_SECRET"] == "hidden"
+    assert os.environ["FIRST"] == "from environment"
+
+
+def test_copying_environ_resolves_pending_names(credentials_dir: str):
+    lazy.load(Credentials(credentials_dir))
+
+    assert os.environ.copy()["LAZY_SECRET"] == "hidden"
+
+
+def test_mapping_proxy_reads_values(credentials_dir: str):
+    values = lazy.load(Credentials(credentials_dir))
+
+    assert values["LAZY_SECRET"] == "hidden"
+    assert dict(values)["FIRST"] == "one"
+
+
+def test_uninstall_restores_environ(credentials_dir: str):
+    lazy.load(Credentials(credentials_dir))
+    lazy.uninstall()
+
+    assert type(os.environ) is os._Environ
+    assert os.getenv("LAZY_SECRET") is None
+
+
+def test_selected_names_are_registered(credentials_dir: str):
+    values = lazy.load(Credentials(credentials_dir), prefix="LAZY_", strip_prefix=True)
+
+    assert list(values) == ["SECRET"]
+    assert values["SECRET"] == "hidden"
+    assert "LAZY_SECRET" not in values
+    try:
+        assert os.environ["SECRET"] == "hidden"
+        assert "LAZY_SECRET" not in os.environ
+    finally:
+        os.environ.pop("SECRET", None)
@@ -0,0 +1,142 @@
+import os
+import subprocess
+import sys
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+
+from env_credentials.credentials import Credentials
+from env_credentials.credentials import LockTimeoutException
+
+
+def test_lock_is_reentrant(initialized_dir: str):
+    creds = Credentials(initialized_dir)
+
+    with creds.lock(), creds.lock():
+        creds.set("NESTED", "yes")
+
+    assert Credentials(initialized_dir).get("NESTED") == "yes"
+
+
+def test_lock_excludes_other_threads(initialized_dir: str):
+    acquired = threading.Event()
+    release = threading.Event()
+
+    def hold():
+        with Credentials(initialized_dir).lock():
+            acquired.set()
+            release.wait()
+
+    thread = threading.Thread(target=hold)
+    thread.start()
+    acquired.wait()
+
+    try:
+        with pytest.raises(LockTimeoutException):
+            with Credentials(initialized_dir).lock(timeout=0.05):
+                pass
+    finally:
+        release.set()
+        thread.join()
+
+    with Credentials(initialized_dir).lock(timeout=1):
+        pass
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="flock is not available")
+def test_lock_excludes_other_processes(initialized_dir: str):
+    script = (
+        "import sys; from env_credentials.credentials import Credentials\n"
+        "with Credentials(sys.argv[1]).lock():\n"
+        "    print('locked', flush=True); sys.stdin.read()\n"
+    )
+    root = os.path.dirname(os.path.dirname(__file__))
+    process = subprocess.Popen(
+        [sys.executable, "-c", script, initialized_dir],
+        cwd=root,
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+
+    try:
+        assert process.stdout.readline() == "locked\n"
+
+        creds = Credentials(initialized_dir)
+        creds.lock_timeout = 0.1
+        with pytest.raises(LockTimeoutException):
+            creds.set("BLOCKED", "yes")
+    finally:
+        process.communicate("")
+
+    assert Credentials(initialized_dir).get("BLOCKED") is None
+
+
+def test_concurrent_updates_are_not_lost(initialized_dir: str):
+    def update(i):
+        Credentials(initialized_dir).set(f"THREAD_{i}", str(i))
+
+    threads = [threading.Thread(target=update, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    values = Credentials(initialized_dir).values()
+    assert all(values[f"THREAD_{i}"] == str(i) for i in range(8))
+
+
+def test_readers_never_see_partial_writes(initialized_dir: str):
+    stop = threading.Event()
+    errors = []
+
+    def read():
+        while not stop.is_set():
+            try:
+                Credentials(initialized_dir, cache=None).values()
+            except Exception as e:
+                errors.append(e)
+
+    reader = threading.Thread(target=read)
+    reader.start()
+
+    creds = Credentials(initialized_dir)
+    for i in range(50):
+        creds.set("COUNTER", str(i))
+
+    stop.set()
+    reader.join()
+
+    assert errors == []
+
+
+def test_sync_directory(initialized_dir: str):
+    creds = Credentials(initialized_dir)
+    creds.sync_directory = True
+
+    with patch("env_credentials.credentials._sync_directory") as sync:
+        creds.set("DURABLE", "yes")
+        creds.rotate_key()
+
+    assert sync.call_count == 2
+
+
+@pytest.mark.parametrize("method", ["edit", "migrate"])
+def test_instance_lock_is_taken_before_the_file_lock(initialized_dir: str, method: str, monkeypatch):
+    monkeypatch.setenv("EDITOR", 'sed -i "s/one/uno/"')
+    creds = Credentials(initialized_dir)
+    creds._lock.acquire()
+
+    thread = threading.Thread(target=getattr(creds, method))
+    thread.start()
+
+    try:
+        # Waiting for the instance lock must not hold the file lock meanwhile, or `set` would deadlock against it.
+        time.sleep(0.1)
+        with Credentials(initialized_dir).lock(timeout=0.05):
+            pass
+    finally:
+        creds._lock.release()
+        thread.join()
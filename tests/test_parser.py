@@ -0,0 +1,109 @@
+from io import StringIO
+
+import pytest
+from dotenv import dotenv_values
+
+from env_credentials.credentials import format_values
+from env_credentials.parser import parse
+from env_credentials.parser import parse_bindings
+from env_credentials.parser import rewrite
+
+CONFORMANCE = [
+    "",
+    "\n\n",
+    "A=1",
+    "A=1\nB=2\n",
+    "A=1\r\nB=2\r\n",
+    "A=1\rB=2",
+    "export A=1",
+    "export  A=1\nexport B",
+    "exportA=1",
+    "A",
+    "A\nB=",
+    "A=",
+    "A= ",
+    "  A  =  1  ",
+    "A=1 # comment",
+    "A=1# not a comment",
+    "A=a b  c",
+    "# comment\nA=1\n  # indented comment\nB=2",
+    "A='single'",
+    'A="double"',
+    "A='it\\'s'",
+    'A="say \\"hi\\""',
+    'A="tab\\there\\nnewline\\\\backslash"',
+    "A='no\\nescape'",
+    'A="multi\nline\nvalue"',
+    "A='multi\nline'\nB=2",
+    'CERT="-----BEGIN CERTIFICATE-----\nMIIB\n-----END CERTIFICATE-----"\nNEXT=1',
+    'A="quoted" # comment',
+    'A="quoted" junk\nB=2',
+    "A junk\nB=2",
+    "\n\nA junk\nB=2",
+    "=1\nB=2",
+    "'quoted key'=1",
+    "A=1\nA=2",
+    "A=1\nB=${A}",
+    'A=1\nB="${A}-${A}"',
+    "B=${MISSING:-default}",
+    "B=${MISSING}x",
+    "A\nB=${A}",
+    "B=${A}\nA=1",
+    "A=1\nB=${A:-other}",
+    "A=1\nB='${A}'",
+    "A=1\nB='${:-$}{A}'",
+    'A="unterminated\nB=2',
+    'A="trailing \\"\nB=2',
+    'A="double backslash \\\\"\nB="x"',
+    "A='trailing \\'\nB=2",
+    "A=ünïcödé",
+    "A=1\n\n\n# trailing\n",
+]
+
+
+@pytest.mark.parametrize("text", CONFORMANCE)
+def test_matches_python_dotenv(text: str):
+    assert parse(text, environ={}) == dict(dotenv_values(stream=StringIO(text)))
+
+
+def test_interpolates_from_environment():
+    text = "A=${FROM_ENV}\nB=${FROM_FILE}\nFROM_FILE=late\nC=${FROM_FILE}"
+
+    assert parse(text, environ={"FROM_ENV": "env", "FROM_FILE": "env"}) == {
+        "A": "env",
+        "B": "env",
+        "FROM_FILE": "late",
+        "C": "late",
+    }
+
+
+def test_formatted_values_are_not_interpolated():
+    values = {"A": "1", "B": "${A}", "C": "$${A:-x}} ${:-$}{", "D": "it's \\${A}"}
+    text = format_values(values)
+
+    assert parse(text, environ={"A": "env"}) == values
+    assert dict(dotenv_values(stream=StringIO(text))) == values
+
+
+def test_bindings_cover_the_whole_text():
+    text = "# comment\nA=1\n\nB='two\nlines'  # trailing\nbroken line\nC"
+    bindings = list(parse_bindings(text))
+
+    assert "".join(text[b.start : b.end] for b in bindings) == text
+    assert [b.key for b in bindings] == [None, "A", "B", None, "C"]
+    assert [b.error for b in bindings] == [False, False, False, True, False]
+
+
+def test_rewrite_keeps_comments_and_order():
+    text = "# header\nA=1\n\n# about B\nexport B=2  # inline\nC='three'\nA=shadowed"
+
+    result = rewrite(text, {"A": "A='one'\n", "D": "D='four'\n"}, {"B"})
+
+    assert result == "# header\nA='one'\n\n# about B\nC='three'\nA='one'\nD='four'\n"
+    assert parse(result, environ={}) == {"A": "one", "C": "three", "D": "four"}
+
+
+def test_rewrite_without_changes_is_identity():
+    text = "# comment\nA=1\nbroken line\n"
+
+    assert rewrite(text, {}, {"MISSING"}) == text
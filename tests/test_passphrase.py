@@ -0,0 +1,148 @@
+import os
+import stat
+from unittest import mock
+
+import pytest
+
+from env_credentials import passphrase
+from env_credentials.cli import main
+from env_credentials.credentials import Credentials
+from env_credentials.credentials import CredentialsException
+from env_credentials.credentials import InvalidKeyException
+from env_credentials.keys import key_cache
+from env_credentials.passphrase import CACHE_ENV
+from env_credentials.passphrase import PASSPHRASE_ENV
+from env_credentials.passphrase import DerivedKeyCache
+from env_credentials.passphrase import Params
+from env_credentials.passphrase import is_wrapped
+from env_credentials.passphrase import unwrap
+from env_credentials.passphrase import wrap
+
+# Far cheaper than the defaults, so the tests stay fast.
+PARAMS = Params(2**10, 8, 1)
+
+
+@pytest.fixture(autouse=True)
+def environment(monkeypatch, credentials_dir: str):
+    monkeypatch.setenv(PASSPHRASE_ENV, "correct horse")
+    monkeypatch.setenv("XDG_RUNTIME_DIR", credentials_dir)
+    monkeypatch.delenv(CACHE_ENV, raising=False)
+    passphrase._caches.clear()
+    key_cache.clear()
+    yield
+    passphrase._caches.clear()
+    key_cache.clear()
+
+
+def _read_key(creds: Credentials) -> str:
+    with open(creds.get_key_path()) as f:
+        return f.read()
+
+
+def test_wrap_and_unwrap():
+    cache = DerivedKeyCache(0)
+    text = wrap("secret", "correct horse", PARAMS, cache)
+
+    assert is_wrapped(text)
+    assert "secret" not in text
+    assert unwrap(text, "correct horse", cache) == "secret"
+
+    with pytest.raises(ValueError):
+        unwrap(text, "wrong", cache)
+
+
+def test_derived_keys_are_cached():
+    cache = DerivedKeyCache(60)
+    text = wrap("secret", "correct horse", PARAMS, cache)
+
+    with mock.patch.object(passphrase, "derive") as derive:
+        assert unwrap(text, cache=cache) == "secret"
+
+    derive.assert_not_called()
+
+
+def test_derived_keys_expire():
+    cache = DerivedKeyCache(60)
+    text = wrap("secret", "correct horse", PARAMS, cache)
+    expired = passphrase.time.time() + 61
+
+    with mock.patch.object(passphrase.time, "time", return_value=expired):
+        assert cache.get(passphrase.parse(text).id) is None
+
+
+def test_runtime_cache_is_private(credentials_dir: str):
+    directory = os.path.join(credentials_dir, "env-credentials")
+    text = wrap("secret", "correct horse", PARAMS, DerivedKeyCache(60, directory))
+    path = os.path.join(directory, passphrase.parse(text).id)
+
+    assert stat.S_IMODE(os.stat(directory).st_mode) == 0o700
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+
+    # Another process only has the file to go by.
+    with mock.patch.object(passphrase, "derive") as derive:
+        assert unwrap(text, cache=DerivedKeyCache(60, directory)) == "secret"
+    derive.assert_not_called()
+
+    os.chmod(directory, 0o755)
+    assert DerivedKeyCache(60, directory).get(passphrase.parse(text).id) is None
+
+    DerivedKeyCache(0, directory).forget()
+    assert os.listdir(directory) == []
+
+
+def test_protected_key(credentials_dir: str):
+    creds = Credentials(credentials_dir)
+    creds.initialize()
+    creds.set_passphrase("correct horse", PARAMS)
+
+    assert is_wrapped(_read_key(creds))
+    assert Credentials(credentials_dir, cache=None).get("FIRST") == "one"
+
+    creds.set_passphrase(None)
+
+    assert not is_wrapped(_read_key(creds))
+    assert Credentials(credentials_dir, cache=None).get("FIRST") == "one"
+
+
+def test_wrong_or_missing_passphrase(credentials_dir: str, monkeypatch):
+    creds = Credentials(credentials_dir)
+    creds.initialize()
+    creds.set_passphrase("correct horse", PARAMS)
+    passphrase._caches.clear()
+
+    monkeypatch.setenv(PASSPHRASE_ENV, "wrong")
+    with pytest.raises(InvalidKeyException):
+        Credentials(credentials_dir, cache=None).values()
+
+    monkeypatch.delenv(PASSPHRASE_ENV)
+    with mock.patch("sys.stdin.isatty", return_value=False), pytest.raises(CredentialsException):
+        Credentials(credentials_dir, cache=None).values()
+
+
+def test_rotation_keeps_the_passphrase(credentials_dir: str):
+    creds = Credentials(credentials_dir)
+    creds.initialize()
+    creds.set_passphrase("correct horse", PARAMS)
+    before = _read_key(creds)
+
+    creds.rotate_key()
+
+    after = _read_key(creds)
+    assert is_wrapped(after)
+    assert after != before
+    assert after.split("$")[:3] == before.split("$")[:3]
+    assert Credentials(credentials_dir, cache=None).get("FIRST") == "one"
+
+
+def test_cli(credentials_dir: str):
+    with mock.patch.object(passphrase, "Params", return_value=PARAMS):
+        assert main(["--dir", credentials_dir, "init", "--passphrase"]) == 0
+
+    creds = Credentials(credentials_dir, cache=None)
+    assert is_wrapped(_read_key(creds))
+
+    assert main(["--dir", credentials_dir, "passphrase", "forget"]) == 0
+    assert passphrase.default_cache().get(passphrase.parse(_read_key(creds)).id) is None
+
+    assert main(["--dir", credentials_dir, "passphrase", "remove"]) == 0
+    assert not is_wrapped(_read_key(creds))
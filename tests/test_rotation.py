@@ -0,0 +1,149 @@
+import os
+from unittest.mock import patch
+
+import pytest
+
+from env_credentials.cli import main
+from env_credentials.credentials import Credentials
+from env_credentials.credentials import _new_key
+from env_credentials.credentials import _parse_key
+from env_credentials.discovery import find_directories
+from env_credentials.rotation import DRY_RUN
+from env_credentials.rotation import FAILED
+from env_credentials.rotation import ROTATED
+from env_credentials.rotation import SKIPPED
+from env_credentials.rotation import Journal
+from env_credentials.rotation import rotate
+from tests.conftest import EXAMPLE
+
+
+def _service(root: str, name: str, indexed: bool = False) -> str:
+    directory = os.path.join(root, name)
+    os.makedirs(directory)
+    Credentials(directory, indexed=indexed).initialize()
+    return directory
+
+
+def _key(directory: str) -> str:
+    with open(os.path.join(directory, "master.key")) as f:
+        return f.read()
+
+
+@pytest.mark.parametrize("indexed", [False, True])
+def test_rotate_key(root: str, indexed: bool):
+    directory = _service(root, "service", indexed)
+    creds = Credentials(directory)
+    content = creds.read_file()
+    key = _key(directory)
+
+    creds.rotate_key()
+
+    assert _key(directory) != key
+    assert not os.path.exists(os.path.join(directory, "master.key.new"))
+    assert Credentials(directory).read_file() == content
+    assert Credentials(directory).is_indexed_format() == indexed
+    assert "master.key.new" in open(os.path.join(directory, ".gitignore")).read().splitlines()
+
+
+@pytest.mark.parametrize("indexed", [False, True])
+def test_rotation_keeps_references(root: str, indexed: bool, monkeypatch):
+    directory = _service(root, "service", indexed)
+    content = 'HOST=db\nURL="db://${HOSTVAR}/${HOST}"\n'
+    Credentials(directory).write_file(content)
+    monkeypatch.setenv("HOSTVAR", "rotated")
+
+    [result] = rotate([directory])
+
+    assert result.status == ROTATED
+    monkeypatch.setenv("HOSTVAR", "read")
+    assert Credentials(directory, cache=None).values() == {"HOST": "db", "URL": "db://read/db"}
+    assert "${HOSTVAR}" in Credentials(directory, cache=None).read_file()
+
+
+def test_recover_interrupted_rotation(root: str):
+    directory = _service(root, "service")
+    creds = Credentials(directory)
+    content = creds.read_file()
+
+    # Interrupted after the file was encrypted with the new key, before the key was replaced.
+    new_key = _new_key()
+    with open(creds.get_new_key_path(), "w") as f:
+        f.write(new_key)
+    rotated = Credentials(directory, cache=None)
+    rotated.key, rotated.nonce = _parse_key(new_key)
+    rotated.write_file(content)
+
+    assert Credentials(directory).recover_key()
+    assert _key(directory) == new_key
+    assert Credentials(directory).values() == EXAMPLE
+
+
+def test_recover_discards_unused_key(root: str):
+    directory = _service(root, "service")
+    key = _key(directory)
+    with open(os.path.join(directory, "master.key.new"), "w") as f:
+        f.write(_new_key())
+
+    creds = Credentials(directory)
+
+    assert not creds.recover_key()
+    assert _key(directory) == key
+    assert not os.path.exists(creds.get_new_key_path())
+    assert creds.values() == EXAMPLE
+
+
+def test_find_directories(root: str):
+    first = _service(root, "a")
+    second = _service(root, os.path.join("b", "nested"))
+    _service(root, os.path.join("node_modules", "ignored"))
+    os.makedirs(os.path.join(root, "empty"))
+
+    assert find_directories([root]) == [first, second]
+
+
+def test_rotate_many_directories(root: str):
+    directories = [_service(root, f"service-{i}") for i in range(5)]
+    keys = [_key(d) for d in directories]
+    progress = []
+
+    results = rotate(directories, workers=3, progress=lambda r, done, total: progress.append((done, total)))
+
+    assert {r.status for r in results} == {ROTATED}
+    assert progress == [(i, 5) for i in range(1, 6)]
+    assert all(_key(d) != k for d, k in zip(directories, keys))
+    assert all(Credentials(d).values() == EXAMPLE for d in directories)
+
+
+def test_dry_run_does_not_rotate(root: str):
+    directory = _service(root, "service")
+    key = _key(directory)
+
+    [result] = rotate([directory], dry_run=True)
+
+    assert result.status == DRY_RUN
+    assert _key(directory) == key
+
+
+def test_journal_resumes_rotation(root: str):
+    directories = [_service(root, f"service-{i}") for i in range(3)]
+    journal = Journal(os.path.join(root, "rotation.log"))
+
+    with patch.object(Credentials, "rotate_key", side_effect=[None, RuntimeError("interrupted"), None]):
+        first = rotate(directories, workers=1, journal=journal)
+
+    assert sorted(r.status for r in first) == [FAILED, ROTATED, ROTATED]
+    failed = next(r.directory for r in first if r.status == FAILED)
+
+    second = {r.directory: r.status for r in rotate(directories, journal=journal)}
+
+    assert second == {d: ROTATED if d == failed else SKIPPED for d in directories}
+
+
+def test_cli_rotates_recursively(root: str, capsys):
+    directories = [_service(root, f"service-{i}") for i in range(2)]
+    keys = [_key(d) for d in directories]
+
+    assert main(["rotate", "--recursive", root]) == 0
+
+    assert all(_key(d) != k for d, k in zip(directories, keys))
+    assert "[2/2] rotated" in capsys.readouterr().err
@@ -0,0 +1,28 @@
+from env_credentials.selection import Selector
+
+
+def test_selects_everything_by_default():
+    assert Selector().names(["A", "B"]) == {"A": "A", "B": "B"}
+
+
+def test_include_and_exclude_patterns():
+    selector = Selector(include=["APP_*", "DEBUG"], exclude="*_KEY")
+
+    assert selector.rename("APP_TOKEN") == "APP_TOKEN"
+    assert selector.rename("DEBUG") == "DEBUG"
+    assert selector.rename("APP_SIGNING_KEY") is None
+    assert selector.rename("DEBUGGING") is None
+
+
+def test_empty_include_selects_nothing():
+    assert Selector(include=[]).names(["A", "B"]) == {}
+
+
+def test_strips_longest_prefix():
+    selector = Selector(prefix=["APP_", "APP_DB_"], strip_prefix=True)
+
+    assert selector.names(["APP_TOKEN", "APP_DB_HOST", "APP_", "OTHER"]) == {"TOKEN": "APP_TOKEN", "HOST": "APP_DB_HOST"}
+
+
+def test_select_skips_names_without_value():
+    assert Selector(prefix="A").select({"A1": "1", "A2": None, "B": "2"}) == {"A1": "1"}
@@ -0,0 +1,92 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from env_credentials.cache import CacheEntry
+from env_credentials.cache import CredentialsCache
+from env_credentials.credentials import Credentials
+from env_credentials.instrumentation import Stats
+from tests.conftest import EXAMPLE
+
+THREADS = 16
+
+
+def _run_together(func, threads: int = THREADS):
+    barrier = threading.Barrier(threads)
+
+    def run(_):
+        barrier.wait()
+        return func()
+
+    with ThreadPoolExecutor(threads) as executor:
+        return list(executor.map(run, range(threads)))
+
+
+def test_concurrent_first_access_decrypts_once(initialized_dir: str, stats: Stats):
+    creds = Credentials(initialized_dir, cache=None)
+
+    results = _run_together(creds.values)
+
+    assert all(r == EXAMPLE for r in results)
+    assert stats.phases["decrypt"].count == 1
+    assert stats.phases["parse"].count == 1
+
+
+def test_concurrent_instances_share_one_decrypt(initialized_dir: str, stats: Stats):
+    cache = CredentialsCache()
+
+    results = _run_together(lambda: Credentials(initialized_dir, cache=cache).values())
+
+    assert all(r == EXAMPLE for r in results)
+    assert stats.phases["decrypt"].count == 1
+    assert stats.phases["parse"].count == 1
+    assert stats.cache_misses == 1
+
+
+def test_failed_load_is_raised_to_every_waiter():
+    cache = CredentialsCache()
+    started = threading.Event()
+    release = threading.Event()
+    key = ("/dir", (0, 0, 0), (0, 0, 0))
+
+    def load():
+        started.set()
+        release.wait()
+        raise ValueError("broken")
+
+    with ThreadPoolExecutor(2) as executor:
+        leader = executor.submit(cache.get_or_load, key, load)
+        started.wait()
+        follower = executor.submit(cache.get_or_load, key, lambda: CacheEntry("never"))
+        release.set()
+
+        with pytest.raises(ValueError):
+            leader.result()
+        with pytest.raises(ValueError):
+            follower.result()
+
+    assert cache.get_or_load(key, lambda: CacheEntry("loaded"))[0].content == "loaded"
+
+
+def test_hammering_values_load_and_clear(initialized_dir: str):
+    creds = Credentials(initialized_dir)
+    errors = []
+
+    def hammer():
+        try:
+            for i in range(200):
+                if i % 3 == 0:
+                    creds.clear()
+                elif i % 3 == 1:
+                    creds.load()
+                    assert os.environ["FIRST"] == "one"
+                assert creds.values() == EXAMPLE
+                assert creds.read_file()
+        except Exception as e:  # pragma: no cover
+            errors.append(e)
+
+    _run_together(hammer, threads=8)
+
+    assert errors == []
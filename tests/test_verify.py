@@ -0,0 +1,110 @@
+import json
+import os
+from xml.etree import ElementTree
+
+from env_credentials import container
+from env_credentials.cli import main
+from env_credentials.credentials import Credentials
+from env_credentials.verify import DECRYPT
+from env_credentials.verify import KEY
+from env_credentials.verify import PARSE
+from env_credentials.verify import SCHEMA
+from env_credentials.verify import read_schema
+from env_credentials.verify import to_junit
+from env_credentials.verify import verify
+from env_credentials.verify import verify_directory
+
+
+def _service(root: str, name: str) -> str:
+    directory = os.path.join(root, name)
+    os.makedirs(directory)
+    Credentials(directory).initialize()
+    return directory
+
+
+def test_valid_directory(root: str):
+    result = verify_directory(_service(root, "valid"), required=["FIRST"])
+
+    assert result.ok
+    assert result.names == 3
+
+
+def test_invalid_key(root: str):
+    directory = _service(root, "invalid")
+    with open(os.path.join(directory, "master.key"), "w") as f:
+        f.write("not a key")
+
+    assert [p.check for p in verify_directory(directory).problems] == [KEY]
+
+
+def test_wrong_key(root: str):
+    directory = _service(root, "wrong")
+    os.replace(os.path.join(_service(root, "other"), "master.key"), os.path.join(directory, "master.key"))
+
+    assert [p.check for p in verify_directory(directory).problems] == [DECRYPT]
+
+
+def test_parse_errors_and_missing_names_do_not_leak_values(root: str):
+    directory = _service(root, "broken")
+    Credentials(directory).write_file("SECRET=hunter2\nbroken secret line\nEMPTY\n")
+
+    result = verify_directory(directory, required=["SECRET", "EMPTY", "MISSING"])
+
+    assert [p.check for p in result.problems] == [PARSE, SCHEMA]
+    assert "line 2" in result.problems[0].message
+    assert "EMPTY, MISSING" in result.problems[1].message
+    assert "hunter2" not in repr(result)
+
+
+def test_verify_checks_every_directory(root: str):
+    first = _service(root, "first")
+    os.remove(os.path.join(first, "credentials.env.enc"))
+    second = _service(root, "second")
+
+    results = verify([first, second], workers=2)
+
+    assert [r.directory for r in results] == [first, second]
+    assert [r.ok for r in results] == [False, True]
+
+
+def test_undecodable_plaintext_is_reported(root: str):
+    broken = _service(root, "broken")
+    creds = Credentials(broken)
+    creds._ensure_key()
+    with open(creds.get_config_path(), "wb") as f:
+        f.write(container.seal(creds.key, b"SECRET=\xffhunter2\n"))
+
+    results = verify([broken, _service(root, "valid")], workers=2)
+
+    assert [r.ok for r in results] == [False, True]
+    assert [p.check for p in results[0].problems] == [DECRYPT]
+    assert "hunter2" not in repr(results[0])
+
+
+def test_junit_report(root: str):
+    results = verify([_service(root, "valid"), os.path.join(root, "missing")])
+
+    suite = ElementTree.fromstring(to_junit(results))
+
+    assert (suite.get("tests"), suite.get("failures")) == ("2", "1")
+    assert len(suite.findall("testcase/failure")) == 1
+
+
+def test_read_schema(root: str):
+    path = os.path.join(root, "schema")
+    with open(path, "w") as f:
+        f.write("# required\nFIRST\n\nSECOND\n")
+
+    assert read_schema(path) == ["FIRST", "SECOND"]
+
+
+def test_cli_reports_json(root: str, capsys):
+    _service(root, "valid")
+    broken = _service(root, "broken")
+    os.remove(os.path.join(broken, "master.key"))
+
+    assert main(["verify", "-r", root, "--format", "json", "--require", "FIRST"]) == 1
+
+    report = json.loads(capsys.readouterr().out)
+    assert not report["ok"]
+    assert {os.path.basename(d["directory"]): d["ok"] for d in report["directories"]} == {"broken": False, "valid": True}
@@ -0,0 +1,102 @@
+import os
+import sys
+import threading
+
+import pytest
+
+from env_credentials.credentials import Credentials
+from env_credentials.watch import CredentialsWatcher
+from env_credentials.watch import diff
+from env_credentials.watch import watch
+
+
+def test_diff():
+    change = diff({"A": "1", "B": "2", "C": "3"}, {"A": "1", "B": "two", "D": "4"})
+
+    assert change.added == {"D": "4"}
+    assert change.changed == {"B": "two"}
+    assert change.removed == ["C"]
+
+
+def test_check_applies_only_changes(initialized_dir: str):
+    creds = Credentials(initialized_dir)
+    creds.load()
+    changes = []
+    watcher = CredentialsWatcher(creds, [changes.append])
+
+    assert watcher.check() is None
+
+    Credentials(initialized_dir).write_file("FIRST=uno\nSECOND=2\nADDED=new\n")
+    change = watcher.check()
+
+    assert change.added == {"ADDED": "new"}
+    assert change.changed == {"FIRST": "uno"}
+    assert change.removed == ["A_BOOL"]
+    assert changes == [change]
+    assert os.environ["FIRST"] == "uno"
+    assert os.environ["ADDED"] == "new"
+    assert "A_BOOL" not in os.environ
+    assert watcher.check() is None
+
+
+def test_check_after_key_rotation(initialized_dir: str):
+    creds = Credentials(initialized_dir)
+    creds.load()
+    watcher = CredentialsWatcher(creds)
+
+    Credentials(initialized_dir).rotate_key()
+
+    assert watcher.check() is None
+    creds.clear()
+    assert creds.values()["FIRST"] == "one"
+
+    Credentials(initialized_dir).set("FIRST", "uno")
+
+    assert watcher.check().changed == {"FIRST": "uno"}
+    assert os.environ["FIRST"] == "uno"
+
+
+def test_environment_keeps_precedence(initialized_dir: str):
+    os.environ["FIRST"] = "from environment"
+    creds = Credentials(initialized_dir)
+    creds.load()
+    watcher = CredentialsWatcher(creds)
+
+    Credentials(initialized_dir).write_file("FIRST=uno\n")
+    watcher.check()
+
+    assert os.environ["FIRST"] == "from environment"
+
+
+def test_failed_reload_keeps_previous_values(initialized_dir: str):
+    creds = Credentials(initialized_dir)
+    creds.load()
+    watcher = CredentialsWatcher(creds)
+
+    with open(creds.get_config_path(), "wb") as f:
+        f.write(b"ENVC")
+
+    assert watcher.check() is None
+    assert os.environ["FIRST"] == "one"
+
+    Credentials(initialized_dir).write_file("FIRST=uno\n")
+
+    assert watcher.check().changed == {"FIRST": "uno"}
+
+
+@pytest.mark.parametrize(
+    "use_inotify",
+    [
+        False,
+        pytest.param(True, marks=pytest.mark.skipif(not sys.platform.startswith("linux"), reason="requires inotify")),
+    ],
+)
+def test_background_thread_picks_up_changes(initialized_dir: str, use_inotify: bool):
+    changed = threading.Event()
+
+    with watch(Credentials(initialized_dir), lambda change: changed.set(), interval=0.05, use_inotify=use_inotify):
+        Credentials(initialized_dir).write_file("FIRST=uno\n")
+
+        assert changed.wait(5)
+
+    assert os.environ["FIRST"] == "uno"